@@ -0,0 +1,93 @@
+"""Runs the benchmark suite, offline.
+
+    python -m benchmarks [--filter parse] [--save baseline.json] [--compare baseline.json]
+
+For every case, reports the best and median time of a call, the throughput and the peak memory
+allocated by a call. With --compare, the median times are compared against a baseline saved by a
+previous run, and the exit status is 1 if any case is slower than the baseline beyond --tolerance."""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Mapping
+
+from benchmarks.cases import CASES, seed
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    fn()  # warm up
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or time.perf_counter() - started < min_time:
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    median = statistics.median(timings)
+    return {
+        "runs": len(timings),
+        "best": min(timings),
+        "median": median,
+        "ops_per_sec": 1 / median if median else float("inf"),
+        "peak_memory": peak,
+    }
+
+
+def report(name: str, stats: Mapping[str, float], baseline: Mapping[str, float] = None) -> str:
+    line = (
+        f"{name:<55} {stats['best'] * 1e3:>10.3f} {stats['median'] * 1e3:>10.3f} "
+        f"{stats['ops_per_sec']:>10.1f} {stats['peak_memory'] / 2 ** 20:>10.2f}"
+    )
+    if baseline:
+        line += f" {stats['median'] / baseline['median']:>9.2f}x"
+    return line
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("--filter", default="", help="run the cases whose name contains this string only")
+    parser.add_argument("--repeat", type=int, default=5, help="minimum number of timed calls per case")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds spent timing each case")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="accepted slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(
+        f"{'case':<55} {'best ms':>10} {'median ms':>10} {'ops/s':>10} {'peak MiB':>10}"
+        + (" vs base" if baseline else "")
+    )
+    results, regressions = {}, []
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        seed()
+        results[name] = measure(setup(), repeat=args.repeat, min_time=args.min_time)
+        print(report(name, results[name], baseline.get(name)))
+        if name in baseline and results[name]["median"] > baseline[name]["median"] * (1 + args.tolerance):
+            regressions.append(name)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if regressions:
+        print(f"\nslower than the baseline: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""Benchmark cases: every case is a setup function, registered by name, returning the callable to measure.
+
+The inputs are generated with the factories used by the test suite, scaled up."""
+
+import asyncio
+import json
+import random
+from typing import Callable, Dict, List, Mapping
+
+import factory.random
+
+from igenius_adapters_sdk.entities import attribute, data, params, query, uri
+from igenius_adapters_sdk.tools import chassis, predicate, serialization, sql, utils
+from tests import factories as shf
+
+Case = Callable[[], Callable[[], object]]
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(setup: Case) -> Case:
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def seed(value: int = 42) -> None:
+    random.seed(value)
+    factory.random.reseed_random(value)
+
+
+def where_tree(expressions: int, fanout: int = 10) -> query.MultiExpression:
+    leaves = shf.ExpressionFactory.build_batch(size=expressions)
+    branches = [
+        shf.MultiExpressionFactory(criteria=query.CriteriaType.OR, expressions=leaves[i : i + fanout])
+        for i in range(0, expressions, fanout)
+    ]
+    return shf.MultiExpressionFactory(criteria=query.CriteriaType.AND, expressions=branches)
+
+
+def join_tree(depth: int) -> query.Join:
+    join = shf.JoinFactory()
+    for _ in range(depth - 1):
+        join = shf.JoinFactory(left=shf.JoinPartFactory(from_=join))
+    return join
+
+
+def binning_attribute(alias: str, bins: int, width: float = 10.0) -> shf.BinningAttributeFactory:
+    edges = [shf.BinFactory(ge=i * width, lt=(i + 1) * width) for i in range(bins - 1)]
+    return shf.BinningAttributeFactory(
+        alias=alias,
+        function_uri=shf.FunctionUriFactory(
+            function_type="group_by",
+            function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+            function_params=shf.BinningRulesFactory(bins=edges + [shf.BinFactory(ge=(bins - 1) * width, lt=None)]),
+        ),
+    )
+
+
+def binned_group_by(binned_groups: int, bins: int, categories: int = 0) -> query.GroupByQuery:
+    groups = [binning_attribute(f"bin_{i}", bins) for i in range(binned_groups)]
+    if categories:
+        groups.insert(0, shf.BinningAttributeFactory(alias="category"))
+    return shf.GroupByQueryFactory(aggregations=[shf.AggregationAttributeFactory(alias="value")], groups=groups)
+
+
+def engine_result(group_by: query.GroupByQuery, rows: int, categories: int = 0) -> List[Mapping]:
+    """Random rows of the group by result, as returned by a datasource: a subset of the cells."""
+    domains = []
+    for att in group_by.groups:
+        if att.function_uri.function_params is not None:
+            domains.append((att.alias, att.function_uri.function_params.compile().labels))
+        else:
+            domains.append((att.alias, [f"category_{i}" for i in range(categories)]))
+    cells = {tuple(random.choice(labels) for _, labels in domains) for _ in range(rows)}
+    return [dict(zip([alias for alias, _ in domains], cell), value=random.random()) for cell in cells]
+
+
+def payload(model) -> Mapping:
+    return json.loads(model.json())
+
+
+@case("parse/select-500-expressions")
+def parse_select_many_expressions():
+    data = payload(shf.SelectQueryFactory(where=where_tree(500)))
+    return lambda: query.parse_query(data)
+
+
+@case("parse/select-join-depth-30")
+def parse_select_deep_join():
+    data = payload(shf.SelectQueryFactory(from_=join_tree(30)))
+    return lambda: query.parse_query(data)
+
+
+@case("parse/groupby-2000-bins")
+def parse_group_by_many_bins():
+    data = payload(binned_group_by(binned_groups=1, bins=2000))
+    return lambda: query.parse_query(data)
+
+
+@case("parse/select-500-expressions-cached")
+def parse_select_cached():
+    data = payload(shf.SelectQueryFactory(where=where_tree(500)))
+    cache = query.QueryCache()
+    query.parse_query(data, cache=cache)
+    return lambda: query.parse_query(data, cache=cache)
+
+
+@case("bin_interpolation/2x50-bins-2k-rows")
+def interpolation_binned():
+    group_by = binned_group_by(binned_groups=2, bins=50)
+    rows = engine_result(group_by, rows=2000)
+    return lambda: utils.bin_interpolation(group_by, rows)
+
+
+@case("bin_interpolation/20-categories-2x50-bins-20k-rows")
+def interpolation_mixed():
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=20)
+    rows = engine_result(group_by, rows=20000, categories=20)
+    return lambda: utils.bin_interpolation(group_by, rows)
+
+
+@case("bin_interpolation/20-categories-2x50-bins-20k-rows-columnar")
+def interpolation_mixed_columnar():
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=20)
+    rows = utils.ColumnarResult.from_rows(engine_result(group_by, rows=20000, categories=20))
+    return lambda: utils.bin_interpolation(group_by, rows)
+
+
+@case("bin_interpolation/200x200-categories-50-bins-5k-rows-sparse")
+def interpolation_sparse():
+    # 2M cells when dense, the bins of the ~5k observed (store, city) when sparse
+    group_by = binned_group_by(binned_groups=1, bins=50)
+    groups = [shf.BinningAttributeFactory(alias="store"), shf.BinningAttributeFactory(alias="city"), *group_by.groups]
+    group_by = group_by.copy(update={"groups": groups})
+    rows = engine_result(group_by, rows=5000, categories=200)
+    return lambda: utils.bin_interpolation(group_by, rows, sparse=True)
+
+
+@case("bin_interpolation/3x200-bins-page-of-100")
+def interpolation_page():
+    group_by = binned_group_by(binned_groups=3, bins=200)
+    rows = engine_result(group_by, rows=20000)
+    page = group_by.copy(
+        update={"order_by": [data.OrderByAttribute(alias="bin_2", direction="desc")], "offset": 4_000_000, "limit": 100}
+    )
+    return lambda: utils.bin_interpolation(page, rows)
+
+
+@case("chassis/run")
+def chassis_run():
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=5)
+    rows = engine_result(group_by, rows=5000, categories=5)
+    ch = chassis.Chassis(query=group_by, engine=lambda q: rows)
+    return ch.run
+
+
+@case("chassis/async_run")
+def chassis_async_run():
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=5)
+    rows = engine_result(group_by, rows=5000, categories=5)
+
+    async def engine(q):
+        return rows
+
+    ch = chassis.Chassis(query=group_by, engine=engine)
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(ch.async_run())
+
+
+@case("chassis/iter_run")
+def chassis_iter_run():
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=5)
+    rows = engine_result(group_by, rows=5000, categories=5)
+    ch = chassis.Chassis(query=group_by, engine=lambda q: iter(rows))
+    return lambda: sum(1 for _ in ch.iter_run())
+
+
+def filter_rows(rows: int) -> List[Mapping]:
+    return [{"n": random.random() * 100, "s": random.choice(["apple", "banana", "cherry", None])} for _ in range(rows)]
+
+
+def filter_where() -> query.MultiExpression:
+    collection = shf.CollectionUriFactory()
+    n, s = (uri.AttributeUri(attribute_uid=uid, **collection.dict()) for uid in ("n", "s"))
+    return shf.MultiExpressionFactory(
+        criteria=query.CriteriaType.AND,
+        expressions=[
+            shf.ExpressionFactory(attribute_uri=s, operator=params.ParamOperation.NOT_EMPTY.uid, value=None),
+            shf.ExpressionFactory(attribute_uri=n, operator=params.ParamOperation.LESS_THAN.uid, value="50"),
+            shf.ExpressionFactory(attribute_uri=s, operator=params.ParamOperation.EQUAL.uid, value="banana"),
+        ],
+    )
+
+
+@case("predicate/rows-100k")
+def predicate_rows():
+    rows = filter_rows(100000)
+    compiled = predicate.compile_where(filter_where())
+    return lambda: [row for row in rows if compiled(row)]
+
+
+@case("predicate/columns-100k")
+def predicate_columns():
+    rows = filter_rows(100000)
+    columns = {key: [row[key] for row in rows] for key in ("n", "s")}
+    compiled = predicate.compile_where(filter_where())
+    return lambda: compiled.select(columns, range(len(rows)))
+
+
+def filter_select(expressions: int) -> query.SelectQuery:
+    where = filter_where()
+    leaves = (where.expressions * expressions)[:expressions]
+    branches = [
+        shf.MultiExpressionFactory(criteria=query.CriteriaType.OR, expressions=leaves[i : i + 10])
+        for i in range(0, expressions, 10)
+    ]
+    collection = uri.CollectionUri(**where.expressions[0].attribute_uri.dict(exclude={"attribute_uid"}))
+    return shf.SelectQueryFactory(
+        from_=collection,
+        attributes=[shf.ProjectionAttributeFactory(attribute_uri=where.expressions[0].attribute_uri)],
+        where=shf.MultiExpressionFactory(criteria=query.CriteriaType.AND, expressions=branches),
+    )
+
+
+@case("sql/compile-500-expressions")
+def sql_compile():
+    q = filter_select(500)
+    return lambda: sql.SqlCompiler().compile(q)
+
+
+@case("sql/compile-500-expressions-cached")
+def sql_compile_cached():
+    q = filter_select(500)
+    compiler = sql.SqlCompiler()
+    return lambda: compiler.compile(q)
+
+
+def serialization_rows() -> List[Mapping]:
+    group_by = binned_group_by(binned_groups=2, bins=50, categories=5)
+    return utils.bin_interpolation(group_by, engine_result(group_by, rows=5000, categories=5))
+
+
+@case("serialization/json-dumps-25k-rows")
+def serialization_json_dumps():
+    rows = serialization_rows()
+    return lambda: json.dumps(rows).encode()
+
+
+@case("serialization/dumps-25k-rows")
+def serialization_dumps():
+    rows = serialization_rows()
+    return lambda: serialization.dumps(rows)
+
+
+@case("serialization/dumps-groupby-2000-bins")
+def serialization_dumps_entity():
+    group_by = binned_group_by(binned_groups=1, bins=2000)
+    return lambda: serialization.dumps(group_by)
+
+
+@case("serialization/json-groupby-2000-bins")
+def serialization_json_entity():
+    group_by = binned_group_by(binned_groups=1, bins=2000)
+    return lambda: group_by.json(by_alias=True).encode()
@@ -3,6 +3,7 @@ from typing import Union
 from pydantic import BaseModel
 
 from igenius_adapters_sdk.entities.i18n import I18n
+from igenius_adapters_sdk.entities.registry import SpecsRegistry
 
 Uid = str
 
@@ -14,7 +15,7 @@ class AttributeFunctionSpecs(BaseModel):
     i18n: I18n
 
 
-class AggregationFunction:
+class AggregationFunction(SpecsRegistry, spec_type=AttributeFunctionSpecs):
     IDENTITY = AttributeFunctionSpecs(
         uid="crystal.topics.data.aggregation.identity",
         i18n=I18n(
@@ -79,21 +80,8 @@ class AggregationFunction:
         ),
     )
 
-    @classmethod
-    def from_uid(cls, uid: str) -> AttributeFunctionSpecs:
-        """Given an aggregation function uid, returns its complete spec if found,
-        otherwise raises ValueError."""
-        try:
-            return next(
-                value
-                for attr, value in cls.__dict__.items()
-                if isinstance(value, AttributeFunctionSpecs) and value.uid == uid.lower()
-            )
-        except StopIteration:
-            raise ValueError(f"Invalid AggregationFunction uid={uid}")
 
-
-class GroupByFunction:
+class GroupByFunction(SpecsRegistry, spec_type=AttributeFunctionSpecs):
     IDENTITY = AttributeFunctionSpecs(
         uid="crystal.topics.data.group-by.identity",
         i18n=I18n(
@@ -157,16 +145,3 @@ class GroupByFunction:
             description="crystal.topics.data.group-by.numeric_binning.i18n.description",
         ),
     )
-
-    @classmethod
-    def from_uid(cls, uid: str) -> AttributeFunctionSpecs:
-        """Given a groupby function uid, returns its complete spec if found,
-        otherwise raises ValueError."""
-        try:
-            return next(
-                value
-                for attr, value in cls.__dict__.items()
-                if isinstance(value, AttributeFunctionSpecs) and value.uid == uid.lower()
-            )
-        except StopIteration:
-            raise ValueError(f"Invalid GroupByFunction uid={uid}")
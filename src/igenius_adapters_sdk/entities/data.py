@@ -23,11 +23,17 @@ class StaticValueAttribute(BaseModel):
     alias: str
     default_bin_interpolation: Optional[Any]
 
+    class Config:
+        allow_mutation = False
+
 
 class BaseAttribute(BaseModel, abc.ABC):
     attribute_uri: uri.AttributeUri
     alias: str
 
+    class Config:
+        allow_mutation = False
+
 
 class ProjectionAttribute(BaseAttribute):
     pass
@@ -37,6 +43,9 @@ class OrderByAttribute(BaseModel):
     alias: str
     direction: OrderByDirection = OrderByDirection.ASC
 
+    class Config:
+        allow_mutation = False
+
 
 class FunctionUri(BaseModel):
     function_type: Literal["group_by", "aggregation"]
@@ -59,6 +68,9 @@ class FunctionUri(BaseModel):
                 raise ValueError("function_params does not contain BinningRules")
         return v
 
+    class Config:
+        allow_mutation = False
+
 
 class AggregationAttribute(BaseAttribute):
     function_uri: FunctionUri
@@ -1,10 +1,18 @@
-from typing import List, Optional, Union
+from bisect import bisect_right
+from math import inf
+from typing import Iterable, List, Optional, Union
 
-from pydantic import BaseModel, Field, root_validator, validator
+from pydantic import BaseModel, Field, PrivateAttr, root_validator, validator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 __all__ = [
     "Bin",
     "BinningRules",
+    "CompiledBinningRules",
 ]
 
 Number = Union[float, int]
@@ -13,6 +21,8 @@ Number = Union[float, int]
 class Bin(BaseModel):
     ge: Optional[Number]
     lt: Optional[Number]
+    # bins are immutable, so their label is computed once
+    _label: Optional[str] = PrivateAttr(None)
 
     @root_validator
     def check_bin_extremities(cls, values):
@@ -23,31 +33,122 @@ class Bin(BaseModel):
         return values
 
     def __str__(self):
-        return str(self.ge) + "-" + str(self.lt)
+        if self._label is None:
+            self._label = str(self.ge) + "-" + str(self.lt)
+        return self._label
+
+    def copy(self, **kwargs):
+        copied = super().copy(**kwargs)
+        copied._label = None
+        return copied
+
+    class Config:
+        allow_mutation = False
+
+
+class CompiledBinningRules:
+    """Sorted bin edges of validated BinningRules, to assign numbers to bins by bisection.
+
+    Values outside of every bin, None and NaN are assigned to no bin."""
+
+    def __init__(self, bins: List[Bin]):
+        self.bins = bins
+        self.labels = [str(b) for b in bins]
+        self.lower_edges = [-inf if b.ge is None else b.ge for b in bins]
+        self.upper_edges = [inf if b.lt is None else b.lt for b in bins]
+        self._open_ended = bins[-1].lt is None
+        self._index_by_edges = {(b.ge, b.lt): i for i, b in enumerate(bins)}
+
+    def index_of(self, value: Optional[Number]) -> Optional[int]:
+        """Returns the index of the bin containing the value, if any."""
+        if value is None or value != value:
+            return None
+        i = bisect_right(self.lower_edges, value) - 1
+        if i < 0:
+            return None
+        if value < self.upper_edges[i] or (self._open_ended and i == len(self.bins) - 1):
+            return i
+        return None
+
+    def find_bin(self, value: Optional[Number]) -> Optional[Bin]:
+        """Returns the bin containing the value, if any."""
+        i = self.index_of(value)
+        return None if i is None else self.bins[i]
+
+    def label_of(self, bin_: Bin) -> str:
+        """Returns the label of one of the bins, otherwise raises ValueError."""
+        i = self._index_by_edges.get((bin_.ge, bin_.lt))
+        if i is None:
+            raise ValueError(f"bin {bin_} not found")
+        return self.labels[i]
+
+    def assign(self, values: Iterable[Optional[Number]]) -> List[Optional[str]]:
+        """Maps each value to the label of its bin, i.e. `str(bin)`, or to None."""
+        if numpy is not None:
+            try:
+                return self._assign_array(numpy.asarray(values, dtype=float))
+            except (TypeError, ValueError):
+                pass
+        labels = self.labels
+        return [None if i is None else labels[i] for i in map(self.index_of, values)]
+
+    def _assign_array(self, values: "numpy.ndarray") -> List[Optional[str]]:
+        lower = numpy.asarray(self.lower_edges, dtype=float)
+        upper = numpy.asarray(self.upper_edges, dtype=float)
+        indexes = numpy.searchsorted(lower, values, side="right") - 1
+        clipped = numpy.clip(indexes, 0, None)
+        valid = (indexes >= 0) & (values < upper[clipped])
+        if self._open_ended:
+            valid |= indexes == len(self.bins) - 1
+        valid &= ~numpy.isnan(values)
+        labels = numpy.array(self.labels + [None], dtype=object)
+        return labels[numpy.where(valid, clipped, len(self.labels))].tolist()
 
 
 class BinningRules(BaseModel):
     bins: List[Bin] = Field(..., min_items=2)
+    _compiled: Optional[CompiledBinningRules] = PrivateAttr(None)
 
     @validator("bins")
-    def sort_bins(cls, v):
+    def sort_and_check_bins(cls, v):
         # sort by `ge` attribute, with None first
-        return sorted(v, key=lambda x: (x.ge is not None, x.ge))
-
-    @validator("bins")
-    def null_bin_value_validator(cls, v):
-        checks = (
-            v[0].lt is None,
-            v[-1].ge is None,
-            any(x.ge is None or x.lt is None for x in v[1:-1]),
-        )
-        if any(checks):
+        v = sorted(v, key=lambda x: (x.ge is not None, x.ge))
+        # single pass over the sorted bins: null values are reported before overlapping bins
+        if v[0].lt is None or v[-1].ge is None:
             raise ValueError("null values found in prohibited properties")
+        overlapping = False
+        last = len(v) - 1
+        for i in range(last):
+            following = v[i + 1]
+            if i + 1 < last and (following.ge is None or following.lt is None):
+                raise ValueError("null values found in prohibited properties")
+            overlapping = overlapping or v[i].lt > following.ge
+        if overlapping:
+            raise ValueError("found overlapping bins")
         return v
 
-    @validator("bins")
-    def overlapping_bin_validator(cls, v):
-        for i, b in enumerate(v[:-1]):
-            if b.lt > v[i + 1].ge:
-                raise ValueError("found overlapping bins")
-        return v
+    def compile(self) -> CompiledBinningRules:  # noqa: A003
+        """Returns the lookup structure of the rules, built once."""
+        if self._compiled is None:
+            self._compiled = CompiledBinningRules(self.bins)
+        return self._compiled
+
+    def assign(self, values: Iterable[Optional[Number]]) -> List[Optional[str]]:
+        """Maps each value to the label of its bin, i.e. `str(bin)`, or to None if no bin contains it."""
+        return self.compile().assign(values)
+
+    def find_bin(self, value: Optional[Number]) -> Optional[Bin]:
+        """Returns the bin containing the value, if any."""
+        return self.compile().find_bin(value)
+
+    def label_of(self, bin_: Bin) -> str:
+        """Returns the label of one of the bins of the rules, otherwise raises ValueError."""
+        return self.compile().label_of(bin_)
+
+    def copy(self, **kwargs):
+        rules = super().copy(**kwargs)
+        rules._compiled = None
+        return rules
+
+    class Config:
+        allow_mutation = False
@@ -1,8 +1,9 @@
-from typing import Any, Mapping, NewType, Tuple, Type
+from typing import Any, ClassVar, Dict, Mapping, NewType, Tuple, Type
 
 from pydantic import BaseModel, Extra, Field
 
 from igenius_adapters_sdk.entities.i18n import I18n
+from igenius_adapters_sdk.entities.registry import SpecsRegistry
 
 Uid = NewType("Uid", str)
 
@@ -80,7 +81,7 @@ class OperationSchemas:
             raise ValueError("OperationSchema not found")
 
 
-class ParamOperation:
+class ParamOperation(SpecsRegistry, spec_type=ParamOperationSpecs):
     EQUAL = ParamOperationSpecs(
         uid="crystal.topics.data.param-operation.equal",
         i18n=I18n(
@@ -194,15 +195,23 @@ class ParamOperation:
         properties_schema=OperationSchemas.NO_VALUE.jsonschema,
     )
 
+    _operation_schemas: ClassVar[Dict[str, OperationSchemaSpec]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        cls._operation_schemas = dict(cls._operation_schemas)
+        super().__init_subclass__(**kwargs)
+
     @classmethod
-    def from_uid(cls, uid: str) -> ParamOperationSpecs:
-        """Given a param operation uid, returns its complete spec if found,
+    def register(cls, spec: ParamOperationSpecs) -> ParamOperationSpecs:
+        """Adds the spec to the registry, resolving its OperationSchemaSpec once: raises
+        ValueError if the properties_schema does not match any of the OperationSchemas."""
+        operation_schema = OperationSchemas.from_jsonschema(spec.properties_schema)
+        super().register(spec)
+        cls._operation_schemas[spec.uid] = operation_schema
+        return spec
+
+    @classmethod
+    def operation_schema(cls, uid: str) -> OperationSchemaSpec:
+        """Given a param operation uid, returns the OperationSchemaSpec of its properties_schema,
         otherwise raises ValueError."""
-        try:
-            return next(
-                value
-                for attr, value in cls.__dict__.items()
-                if isinstance(value, ParamOperationSpecs) and value.uid == uid.lower()
-            )
-        except StopIteration:
-            raise ValueError(f"Invalid ParamOperation uid={uid}")
+        return cls._operation_schemas[cls.from_uid(uid).uid]
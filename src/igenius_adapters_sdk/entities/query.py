@@ -1,8 +1,13 @@
 import abc
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 from enum import Enum
-from typing import Any, List, Optional, Union
+from typing import Any, List, Mapping, Optional, Type, Union
 
-from pydantic import BaseModel, Field, root_validator, validator
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, root_validator, validator
+from pydantic.error_wrappers import ErrorWrapper
 
 from igenius_adapters_sdk.entities import data, params, uri
 
@@ -18,23 +23,76 @@ class CriteriaType(str, Enum):
     OR = "or"
 
 
+class _Fingerprinted(BaseModel, abc.ABC):
+    """A model with a canonical digest of its content, stable across processes.
+
+    The models are immutable, so the digest is computed once; the digests of the parent models are
+    computed from the ones of their children."""
+
+    _fingerprint: Optional[str] = PrivateAttr(None)
+
+    @abc.abstractmethod
+    def _canonical(self) -> Any:
+        """The JSON-serializable form of the model, equal for models with the same semantics."""
+
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            canonical = json.dumps(self._canonical(), sort_keys=True, separators=(",", ":"), default=_json_default)
+            self._fingerprint = hashlib.sha256(canonical.encode()).hexdigest()
+        return self._fingerprint
+
+    def copy(self, **kwargs):
+        model = super().copy(**kwargs)
+        if kwargs.get("update"):
+            model._fingerprint = None
+        return model
+
+
+def _canonical_uri(value: uri.UriModel) -> List[Any]:
+    return [type(value).__name__, *(v for _, v in value._key)]
+
+
+def _canonical_from(from_: "From") -> Any:
+    return from_.fingerprint() if isinstance(from_, Join) else _canonical_uri(from_)
+
+
 class JoinPart(BaseModel):
     from_: "From"
     on: uri.AttributeUri
 
+    @validator("from_", pre=True)
+    def dispatch_from(cls, v):
+        return _parse_from(v)
+
+    class Config:
+        allow_mutation = False
 
-class Join(BaseModel):
+
+class Join(_Fingerprinted):
     left: JoinPart
     right: JoinPart
     type: JoinType  # noqa: A003
 
+    def _canonical(self) -> Any:
+        left, right = ([_canonical_from(part.from_), _canonical_uri(part.on)] for part in (self.left, self.right))
+        join_type = self.type
+        # a right outer join is the left outer join of the swapped parts, an inner join is symmetric
+        if join_type == JoinType.RIGHT_OUTER:
+            left, right, join_type = right, left, JoinType.LEFT_OUTER
+        elif join_type == JoinType.INNER:
+            left, right = sorted([left, right], key=json.dumps)
+        return ["Join", join_type.value, left, right]
+
+    class Config:
+        allow_mutation = False
+
 
 From = Union[uri.CollectionUri, Join]
 # see https://pydantic-docs.helpmanual.io/usage/postponed_annotations/#self-referencing-models
 JoinPart.update_forward_refs()
 
 
-class Expression(BaseModel):
+class Expression(_Fingerprinted):
     attribute_uri: uri.AttributeUri
     operator: str
     value: Any
@@ -47,8 +105,7 @@ class Expression(BaseModel):
     @validator("value")
     def validate_operation_schema(cls, v, values):
         if "operator" in values:
-            schema = params.ParamOperation.from_uid(values["operator"]).properties_schema
-            operation_schema = params.OperationSchemas.from_jsonschema(schema)
+            operation_schema = params.ParamOperation.operation_schema(values["operator"])
             if v is None:
                 v = {}
             if not isinstance(v, dict):
@@ -57,24 +114,74 @@ class Expression(BaseModel):
             return operation_schema.model(**v).dict()
         return v
 
+    def _canonical(self) -> Any:
+        operator = params.ParamOperation.from_uid(self.operator).uid
+        value = self.value
+        if operator == params.ParamOperation.IN.uid and isinstance(value, dict):
+            # the values of IN are a set
+            value = {**value, "data": sorted(set(value["data"]), key=str)}
+        return ["Expression", _canonical_uri(self.attribute_uri), operator, value]
 
-class MultiExpression(BaseModel):
+    class Config:
+        allow_mutation = False
+
+
+class MultiExpression(_Fingerprinted):
     criteria: CriteriaType
     expressions: List[Union["MultiExpression", Expression]]
 
+    @validator("expressions", pre=True)
+    def dispatch_expressions(cls, v):
+        if not isinstance(v, list):
+            return v
+        expressions, errors = [], []
+        for i, item in enumerate(v):
+            try:
+                expressions.append(_parse_where(item))
+            except ValidationError as e:
+                errors.append(ErrorWrapper(e, loc=i))
+        if errors:
+            raise ValidationError(errors, cls)
+        return expressions
+
+    def _canonical(self) -> Any:
+        # AND and OR are commutative and idempotent
+        return ["MultiExpression", self.criteria.value, sorted({e.fingerprint() for e in self.expressions})]
+
+    class Config:
+        allow_mutation = False
+
 
 WhereExpression = Union[MultiExpression, Expression]
 # see https://pydantic-docs.helpmanual.io/usage/postponed_annotations/#self-referencing-models
 MultiExpression.update_forward_refs()
 
 
-class BaseQuery(BaseModel, abc.ABC):
+class BaseQuery(_Fingerprinted, abc.ABC):
     from_: From
     where: Optional[WhereExpression]
     order_by: Optional[List[data.OrderByAttribute]]
     limit: int = Field(None, ge=0)
     offset: int = Field(None, ge=0)
 
+    @validator("from_", pre=True)
+    def dispatch_from(cls, v):
+        return _parse_from(v)
+
+    @validator("where", pre=True)
+    def dispatch_where(cls, v):
+        return _parse_where(v)
+
+    def _canonical(self) -> Any:
+        # the other fields, e.g. the attributes, are lists whose order determines the result
+        fields = {name: getattr(self, name) for name in self.__fields__ if name not in BaseQuery.__fields__}
+        where = None if self.where is None else self.where.fingerprint()
+        order_by = None if self.order_by is None else [attribute.dict() for attribute in self.order_by]
+        return [type(self).__name__, _canonical_from(self.from_), where, order_by, self.limit, self.offset, fields]
+
+    class Config:
+        allow_mutation = False
+
 
 class SelectQuery(BaseQuery):
     attributes: List[Union[data.ProjectionAttribute, data.StaticValueAttribute]]
@@ -90,7 +197,7 @@ class GroupByQuery(BaseQuery):
     groups: List[data.BinningAttribute]
     bin_interpolation: Optional[bool] = None
 
-    @root_validator
+    @root_validator(skip_on_failure=True)
     def bin_interpolation_flag_validator(cls, values):
         flag = values.get("bin_interpolation")
         groups = values.get("groups")
@@ -103,3 +210,109 @@ class GroupByQuery(BaseQuery):
 
 
 Query = Union[GroupByQuery, AggregationQuery, SelectQuery]
+
+# the first key found in the payload determines the query model
+_QUERY_DISCRIMINATORS = (
+    ("groups", GroupByQuery),
+    ("aggregations", AggregationQuery),
+    ("attributes", SelectQuery),
+)
+
+
+def _parse_from(payload: Any) -> Any:
+    """Validates a From payload as a Join or as a CollectionUri, according to its keys."""
+    if not isinstance(payload, Mapping):
+        return payload
+    if "left" in payload or "right" in payload:
+        return Join.parse_obj(payload)
+    return uri.CollectionUri.parse_obj(payload)
+
+
+def _parse_where(payload: Any) -> Any:
+    """Validates a WhereExpression payload as a MultiExpression or as an Expression, according to its keys."""
+    if not isinstance(payload, Mapping):
+        return payload
+    if "criteria" in payload or "expressions" in payload:
+        return MultiExpression.parse_obj(payload)
+    return Expression.parse_obj(payload)
+
+
+def query_model(payload: Mapping[str, Any]) -> Type[BaseQuery]:
+    """Given a raw query payload, returns the query model it must be validated with,
+    otherwise raises ValueError."""
+    for key, model in _QUERY_DISCRIMINATORS:
+        if key in payload:
+            return model
+    keys = ", ".join(f"'{key}'" for key, _ in _QUERY_DISCRIMINATORS)
+    raise ValueError(f"Unable to determine the query type, the payload must contain one of {keys}")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    return str(value)
+
+
+def payload_hash(payload: Mapping[str, Any]) -> str:
+    """Canonical hash of a raw query payload: insensitive to the order of the mapping keys."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_json_default)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class QueryCache:
+    """Bounded LRU cache of validated queries, keyed by the canonical hash of their raw payload.
+
+    The cached queries are shared between callers, and are immutable."""
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Query]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Query]:
+        with self._lock:
+            query = self._entries.get(key)
+            if query is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return query
+
+    def put(self, key: str, query: Query) -> None:
+        with self._lock:
+            self._entries[key] = query
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def parse_query(payload: Union[Mapping[str, Any], str, bytes], cache: Optional[QueryCache] = None) -> Query:
+    """Validates the raw payload (a mapping or its JSON encoding) into a Query: the query model is chosen
+    from the payload keys, so that exactly one model is validated. When a cache is given, identical payloads
+    are validated once."""
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    if not isinstance(payload, Mapping):
+        raise ValueError("The query payload must be a mapping")
+    if cache is None:
+        return query_model(payload).parse_obj(payload)
+    key = payload_hash(payload)
+    query = cache.get(key)
+    if query is None:
+        query = query_model(payload).parse_obj(payload)
+        cache.put(key, query)
+    return query
@@ -0,0 +1,50 @@
+from typing import Any, ClassVar, Dict, List, Optional, Type
+
+__all__ = [
+    "SpecsRegistry",
+]
+
+
+class SpecsRegistry:
+    """Base class for namespaces of specs, e.g. `AggregationFunction`.
+
+    The specs declared as class attributes are indexed by uid once, when the class is created,
+    so that `from_uid` is a single dictionary lookup. Additional specs can be added at runtime
+    with `register`."""
+
+    _spec_type: ClassVar[Type] = object
+    _specs: ClassVar[Dict[str, Any]] = {}
+
+    def __init_subclass__(cls, spec_type: Optional[Type] = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if spec_type is not None:
+            cls._spec_type = spec_type
+        cls._specs = dict(cls._specs)
+        for value in list(vars(cls).values()):
+            if isinstance(value, cls._spec_type):
+                cls.register(value)
+
+    @classmethod
+    def register(cls, spec: Any) -> Any:
+        """Adds the spec to the registry and returns it, raises ValueError if its uid is already
+        registered with a different spec."""
+        if not isinstance(spec, cls._spec_type):
+            raise TypeError(f"{cls.__name__} accepts {cls._spec_type.__name__} only")
+        registered = cls._specs.setdefault(spec.uid, spec)
+        if registered is not spec:
+            raise ValueError(f"{cls.__name__} uid={spec.uid} already registered")
+        return spec
+
+    @classmethod
+    def from_uid(cls, uid: str) -> Any:
+        """Given a uid, returns its complete spec if found, otherwise raises ValueError."""
+        spec = cls._specs.get(uid)
+        if spec is None:
+            spec = cls._specs.get(uid.lower())
+        if spec is None:
+            raise ValueError(f"Invalid {cls.__name__} uid={uid}")
+        return spec
+
+    @classmethod
+    def specs(cls) -> List[Any]:
+        return list(cls._specs.values())
@@ -1,8 +1,9 @@
 import re
 from os import environ
-from typing import Any, Dict, Optional, Pattern
+from typing import Any, Dict, Optional, Pattern, Tuple
+from weakref import WeakValueDictionary
 
-from pydantic import BaseModel, errors
+from pydantic import BaseModel, PrivateAttr, errors
 from pydantic.utils import update_not_none
 from pydantic.validators import constr_length_validator, strict_str_validator
 
@@ -60,9 +61,58 @@ class DatasourceUid(Uid):
     pass
 
 
+# pool of the URIs validated as fields of other models, see UriModel.validate
+_interned: "WeakValueDictionary[Tuple, UriModel]" = WeakValueDictionary()
+
+
 class UriModel(BaseModel):
+    __slots__ = ("__weakref__",)
+    # URIs are immutable, so their equality key and hash are computed once
+    _key: Optional[Tuple] = PrivateAttr(None)
+    _hash: Optional[int] = PrivateAttr(None)
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        self._set_key()
+
+    def _set_key(self):
+        self._key = tuple(self.__dict__.items())
+        self._hash = hash(self._key)
+
     def __hash__(self):
-        return hash(tuple(self.dict().items()))
+        if self._hash is None:
+            self._set_key()
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, UriModel):
+            return hash(self) == hash(other) and self._key == other._key
+        return super().__eq__(other)
+
+    def copy(self, **kwargs):
+        uri = super().copy(**kwargs)
+        uri._set_key()
+        return uri
+
+    @classmethod
+    def intern(cls, uri: "UriModel") -> "UriModel":
+        """Returns the pooled URI equal to the given one, pooling it if not found."""
+        return _interned.setdefault((type(uri), uri._key), uri)
+
+    @classmethod
+    def validate(cls, value: Any) -> "UriModel":
+        """Validates the URIs used as fields of other models, so that identical URIs share one instance."""
+        if isinstance(value, cls):
+            return cls.intern(value)
+        if isinstance(value, dict):
+            key = tuple((name, value.get(name)) for name in cls.__fields__)
+            try:
+                uri = _interned.get((cls, key))
+            except TypeError:
+                uri = None
+            if uri is not None:
+                return uri
+        return cls.intern(super().validate(value))
 
     class Config:
         allow_mutation = False
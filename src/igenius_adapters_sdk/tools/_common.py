@@ -0,0 +1,30 @@
+"""Helpers shared by the tools modules, not part of their API."""
+
+from typing import Any, Hashable, Tuple
+
+from igenius_adapters_sdk.entities import uri
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+def sort_key(value: Any) -> Tuple[bool, Any]:
+    # None and NaN values last when ascending, first when descending: the order of the engine rows too
+    return value is None or value != value, value if value is not None and value == value else 0
+
+
+def identity(attribute_uri: uri.AttributeUri) -> Hashable:
+    # the key of rows and columns by AttributeUri, e.g. the rows of joins and the frames of the engine
+    return attribute_uri
+
+
+def is_numeric_array(column: Any) -> bool:
+    return numpy is not None and isinstance(column, numpy.ndarray) and column.dtype.kind in "iuf"
+
+
+def nan(column: "numpy.ndarray") -> "numpy.ndarray":
+    if column.dtype.kind == "f":
+        return numpy.isnan(column)
+    return numpy.zeros(len(column), dtype=bool)
@@ -0,0 +1,262 @@
+"""Caches the results of queries, keyed by the fingerprint of the query.
+
+Each result is tagged with the datasources and collections the query reads, so that it can be
+invalidated when their data is known to change:
+
+    results = LRUResultCache(max_bytes=256 * 2 ** 20, ttl=60)
+    rows = Chassis(query=query, engine=engine, cache=results).run()
+    results.invalidate(uri.CollectionUri(datasource_uid="warehouse", collection_uid="orders"))
+
+The cache keeps its own copy of the results, and returns a new copy on each hit: callers may mutate them.
+The numpy columns of columnar results are copied once, read-only, and shared."""
+
+import abc
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, MutableMapping, NamedTuple, Optional, Sequence, Set, Union
+
+from igenius_adapters_sdk.entities import query, uri
+from igenius_adapters_sdk.tools import utils
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = [
+    "LRUResultCache",
+    "ResultCache",
+    "SharedResultCache",
+    "query_tags",
+]
+
+Result = utils.Result
+
+
+def _tag(resource: Union[uri.DatasourceUri, uri.CollectionUri]) -> str:
+    if isinstance(resource, uri.CollectionUri):
+        return f"{resource.datasource_uid}/{resource.collection_uid}"
+    return resource.datasource_uid
+
+
+def _collections(from_: query.From) -> List[uri.CollectionUri]:
+    if isinstance(from_, query.Join):
+        return _collections(from_.left.from_) + _collections(from_.right.from_)
+    return [from_]
+
+
+def query_tags(q: query.Query) -> Set[str]:
+    """The tags of the datasources and collections read by the query."""
+    collections = _collections(q.from_)
+    return {_tag(c) for c in collections} | {c.datasource_uid for c in collections}
+
+
+def _frozen_column(column: Sequence) -> Sequence:
+    if isinstance(column, list):
+        return tuple(column)
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        column = numpy.array(column)
+        column.setflags(write=False)
+    return column
+
+
+def _frozen(result: Result) -> Union[tuple, utils.ColumnarResult]:
+    """A copy of the result that the callers can't change: a tuple of copied rows, or read-only columns."""
+    if isinstance(result, utils.ColumnarResult):
+        return utils.ColumnarResult(tuple(result.columns), [_frozen_column(column) for column in result.data])
+    return tuple(dict(row) for row in result)
+
+
+def _thawed(result: Union[tuple, utils.ColumnarResult]) -> Result:
+    """A new copy of a frozen result, in the form it was cached."""
+    if isinstance(result, utils.ColumnarResult):
+        data = [list(column) if isinstance(column, tuple) else column for column in result.data]
+        return utils.ColumnarResult(result.columns, data)
+    return [dict(row) for row in result]
+
+
+def _sizeof_column(column: Sequence) -> int:
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        # the size of an array owning its data includes it, not the size of a view
+        return sys.getsizeof(column) + (0 if column.base is None else column.nbytes)
+    if hasattr(column, "nbytes"):
+        # buffers, e.g. memoryviews of arrow or array.array columns
+        return sys.getsizeof(column) + column.nbytes
+    return sys.getsizeof(column) + sum(map(sys.getsizeof, column))
+
+
+def _sizeof(result: Result) -> int:
+    """The approximate size in bytes of a result: its rows (or columns), their keys and their scalar values."""
+    size = sys.getsizeof(result)
+    if isinstance(result, utils.ColumnarResult):
+        return size + sum(map(sys.getsizeof, result.columns)) + sum(map(_sizeof_column, result.data))
+    for row in result:
+        size += sys.getsizeof(row)
+        for key, value in row.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class ResultCache(abc.ABC):
+    """The interface of the result caches: results by key, each with its tags and an optional time to live."""
+
+    # the clock of the expiry times of the results
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _expiry(self, ttl: Optional[float]) -> Optional[float]:
+        ttl = self.ttl if ttl is None else ttl
+        return None if ttl is None else self.clock() + ttl
+
+    def get(self, key: str) -> Optional[Result]:
+        """A copy of the result cached with the key, None if missing or expired."""
+        result = self._get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if result is None else _thawed(result)
+
+    def put(self, key: str, result: Result, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        """Caches the result with the key, for `ttl` seconds if given, otherwise for the ttl of the cache."""
+        self._put(key, _frozen(result), frozenset(tags), self._expiry(ttl))
+
+    def invalidate(self, resource: Union[uri.DatasourceUri, uri.CollectionUri]) -> None:
+        """Drops the cached results of the queries reading the datasource or the collection."""
+        self.invalidate_tag(_tag(resource))
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[Result]: ...
+
+    @abc.abstractmethod
+    def _put(self, key: str, result: Result, tags: frozenset, expires: Optional[float]) -> None: ...
+
+    @abc.abstractmethod
+    def invalidate_tag(self, tag: str) -> None: ...
+
+    @abc.abstractmethod
+    def clear(self) -> None: ...
+
+
+class _Entry(NamedTuple):
+    result: Result
+    tags: frozenset
+    expires: Optional[float]
+    size: int = 0
+
+    def expired(self, now: float) -> bool:
+        return self.expires is not None and self.expires <= now
+
+
+class LRUResultCache(ResultCache):
+    """In-process cache, evicting the least recently used results beyond `max_bytes` (estimated) or `maxsize`."""
+
+    def __init__(self, max_bytes: int = 64 * 2**20, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer")
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        super().__init__(ttl)
+        self.max_bytes = max_bytes
+        self.maxsize = maxsize
+        self.size = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        for tag in entry.tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def _get(self, key: str) -> Optional[Result]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expired(self.clock()):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.result
+
+    def _put(self, key: str, result: Result, tags: frozenset, expires: Optional[float]) -> None:
+        size = _sizeof(result)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = _Entry(result, tags, expires, size)
+            self.size += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes or (self.maxsize is not None and len(self._entries) > self.maxsize):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tag(self, tag: str) -> None:
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+
+class SharedResultCache(ResultCache):
+    """Cache over a mapping shared between processes, e.g. a `multiprocessing.Manager().dict()` or a `shelve`.
+
+    The store isn't bounded: expired results are dropped when read, invalidation scans all the entries."""
+
+    # the store may outlive the process, and the monotonic clock is only meaningful within a boot
+    clock = staticmethod(time.time)
+
+    def __init__(self, store: MutableMapping[str, Any], ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.store = store
+
+    def _get(self, key: str) -> Optional[Result]:
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        entry = _Entry(*entry)
+        if entry.expired(self.clock()):
+            self.store.pop(key, None)
+            return None
+        return entry.result
+
+    def _put(self, key: str, result: Result, tags: frozenset, expires: Optional[float]) -> None:
+        # stored as a plain tuple, so that any store can pickle it
+        self.store[key] = (result, tags, expires)
+
+    def invalidate_tag(self, tag: str) -> None:
+        for key, entry in list(self.store.items()):
+            if tag in entry[1]:
+                self.store.pop(key, None)
+
+    def clear(self) -> None:
+        self.store.clear()
@@ -1,23 +1,315 @@
-from typing import Callable, List, Mapping
+import asyncio
+import inspect
+from concurrent.futures import Executor
+from contextlib import AsyncExitStack
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
 
 from pydantic import BaseModel
 
 from igenius_adapters_sdk.entities import query
-from igenius_adapters_sdk.tools import utils
+from igenius_adapters_sdk.tools import cache as caching
+from igenius_adapters_sdk.tools import normalize, utils
+
+
+def _rows(result: Union[Iterable[Mapping], utils.ColumnarResult]) -> Iterable[Mapping]:
+    return result.rows() if isinstance(result, utils.ColumnarResult) else result
+
+
+async def aiterate(rows: Union[Iterable[Mapping], AsyncIterable[Mapping]]) -> AsyncIterator[Mapping]:
+    """Iterates over the rows of any engine result: rows, columnar or async rows."""
+    rows = _rows(rows)
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+def _datasources(from_: query.From) -> List[str]:
+    if isinstance(from_, query.Join):
+        return sorted(set(_datasources(from_.left.from_)) | set(_datasources(from_.right.from_)))
+    return [from_.datasource_uid]
+
+
+def is_async(engine: Callable) -> bool:
+    """Whether the engine is a coroutine function or an async generator function, e.g. its `__call__`."""
+    function = engine if inspect.isfunction(engine) or inspect.ismethod(engine) else getattr(engine, "__call__", engine)
+    return inspect.iscoroutinefunction(function) or inspect.isasyncgenfunction(function)
+
+
+def call(engine: Callable, q: query.Query) -> Any:
+    """Calls a synchronous engine, consuming the rows it returns lazily (e.g. from a generator)."""
+    rows = engine(q)
+    if isinstance(rows, (list, utils.ColumnarResult)) or inspect.isawaitable(rows) or hasattr(rows, "__aiter__"):
+        return rows
+    return list(rows)
+
+
+class RunResult(NamedTuple):
+    """The result of a query run by `Chassis.run_many`, or the exception it raised, with its timings in seconds:
+    `waited` for the concurrency limits, `elapsed` running."""
+
+    result: Union[utils.Result, BaseException]
+    waited: float
+    elapsed: float
+
+
+class _Limits:
+    """The semaphores bounding the queries running at once, overall and per datasource."""
+
+    def __init__(self, concurrency: Optional[int], per_datasource_limit: Union[int, Mapping[str, int], None]):
+        self.overall = asyncio.Semaphore(concurrency) if concurrency else None
+        self.per_datasource_limit = per_datasource_limit
+        self.datasources: Dict[str, asyncio.Semaphore] = {}
+
+    def _limit(self, datasource_uid: str) -> Optional[int]:
+        if isinstance(self.per_datasource_limit, Mapping):
+            return self.per_datasource_limit.get(datasource_uid)
+        return self.per_datasource_limit
+
+    def semaphores(self, q: query.Query) -> List[asyncio.Semaphore]:
+        # always acquired in the same order, datasources sorted by uid, so queries over several don't deadlock;
+        # the overall one last, so that a query waiting for a busy datasource doesn't hold a slot of the others
+        semaphores = []
+        for datasource_uid in _datasources(q.from_):
+            limit = self._limit(datasource_uid)
+            if limit:
+                if datasource_uid not in self.datasources:
+                    self.datasources[datasource_uid] = asyncio.Semaphore(limit)
+                semaphores.append(self.datasources[datasource_uid])
+        return semaphores if self.overall is None else [*semaphores, self.overall]
+
+
+class _Flight:
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces the concurrent executions with the same key onto a single one, whose result (or exception)
+    is shared by all the callers: the results must not be mutated.
+
+    Cancelling a caller doesn't affect the others; the execution is cancelled with its last caller."""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    @property
+    def shared(self) -> int:
+        """The calls served by the execution of another call."""
+        return self.calls - self.executions
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: str, function: Callable[[], Awaitable]) -> Any:
+        """The result of `function()`, unless an execution with the same key is already in flight."""
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(function()))
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+        flight.waiters += 1
+        try:
+            # shielded, so that cancelling a caller doesn't cancel the execution shared with the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                self._land(key, flight)
+                flight.task.cancel()
 
 
 class Chassis(BaseModel):
     query: query.Query
     engine: Callable
+    normalize: bool = False
+    # the executor running synchronous engines and large bin interpolations in async_run, None for the default one
+    executor: Optional[Executor] = None
+    # the rows above which bin interpolation is run in the executor, None to always run it in the event loop
+    offload_threshold: Optional[int] = 10_000
+    # the cache of the final results, and their time to live (None for the ttl of the cache)
+    cache: Optional[caching.ResultCache] = None
+    cache_ttl: Optional[float] = None
+    # coalesces the concurrent async runs of equal queries, all with the same engine
+    single_flight: Optional[SingleFlight] = None
+    # fills the bins only within the observed combinations of the non-binned groups, see `utils.BinInterpolator`
+    sparse_interpolation: bool = False
 
-    async def async_run(self) -> List[Mapping]:
-        result = await self.engine(self.query)
-        if hasattr(self.query, "bin_interpolation") and self.query.bin_interpolation:
-            result = utils.bin_interpolation(self.query, result)
-        return result
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _requires_bin_interpolation(self) -> bool:
+        return bool(getattr(self.query, "bin_interpolation", None))
+
+    def _engine_query(self) -> Optional[query.Query]:
+        """The query to pass to the engine, None if the result is known to be empty.
+
+        Aggregation queries always reach the engine: aggregating no rows still produces one row. When the
+        result is interpolated, the engine returns all its rows: the limit and offset apply to the cells."""
+        q = self.query
+        if self._requires_bin_interpolation() and (q.limit is not None or q.offset is not None):
+            q = q.copy(update={"limit": None, "offset": None})
+        if not self.normalize:
+            return q
+        q = normalize.normalize_query(q)
+        if normalize.is_always_false(q.where) and not isinstance(q, query.AggregationQuery):
+            return None
+        return q
+
+    def _key(self) -> str:
+        """The key of the result in the cache and in the single flight: sparse interpolations differ."""
+        key = self.query.fingerprint()
+        return f"{key}:sparse" if self.sparse_interpolation and self._requires_bin_interpolation() else key
 
-    def run(self) -> List[Mapping]:
-        result = self.engine(self.query)
-        if hasattr(self.query, "bin_interpolation") and self.query.bin_interpolation:
-            result = utils.bin_interpolation(self.query, result)
+    def _cached(self) -> Optional[utils.Result]:
+        return None if self.cache is None else self.cache.get(self._key())
+
+    def _store(self, result: Union[utils.Result, Iterable[Mapping]]) -> Union[utils.Result, Iterable[Mapping]]:
+        if self.cache is None:
+            return result
+        if not isinstance(result, (list, utils.ColumnarResult)):
+            # the rows of an iterator (e.g. a generator) can be read once: both cached and returned as a list
+            result = list(result)
+        self.cache.put(self._key(), result, caching.query_tags(self.query), self.cache_ttl)
         return result
+
+    async def _offload(self, function: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def async_run(self) -> utils.Result:
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        if self.single_flight is not None:
+            return await self.single_flight.do(self._key(), self._async_execute)
+        return await self._async_execute()
+
+    async def _async_execute(self) -> utils.Result:
+        q = self._engine_query()
+        if q is None:
+            result = []
+        elif is_async(self.engine):
+            result = self.engine(q)
+        else:
+            result = await self._offload(call, self.engine, q)
+        if inspect.isawaitable(result):
+            result = await result
+        if hasattr(result, "__aiter__"):
+            result = [row async for row in result]
+        elif not isinstance(result, (list, utils.ColumnarResult)):
+            # e.g. an iterator returned by an async engine, as `call` does for the synchronous ones
+            result = list(result)
+        if self._requires_bin_interpolation():
+            if self.offload_threshold is not None and len(result) > self.offload_threshold:
+                result = await self._offload(utils.bin_interpolation, self.query, result, self.sparse_interpolation)
+            else:
+                result = utils.bin_interpolation(self.query, result, self.sparse_interpolation)
+        return self._store(result)
+
+    def run(self) -> utils.Result:
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        q = self._engine_query()
+        result = [] if q is None else self.engine(q)
+        if self._requires_bin_interpolation():
+            result = utils.bin_interpolation(self.query, result, self.sparse_interpolation)
+        return self._store(result)
+
+    def iter_run(self) -> Iterator[Mapping]:
+        # streamed results are never built in memory, so they're only read from the cache
+        cached = self._cached()
+        if cached is not None:
+            yield from _rows(cached)
+            return
+        q = self._engine_query()
+        result = [] if q is None else self.engine(q)
+        if self._requires_bin_interpolation():
+            result = utils.iter_bin_interpolation(self.query, result, self.sparse_interpolation)
+        yield from _rows(result)
+
+    async def aiter_run(self) -> AsyncIterator[Mapping]:
+        cached = self._cached()
+        if cached is not None:
+            for row in _rows(cached):
+                yield row
+            return
+        q = self._engine_query()
+        result = [] if q is None else self.engine(q)
+        if inspect.isawaitable(result):
+            result = await result
+        if not self._requires_bin_interpolation():
+            async for row in aiterate(result):
+                yield row
+            return
+        interpolator = utils.BinInterpolator(self.query, self.sparse_interpolation)
+        async for row in aiterate(result):
+            interpolator.feed(row)
+        for cell in interpolator.cells():
+            yield cell
+
+    @classmethod
+    async def run_many(
+        cls,
+        queries: Sequence[query.Query],
+        engine: Callable,
+        concurrency: Optional[int] = None,
+        per_datasource_limit: Union[int, Mapping[str, int], None] = None,
+        return_exceptions: bool = False,
+        **options: Any,
+    ) -> List[RunResult]:
+        """Runs the queries concurrently with `async_run`, at most `concurrency` at once and at most
+        `per_datasource_limit` at once on each datasource (an int for all of them, or by datasource uid).
+
+        The results are in the order of the queries. The first exception raised is propagated, unless
+        `return_exceptions` is set: then it's returned as the result of its query. The other
+        `options` are the fields of the chassis of each query."""
+        limits = _Limits(concurrency, per_datasource_limit)
+
+        async def run(q: query.Query) -> RunResult:
+            # the clock of the event loop, which times the sleeps of the engines too
+            clock = asyncio.get_running_loop().time
+            queued = clock()
+            async with AsyncExitStack() as stack:
+                for semaphore in limits.semaphores(q):
+                    await stack.enter_async_context(semaphore)
+                started = clock()
+                try:
+                    result = await cls(query=q, engine=engine, **options).async_run()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                return RunResult(result, started - queued, clock() - started)
+
+        tasks = [asyncio.ensure_future(run(q)) for q in queries]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
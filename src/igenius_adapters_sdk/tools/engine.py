@@ -0,0 +1,386 @@
+"""In-memory columnar engine, executing the whole query model over column arrays.
+
+It can be used as a `Chassis` engine by adapters of file-like or API-backed datasources:
+
+    engine = ColumnarEngine({collection_uri: {"price": [...], "created": [...]}})
+    result = Chassis(query=query, engine=engine).run()
+
+Columns can be any sequence; NumPy arrays take a vectorized path for filtering, binning and
+aggregations when NumPy is installed."""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from igenius_adapters_sdk.entities import attribute, data, query, uri
+from igenius_adapters_sdk.entities.numeric_binning import BinningRules
+from igenius_adapters_sdk.tools import _common, predicate, pushdown
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = [
+    "ColumnarEngine",
+    "Frame",
+]
+
+Column = Sequence[Any]
+Selection = Optional[Sequence[int]]
+
+
+def _is_array(column: Any) -> bool:
+    return numpy is not None and isinstance(column, numpy.ndarray)
+
+
+def _to_list(column: Column) -> List[Any]:
+    return column.tolist() if _is_array(column) else list(column)
+
+
+class Frame:
+    """Columns of equal length, keyed by the AttributeUri of the attribute they hold."""
+
+    def __init__(self, columns: Mapping[uri.AttributeUri, Column], length: int):
+        self.columns = dict(columns)
+        self.length = length
+
+    @classmethod
+    def from_collection(cls, collection_uri: uri.CollectionUri, columns: Mapping[str, Column]) -> "Frame":
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"columns of collection {collection_uri.collection_uid} have different lengths")
+        keys = {
+            uri.AttributeUri(
+                datasource_uid=collection_uri.datasource_uid,
+                collection_uid=collection_uri.collection_uid,
+                attribute_uid=attribute_uid,
+            ): column
+            for attribute_uid, column in columns.items()
+        }
+        return cls(keys, lengths.pop() if lengths else 0)
+
+    def column(self, attribute_uri: uri.AttributeUri) -> Column:
+        try:
+            return self.columns[attribute_uri]
+        except KeyError:
+            raise ValueError(
+                f"attribute {attribute_uri.attribute_uid} not found in collection {attribute_uri.collection_uid}"
+            )
+
+    __getitem__ = column
+
+    def values(self, attribute_uri: uri.AttributeUri, selection: Selection = None) -> Column:
+        """The column of the attribute, restricted to the selected rows."""
+        column = self.column(attribute_uri)
+        if selection is None:
+            return column
+        if _is_array(column):
+            return column[numpy.asarray(selection, dtype=int)]
+        return [column[i] for i in selection]
+
+    def take(self, indexes: Sequence[Optional[int]]) -> "Frame":
+        """A new frame with the rows at the given indexes, None indexes produce rows of None values."""
+        if None not in indexes:
+            return Frame({key: self.values(key, indexes) for key in self.columns}, len(indexes))
+        columns = {}
+        for key, column in self.columns.items():
+            column = _to_list(column)
+            columns[key] = [None if i is None else column[i] for i in indexes]
+        return Frame(columns, len(indexes))
+
+    def merge(self, other: "Frame") -> "Frame":
+        return Frame({**self.columns, **other.columns}, self.length)
+
+
+# WHERE
+
+
+def _select(frame: Frame, where: Optional[query.WhereExpression]) -> Selection:
+    """The indexes of the rows matching the where expression, None for all the rows."""
+    if where is None:
+        return None
+    selection = predicate.compile_where(where, key=_common.identity).select(frame, range(frame.length))
+    return selection.tolist() if _is_array(selection) else list(selection)
+
+
+# JOIN
+
+
+def _hash_join(left: Frame, right: Frame, join: pushdown.JoinNode) -> Frame:
+    left_keys = _to_list(left.column(join.left_on))
+    right_keys = _to_list(right.column(join.right_on))
+    table: Dict[Hashable, List[int]] = {}
+    for i, key in enumerate(right_keys):
+        if key is not None:
+            table.setdefault(key, []).append(i)
+    left_indexes: List[Optional[int]] = []
+    right_indexes: List[Optional[int]] = []
+    matched = set()
+    for i, key in enumerate(left_keys):
+        matches = table.get(key, ()) if key is not None else ()
+        for j in matches:
+            left_indexes.append(i)
+            right_indexes.append(j)
+        matched.update(matches)
+        if not matches and join.type == query.JoinType.LEFT_OUTER:
+            left_indexes.append(i)
+            right_indexes.append(None)
+    if join.type == query.JoinType.RIGHT_OUTER:
+        unmatched = [j for j in range(right.length) if j not in matched]
+        left_indexes.extend([None] * len(unmatched))
+        right_indexes.extend(unmatched)
+    return left.take(left_indexes).merge(right.take(right_indexes))
+
+
+# GROUP BY
+
+
+def _fromisoformat(value: str) -> Union[date, datetime]:
+    """Parses an ISO date or datetime, keeping dates as dates; the "Z" suffix of UTC is accepted before Python 3.11."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+
+
+def _truncate(value: Any, function_uid: str) -> Any:
+    if value is None:
+        return None
+    parsed = _fromisoformat(value) if isinstance(value, str) else value
+    day = date(parsed.year, parsed.month, parsed.day)
+    if function_uid == attribute.GroupByFunction.DATE_TRUNC_WEEK.uid:
+        day -= timedelta(days=day.weekday())
+    elif function_uid in MONTHS_PER_PERIOD:
+        months = MONTHS_PER_PERIOD[function_uid]
+        day = date(day.year, (day.month - 1) // months * months + 1, 1)
+    truncated = datetime(day.year, day.month, day.day, tzinfo=parsed.tzinfo) if isinstance(parsed, datetime) else day
+    return truncated.isoformat() if isinstance(value, str) else truncated
+
+
+MONTHS_PER_PERIOD = {
+    attribute.GroupByFunction.DATE_TRUNC_MONTH.uid: 1,
+    attribute.GroupByFunction.DATE_TRUNC_QUARTER.uid: 3,
+    attribute.GroupByFunction.DATE_TRUNC_SEMESTER.uid: 6,
+    attribute.GroupByFunction.DATE_TRUNC_YEAR.uid: 12,
+}
+DATE_TRUNC_FUNCTIONS = {
+    attribute.GroupByFunction.DATE_TRUNC_DAY.uid,
+    attribute.GroupByFunction.DATE_TRUNC_WEEK.uid,
+    *MONTHS_PER_PERIOD,
+}
+
+
+def _group_values(frame: Frame, group: data.BinningAttribute, selection: Selection) -> List[Any]:
+    values = frame.values(group.attribute_uri, selection)
+    function_uri = group.function_uri
+    if isinstance(function_uri.function_params, BinningRules):
+        return function_uri.function_params.assign(values)
+    if function_uri.function_uid in DATE_TRUNC_FUNCTIONS:
+        return [_truncate(v, function_uri.function_uid) for v in _to_list(values)]
+    if function_uri.function_uid == attribute.GroupByFunction.IDENTITY.uid:
+        return _to_list(values)
+    raise ValueError(f"unsupported group by function {function_uri.function_uid}")
+
+
+class _Groups:
+    """The distinct group keys in order of appearance, the positions of the rows of each group,
+    and the group code of each row."""
+
+    def __init__(self, keys: Iterable[Tuple]):
+        codes_by_key: Dict[Tuple, int] = {}
+        self.positions: List[List[int]] = []
+        self.codes: List[int] = []
+        for position, key in enumerate(keys):
+            code = codes_by_key.setdefault(key, len(codes_by_key))
+            if code == len(self.positions):
+                self.positions.append([])
+            self.positions[code].append(position)
+            self.codes.append(code)
+        self.keys = list(codes_by_key)
+
+
+# AGGREGATIONS
+
+
+def _present(values: List[Any]) -> List[Any]:
+    return [v for v in values if v is not None and v == v]
+
+
+def _sum(values):
+    present = _present(values)
+    return sum(present) if present else None
+
+
+def _avg(values):
+    present = _present(values)
+    return sum(present) / len(present) if present else None
+
+
+def _min(values):
+    present = _present(values)
+    return min(present) if present else None
+
+
+def _max(values):
+    present = _present(values)
+    return max(present) if present else None
+
+
+REDUCERS: Dict[str, Callable[[List[Any]], Any]] = {
+    attribute.AggregationFunction.IDENTITY.uid: lambda values: values[0] if values else None,
+    attribute.AggregationFunction.AVG.uid: _avg,
+    attribute.AggregationFunction.COUNT.uid: lambda values: len(_present(values)),
+    attribute.AggregationFunction.SUM.uid: _sum,
+    attribute.AggregationFunction.DISTINCT_COUNT.uid: lambda values: len(set(_present(values))),
+    attribute.AggregationFunction.MIN.uid: _min,
+    attribute.AggregationFunction.MAX.uid: _max,
+}
+
+
+def _vectorized_reduce(function_uid: str, values: "numpy.ndarray", groups: _Groups) -> Optional[List[Any]]:
+    """Reduces a numeric array per group with NumPy, None if the function has no vectorized version."""
+    codes = numpy.asarray(groups.codes, dtype=int)
+    present = ~_common.nan(values)
+    size = len(groups.keys)
+    counts = numpy.bincount(codes[present], minlength=size)
+    if function_uid == attribute.AggregationFunction.COUNT.uid:
+        return counts.tolist()
+    if function_uid in (attribute.AggregationFunction.SUM.uid, attribute.AggregationFunction.AVG.uid):
+        sums = numpy.bincount(codes[present], weights=values[present], minlength=size)
+        if function_uid == attribute.AggregationFunction.AVG.uid:
+            sums = sums / numpy.where(counts == 0, 1, counts)
+        elif values.dtype.kind in "iu":
+            sums = sums.astype(values.dtype)
+        return [s if c else None for s, c in zip(sums.tolist(), counts.tolist())]
+    if function_uid in (attribute.AggregationFunction.MIN.uid, attribute.AggregationFunction.MAX.uid):
+        is_min = function_uid == attribute.AggregationFunction.MIN.uid
+        reduce = numpy.minimum if is_min else numpy.maximum
+        result = numpy.full(size, numpy.inf if is_min else -numpy.inf)
+        reduce.at(result, codes[present], values[present])
+        result = result.astype(values.dtype) if values.dtype.kind in "iu" else result
+        return [r if c else None for r, c in zip(result.tolist(), counts.tolist())]
+    return None
+
+
+def _aggregate(frame: Frame, aggregation: data.AggregationAttribute, selection: Selection, groups: _Groups) -> List:
+    function_uri = aggregation.function_uri
+    if function_uri.function_uid == attribute.AggregationFunction.STATIC.uid:
+        return [function_uri.function_params] * len(groups.keys)
+    values = frame.values(aggregation.attribute_uri, selection)
+    if _common.is_numeric_array(values):
+        result = _vectorized_reduce(function_uri.function_uid, values, groups)
+        if result is not None:
+            return result
+    reducer = REDUCERS.get(function_uri.function_uid)
+    if reducer is None:
+        raise ValueError(f"unsupported aggregation function {function_uri.function_uid}")
+    values = _to_list(values)
+    return [reducer([values[p] for p in positions]) for positions in groups.positions]
+
+
+def _aggregations(
+    frame: Frame, aggregations: List[Union[data.AggregationAttribute, data.StaticValueAttribute]], selection, groups
+) -> Dict[str, List]:
+    columns = {}
+    for aggregation in aggregations:
+        if isinstance(aggregation, data.StaticValueAttribute):
+            columns[aggregation.alias] = [aggregation.value] * len(groups.keys)
+        else:
+            columns[aggregation.alias] = _aggregate(frame, aggregation, selection, groups)
+    return columns
+
+
+# OUTPUT
+
+
+def _projection(frame: Frame, q: query.SelectQuery, selection: Selection) -> Dict[str, List]:
+    length = frame.length if selection is None else len(selection)
+    columns = {}
+    for att in q.attributes:
+        if isinstance(att, data.StaticValueAttribute):
+            columns[att.alias] = [att.value] * length
+        else:
+            columns[att.alias] = _to_list(frame.values(att.attribute_uri, selection))
+    return columns
+
+
+def _group_by(frame: Frame, q: query.GroupByQuery, selection: Selection) -> Dict[str, List]:
+    keys = {group.alias: _group_values(frame, group, selection) for group in q.groups}
+    groups = _Groups(zip(*keys.values()))
+    columns = {alias: [key[i] for key in groups.keys] for i, alias in enumerate(keys)}
+    columns.update(_aggregations(frame, q.aggregations, selection, groups))
+    return columns
+
+
+def _aggregation(frame: Frame, q: query.AggregationQuery, selection: Selection) -> Dict[str, List]:
+    length = frame.length if selection is None else len(selection)
+    groups = _Groups([()] * length)
+    if not length:
+        # aggregating no rows still produces one row
+        groups.keys, groups.positions = [()], [[]]
+    return _aggregations(frame, q.aggregations, selection, groups)
+
+
+def _order(columns: Dict[str, List], order_by: List[data.OrderByAttribute], length: int) -> List[int]:
+    order = list(range(length))
+    for attribute_order in reversed(order_by):
+        if attribute_order.alias not in columns:
+            raise ValueError(f"order by alias {attribute_order.alias} not found")
+        column = columns[attribute_order.alias]
+        order.sort(
+            key=lambda i: _common.sort_key(column[i]), reverse=attribute_order.direction == data.OrderByDirection.DESC
+        )
+    return order
+
+
+def _rows(columns: Dict[str, List], q: query.BaseQuery) -> List[Dict[str, Any]]:
+    aliases = list(columns)
+    rows = zip(*columns.values())
+    if q.order_by:
+        length = len(next(iter(columns.values()), []))
+        order = _order(columns, q.order_by, length)
+        rows = (tuple(columns[alias][i] for alias in aliases) for i in order)
+    if isinstance(q, query.SelectQuery) and q.distinct:
+        rows = dict.fromkeys(rows)
+    rows = list(rows)
+    start = q.offset or 0
+    end = None if q.limit is None else start + q.limit
+    return [dict(zip(aliases, values)) for values in rows[start:end]]
+
+
+class ColumnarEngine:
+    """Executes queries over in-memory collections, each made of named columns of equal length."""
+
+    def __init__(self, collections: Optional[Mapping[uri.CollectionUri, Mapping[str, Column]]] = None):
+        self._frames: Dict[uri.CollectionUri, Frame] = {}
+        for collection_uri, columns in (collections or {}).items():
+            self.register(collection_uri, columns)
+
+    def register(self, collection_uri: uri.CollectionUri, columns: Mapping[str, Column]) -> None:
+        """Adds (or replaces) a collection, given its columns by attribute uid."""
+        self._frames[collection_uri] = Frame.from_collection(collection_uri, columns)
+
+    def load(self, node: pushdown.PlanNode) -> Frame:
+        """The frame of a node of the query plan: the rows of a collection or of a join, filtered by the node."""
+        if isinstance(node, pushdown.JoinNode):
+            frame = _hash_join(self.load(node.left), self.load(node.right), node)
+        elif node.collection in self._frames:
+            frame = self._frames[node.collection]
+        else:
+            raise ValueError(f"collection {node.collection.collection_uid} not found")
+        selection = _select(frame, node.where)
+        return frame if selection is None else frame.take(selection)
+
+    def execute(self, q: query.Query, frame: Frame, selection: Selection = None) -> List[Dict[str, Any]]:
+        """Executes the query over the selected rows of the frame, ignoring its where expression."""
+        if isinstance(q, query.GroupByQuery):
+            columns = _group_by(frame, q, selection)
+        elif isinstance(q, query.AggregationQuery):
+            columns = _aggregation(frame, q, selection)
+        else:
+            columns = _projection(frame, q, selection)
+        return _rows(columns, q)
+
+    def __call__(self, q: query.Query) -> List[Dict[str, Any]]:
+        # the where expression is pushed down the joins, to filter the rows before joining them
+        return self.execute(q, self.load(pushdown.plan(q)))
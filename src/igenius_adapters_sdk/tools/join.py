@@ -0,0 +1,227 @@
+"""Executes queries joining collections of different datasources.
+
+Each datasource has its own engine, taking a query and returning its rows. The where expression of
+the query is pushed down the joins, the subtrees of the join over a single datasource are delegated to
+its engine as a whole, and the other joins are executed here as hash joins: both sides are fetched
+concurrently, the first side to be complete builds the hash table, the other one probes it while its
+rows are still arriving. The joined rows are finally aggregated, sorted and paginated by a `ColumnarEngine`.
+Synchronous engines run in an executor, so that the sides of a join are fetched concurrently.
+
+    executor = JoinExecutor({"warehouse": warehouse_engine, "crm": crm_engine})
+    result = await Chassis(query=query, engine=executor).async_run()"""
+
+import asyncio
+import inspect
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from igenius_adapters_sdk.entities import data, query, uri
+from igenius_adapters_sdk.tools import _common, chassis, engine, predicate, pushdown
+
+__all__ = [
+    "JoinExecutor",
+]
+
+Row = Dict[uri.AttributeUri, Any]
+CollectionKey = Tuple[str, str]
+
+
+def _collection_key(attribute_uri: uri.UriModel) -> CollectionKey:
+    return attribute_uri.datasource_uid, attribute_uri.collection_uid
+
+
+def _collections(node: pushdown.PlanNode) -> List[uri.CollectionUri]:
+    if isinstance(node, pushdown.JoinNode):
+        return _collections(node.left) + _collections(node.right)
+    return [node.collection]
+
+
+def _where_attributes(where: Optional[query.WhereExpression]) -> List[uri.AttributeUri]:
+    if where is None:
+        return []
+    if isinstance(where, query.MultiExpression):
+        return [attribute_uri for expression in where.expressions for attribute_uri in _where_attributes(expression)]
+    return [where.attribute_uri]
+
+
+def _query_attributes(q: query.Query) -> List[uri.AttributeUri]:
+    attributes = getattr(q, "attributes", []) + getattr(q, "aggregations", []) + getattr(q, "groups", [])
+    return [att.attribute_uri for att in attributes if isinstance(att, data.BaseAttribute)]
+
+
+def _plan_attributes(node: pushdown.PlanNode) -> List[uri.AttributeUri]:
+    """The attributes referenced by the join conditions and the filters applied to the joined rows."""
+    if isinstance(node, pushdown.ScanNode):
+        return []
+    own = [node.left_on, node.right_on, *_where_attributes(node.where)]
+    return own + _plan_attributes(node.left) + _plan_attributes(node.right)
+
+
+def _from(node: pushdown.PlanNode) -> query.From:
+    if isinstance(node, pushdown.ScanNode):
+        return node.collection
+    return query.Join(
+        left=query.JoinPart(from_=_from(node.left), on=node.left_on),
+        right=query.JoinPart(from_=_from(node.right), on=node.right_on),
+        type=node.type,
+    )
+
+
+def _where(node: pushdown.PlanNode) -> List[query.WhereExpression]:
+    """The filters of all the nodes of the plan: they were all pushed down from the where of the query."""
+    wheres = [] if node.where is None else [node.where]
+    if isinstance(node, pushdown.JoinNode):
+        wheres += _where(node.left) + _where(node.right)
+    return wheres
+
+
+def _engine(engines: Mapping[str, Callable], datasource_uid: str) -> Callable:
+    if datasource_uid not in engines:
+        raise ValueError(f"no engine for datasource {datasource_uid}")
+    return engines[datasource_uid]
+
+
+async def _fetch(datasource_engine: Callable, q: query.Query, executor: Optional[Executor]) -> AsyncIterator[Mapping]:
+    if chassis.is_async(datasource_engine):
+        rows = datasource_engine(q)
+    else:
+        rows = await asyncio.get_running_loop().run_in_executor(executor, chassis.call, datasource_engine, q)
+    if inspect.isawaitable(rows):
+        rows = await rows
+    async for row in chassis.aiterate(rows):
+        yield row
+
+
+class _Side:
+    """One side of a hash join: its rows are buffered until the other side is complete, then probed."""
+
+    def __init__(self, rows: AsyncIterator[Row]):
+        self.rows = rows
+        self.buffer: List[Row] = []
+        self.probe: Optional[Callable[[Row], None]] = None
+
+    async def drain(self) -> None:
+        async for row in self.rows:
+            if self.probe is None:
+                self.buffer.append(row)
+            else:
+                self.probe(row)
+
+
+class _HashJoin:
+    def __init__(self, node: pushdown.JoinNode, build: List[Row], build_is_left: bool, nulls: Tuple[Row, Row]):
+        self.build = build
+        self.probe_key = node.right_on if build_is_left else node.left_on
+        build_key = node.left_on if build_is_left else node.right_on
+        self.table: Dict[Any, List[int]] = {}
+        for i, row in enumerate(build):
+            if row[build_key] is not None:
+                self.table.setdefault(row[build_key], []).append(i)
+        preserved = {query.JoinType.LEFT_OUTER: True, query.JoinType.RIGHT_OUTER: False}.get(node.type)
+        self.preserve_build = preserved is build_is_left
+        self.preserve_probe = preserved is (not build_is_left)
+        self.build_nulls, self.probe_nulls = nulls if build_is_left else nulls[::-1]
+        self.matched: Set[int] = set()
+        self.output: List[Row] = []
+
+    def probe(self, row: Row) -> None:
+        key = row[self.probe_key]
+        matches = self.table.get(key, ()) if key is not None else ()
+        for i in matches:
+            self.output.append({**self.build[i], **row})
+        if self.preserve_build:
+            self.matched.update(matches)
+        if not matches and self.preserve_probe:
+            self.output.append({**self.build_nulls, **row})
+
+    def finish(self) -> List[Row]:
+        if self.preserve_build:
+            self.output.extend({**row, **self.probe_nulls} for i, row in enumerate(self.build) if i not in self.matched)
+        return self.output
+
+
+class _Execution:
+    """The execution of the plan of a query, given the attributes to fetch from each collection."""
+
+    def __init__(
+        self,
+        engines: Mapping[str, Callable],
+        attributes: Dict[CollectionKey, List[uri.AttributeUri]],
+        executor: Optional[Executor],
+    ):
+        self.engines = engines
+        self.attributes = attributes
+        self.executor = executor
+
+    def node_attributes(self, node: pushdown.PlanNode) -> List[uri.AttributeUri]:
+        return [a for c in _collections(node) for a in self.attributes.get(_collection_key(c), [])]
+
+    async def rows(self, node: pushdown.PlanNode) -> AsyncIterator[Row]:
+        datasources = {c.datasource_uid for c in _collections(node)}
+        if len(datasources) == 1:
+            # the whole subtree is executed by the engine of its datasource
+            attributes = self.node_attributes(node)
+            q = query.SelectQuery(
+                from_=_from(node),
+                attributes=[data.ProjectionAttribute(attribute_uri=a, alias=f"a{i}") for i, a in enumerate(attributes)],
+                where=pushdown.conjunction([c for where in _where(node) for c in pushdown.conjuncts(where)]),
+            )
+            async for row in _fetch(_engine(self.engines, datasources.pop()), q, self.executor):
+                yield {a: row[f"a{i}"] for i, a in enumerate(attributes)}
+        else:
+            for row in await self.join(node):
+                yield row
+
+    async def join(self, node: pushdown.JoinNode) -> List[Row]:
+        left, right = _Side(self.rows(node.left)), _Side(self.rows(node.right))
+        tasks = [asyncio.ensure_future(left.drain()), asyncio.ensure_future(right.drain())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            if len(done) == 2:
+                build_is_left = len(left.buffer) <= len(right.buffer)
+            else:
+                build_is_left = tasks[0] in done
+            build, probe = (left, right) if build_is_left else (right, left)
+            nulls = dict.fromkeys(self.node_attributes(node.left)), dict.fromkeys(self.node_attributes(node.right))
+            hash_join = _HashJoin(node, build.buffer, build_is_left, nulls)
+            for row in probe.buffer:
+                hash_join.probe(row)
+            probe.buffer, probe.probe = [], hash_join.probe
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        rows = hash_join.finish()
+        if node.where is not None:
+            matches = predicate.compile_where(node.where, key=_common.identity)
+            rows = [row for row in rows if matches(row)]
+        return rows
+
+
+class JoinExecutor:
+    """An async engine executing queries over the collections of several datasources, given their engines
+    by datasource uid. Queries over a single datasource are passed as they are to its engine.
+
+    Synchronous engines run in the `executor`, the default one of the event loop if None."""
+
+    def __init__(self, engines: Mapping[str, Callable], executor: Optional[Executor] = None):
+        self.engines = dict(engines)
+        self.executor = executor
+
+    async def __call__(self, q: query.Query) -> List[Mapping]:
+        plan = pushdown.plan(q)
+        datasources = {c.datasource_uid for c in _collections(plan)}
+        if len(datasources) == 1:
+            return [row async for row in _fetch(_engine(self.engines, datasources.pop()), q, self.executor)]
+        attributes: Dict[CollectionKey, List[uri.AttributeUri]] = {}
+        for attribute_uri in _query_attributes(q) + _plan_attributes(plan):
+            collection_attributes = attributes.setdefault(_collection_key(attribute_uri), [])
+            if attribute_uri not in collection_attributes:
+                collection_attributes.append(attribute_uri)
+        rows = await _Execution(self.engines, attributes, self.executor).join(plan)
+        frame = engine.Frame(
+            {a: [row[a] for row in rows] for collection in attributes.values() for a in collection}, len(rows)
+        )
+        return engine.ColumnarEngine().execute(q, frame)
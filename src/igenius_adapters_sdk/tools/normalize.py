@@ -0,0 +1,361 @@
+"""Normalizes where expressions before execution, into smaller equivalent trees.
+
+* nested expressions with the same criteria are flattened, single-child ones are unwrapped
+* duplicated expressions are removed
+* in an AND, the EQUAL/IN, DIFFERENT, range and EMPTY/NOT_EMPTY expressions of each attribute are merged
+* in an OR, the EQUAL/IN expressions of each attribute are merged into one IN
+* contradictions are detected, and propagated up to the root
+
+A filter matching no row normalizes to `ALWAYS_FALSE`, the empty OR; a filter matching every row
+normalizes to None, i.e. no filter. Range and equality values parsing as numbers or ISO 8601 dates are
+compared as such, as they are by numeric and temporal attributes; the type of the attribute isn't known,
+so they're merged only when comparing them as strings, as string attributes do, gives the same result."""
+
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from igenius_adapters_sdk.entities import params, query, uri
+
+__all__ = [
+    "ALWAYS_FALSE",
+    "is_always_false",
+    "normalize_query",
+    "normalize_where",
+]
+
+ALWAYS_FALSE = query.MultiExpression(criteria=query.CriteriaType.OR, expressions=[])
+_ALWAYS_TRUE = query.MultiExpression(criteria=query.CriteriaType.AND, expressions=[])
+
+_EQUAL = params.ParamOperation.EQUAL.uid
+_IN = params.ParamOperation.IN.uid
+_DIFFERENT = params.ParamOperation.DIFFERENT.uid
+_EMPTY = params.ParamOperation.EMPTY.uid
+_NOT_EMPTY = params.ParamOperation.NOT_EMPTY.uid
+_BETWEEN = params.ParamOperation.BETWEEN.uid
+_GREATER_THAN = params.ParamOperation.GREATER_THAN.uid
+_GREATER_THAN_OR_EQUAL_TO = params.ParamOperation.GREATER_THAN_OR_EQUAL_TO.uid
+_LESS_THAN = params.ParamOperation.LESS_THAN.uid
+_LESS_THAN_OR_EQUAL_TO = params.ParamOperation.LESS_THAN_OR_EQUAL_TO.uid
+_RANGES = {_BETWEEN, _GREATER_THAN, _GREATER_THAN_OR_EQUAL_TO, _LESS_THAN, _LESS_THAN_OR_EQUAL_TO}
+
+# a bound is the comparable value, the original string and whether the bound is inclusive
+Bound = Tuple[Any, str, bool]
+
+
+def is_always_false(where: Optional[query.WhereExpression]) -> bool:
+    return (
+        isinstance(where, query.MultiExpression) and where.criteria == query.CriteriaType.OR and not where.expressions
+    )
+
+
+def _is_always_true(where: query.WhereExpression) -> bool:
+    return (
+        isinstance(where, query.MultiExpression) and where.criteria == query.CriteriaType.AND and not where.expressions
+    )
+
+
+def _operation_uid(expression: query.Expression) -> str:
+    return params.ParamOperation.from_uid(expression.operator).uid
+
+
+def _key(where: query.WhereExpression) -> Hashable:
+    if isinstance(where, query.MultiExpression):
+        return where.criteria, tuple(_key(expression) for expression in where.expressions)
+    return where.attribute_uri, _operation_uid(where), tuple(sorted(where.value.items()))
+
+
+def _comparable(value: str) -> Optional[Tuple[str, Any]]:
+    """The kind and the value to compare, None if the value is neither a number nor an ISO 8601 date."""
+    try:
+        number = float(value)
+        return None if number != number else ("number", number)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return "datetime" if parsed.tzinfo is None else "aware-datetime", parsed
+
+
+def _expression(attribute_uri: uri.AttributeUri, operation_uid: str, value: Any = None) -> query.Expression:
+    return query.Expression(attribute_uri=attribute_uri, operator=operation_uid, value=value)
+
+
+def _values_expression(attribute_uri: uri.AttributeUri, values: List[str]) -> query.WhereExpression:
+    if not values:
+        return ALWAYS_FALSE
+    if len(values) == 1:
+        return _expression(attribute_uri, _EQUAL, values[0])
+    return _expression(attribute_uri, _IN, tuple(values))
+
+
+def _values(expression: query.Expression) -> List[str]:
+    data = expression.value["data"]
+    return list(dict.fromkeys(data)) if isinstance(data, tuple) else [data]
+
+
+# RANGES
+
+
+def _bounds(expression: query.Expression, operation_uid: str) -> Tuple[Optional[Bound], Optional[Bound]]:
+    value = expression.value
+    if operation_uid == _BETWEEN:
+        return (value["start"], True), (value["end"], True)
+    inclusive = operation_uid in (_GREATER_THAN_OR_EQUAL_TO, _LESS_THAN_OR_EQUAL_TO)
+    if operation_uid in (_GREATER_THAN, _GREATER_THAN_OR_EQUAL_TO):
+        return (value["data"], inclusive), None
+    return None, (value["data"], inclusive)
+
+
+class _Range:
+    """The intersection of the ranges of an attribute, meaningful only if their values are `comparable`."""
+
+    def __init__(self, expressions: List[Tuple[query.Expression, str]]):
+        self.kind: Optional[str] = None
+        self.lower: Optional[Bound] = None
+        self.upper: Optional[Bound] = None
+        self.comparable = True
+        for expression, operation_uid in expressions:
+            lower, upper = _bounds(expression, operation_uid)
+            if lower is not None:
+                self.lower = self._tighter(self.lower, lower, 1)
+            if upper is not None:
+                self.upper = self._tighter(self.upper, upper, -1)
+
+    def _parse(self, value: str) -> Any:
+        comparable = _comparable(value)
+        if comparable is None or self.kind not in (None, comparable[0]):
+            self.comparable = False
+            return None
+        self.kind = comparable[0]
+        return comparable[1]
+
+    def _tighter(self, current: Optional[Bound], bound: Tuple[str, bool], direction: int) -> Optional[Bound]:
+        parsed = self._parse(bound[0])
+        if not self.comparable:
+            return None
+        if current is not None:
+            order = _compare((parsed, bound[0], bound[1]), current)
+            if order is None:
+                self.comparable = False
+                return None
+            # on equal values, an exclusive bound is tighter than an inclusive one
+            if order * direction < 0 or (order == 0 and (bound[1] or not current[2])):
+                return current
+        return parsed, bound[0], bound[1]
+
+    def accepts(self, values: List[str]) -> bool:
+        """Whether the values are comparable with the bounds."""
+        return self.comparable and all((_comparable(v) or (None,))[0] == self.kind for v in values)
+
+    def is_empty(self) -> bool:
+        if self.lower is None or self.upper is None:
+            return False
+        order = _compare(self.lower, self.upper)
+        if order == 0:
+            return not (self.lower[2] and self.upper[2])
+        return order == 1
+
+    def contains(self, value: str) -> Optional[bool]:
+        """Whether the value is in the range, None if it depends on the type of the attribute."""
+        bound = (_comparable(value)[1], value, True)
+        lower = 1 if self.lower is None else _compare(bound, self.lower)
+        upper = -1 if self.upper is None else _compare(bound, self.upper)
+        if lower is None or upper is None:
+            return None
+        return (lower > 0 or (lower == 0 and self.lower[2])) and (upper < 0 or (upper == 0 and self.upper[2]))
+
+    def expressions(self, attribute_uri: uri.AttributeUri) -> List[query.Expression]:
+        lower, upper = self.lower, self.upper
+        if lower is not None and upper is not None and lower[2] and upper[2]:
+            if lower[1] == upper[1]:
+                return [_expression(attribute_uri, _EQUAL, lower[1])]
+            return [_expression(attribute_uri, _BETWEEN, {"start": lower[1], "end": upper[1]})]
+        expressions = []
+        if lower is not None:
+            expressions.append(
+                _expression(attribute_uri, _GREATER_THAN_OR_EQUAL_TO if lower[2] else _GREATER_THAN, lower[1])
+            )
+        if upper is not None:
+            expressions.append(_expression(attribute_uri, _LESS_THAN_OR_EQUAL_TO if upper[2] else _LESS_THAN, upper[1]))
+        return expressions
+
+
+def _sign(a: Any, b: Any) -> int:
+    return (a > b) - (a < b)
+
+
+def _compare(bound: Bound, other: Bound) -> Optional[int]:
+    """The sign of the comparison of the values of the bounds, None if it differs between the comparable values
+    and the original strings."""
+    order = _sign(bound[0], other[0])
+    return order if order == _sign(bound[1], other[1]) else None
+
+
+# MERGES
+
+
+def _ambiguous(value: str, other: str) -> bool:
+    """Whether the values are written differently but could be equal, e.g. "1" and "1.0" on a numeric attribute."""
+    return value != other and _comparable(value) is not None and _comparable(value) == _comparable(other)
+
+
+def _intersection(values: Optional[List[str]], others: List[str]) -> Optional[List[str]]:
+    """The values in both lists, None if equal values could be written differently (e.g. "1" and "1.0")."""
+    if values is None:
+        return others
+    if any(_ambiguous(v, other) for v in values for other in others):
+        return None
+    return [v for v in values if v in others]
+
+
+def _conjunction(attribute_uri: uri.AttributeUri, expressions: List[Tuple[query.Expression, str]]) -> Optional[List]:
+    """The merged expressions of an attribute in an AND, None if they can't be all true."""
+    operation_uids = {operation_uid for _, operation_uid in expressions}
+    if _EMPTY in operation_uids:
+        # every other operation requires a value
+        return [expressions[0][0]] if operation_uids == {_EMPTY} else None
+    values: Optional[List[str]] = None
+    for expression, operation_uid in expressions:
+        if operation_uid in (_EQUAL, _IN):
+            values = _intersection(values, _values(expression))
+            if values is None:
+                return [expression for expression, _ in expressions]
+    excluded = [expression.value["data"] for expression, operation_uid in expressions if operation_uid == _DIFFERENT]
+    ranges = [(expression, operation_uid) for expression, operation_uid in expressions if operation_uid in _RANGES]
+    range_ = _Range(ranges) if ranges else None
+    if values is not None:
+        merged = _conjunction_values(attribute_uri, values, excluded, range_, ranges)
+    else:
+        merged = _conjunction_ranges(attribute_uri, excluded, range_, ranges)
+    if merged is None:
+        return None
+    merged.extend(
+        expression
+        for expression, operation_uid in expressions
+        if operation_uid not in (_EQUAL, _IN, _DIFFERENT, _NOT_EMPTY) and operation_uid not in _RANGES
+    )
+    if not merged:
+        # NOT_EMPTY is implied by any other operation
+        merged.append(expressions[0][0])
+    return merged
+
+
+def _conjunction_values(attribute_uri, values, excluded, range_, ranges) -> Optional[List]:
+    values = [v for v in values if v not in excluded]
+    # the excluded values that could equal a value written differently are kept as DIFFERENT expressions
+    different = [
+        _expression(attribute_uri, _DIFFERENT, e)
+        for e in dict.fromkeys(excluded)
+        if any(_ambiguous(e, v) for v in values)
+    ]
+    contained = [range_.contains(v) for v in values] if range_ is not None and range_.accepts(values) else [None]
+    if None in contained:
+        merged = [expression for expression, _ in ranges]
+    else:
+        merged, values = [], [v for v, inside in zip(values, contained) if inside]
+    if not values:
+        return None
+    return [_values_expression(attribute_uri, values), *different, *merged]
+
+
+def _conjunction_ranges(attribute_uri, excluded, range_, ranges) -> Optional[List]:
+    merged = [_expression(attribute_uri, _DIFFERENT, v) for v in dict.fromkeys(excluded)]
+    if range_ is None:
+        return merged
+    if not range_.comparable:
+        return merged + [expression for expression, _ in ranges]
+    if range_.is_empty():
+        return None
+    return merged + range_.expressions(attribute_uri)
+
+
+def _disjunction(attribute_uri: uri.AttributeUri, expressions: List[Tuple[query.Expression, str]]) -> List:
+    """The EQUAL and IN expressions of an attribute in an OR, merged in one."""
+    values = [v for expression, _ in expressions for v in _values(expression)]
+    return [_values_expression(attribute_uri, list(dict.fromkeys(values)))]
+
+
+def _merge(children: List[query.WhereExpression], criteria: query.CriteriaType) -> Optional[List]:
+    """Merges the expressions on the same attribute, None if the children of an AND can't be all true."""
+    parts: List[Any] = []
+    groups: Dict[uri.AttributeUri, List[Tuple[query.Expression, str]]] = {}
+    for child in children:
+        if isinstance(child, query.Expression):
+            operation_uid = _operation_uid(child)
+            if criteria == query.CriteriaType.AND or operation_uid in (_EQUAL, _IN):
+                if child.attribute_uri not in groups:
+                    # placeholder of the merged expressions, in the position of the first one
+                    parts.append(child.attribute_uri)
+                    groups[child.attribute_uri] = []
+                groups[child.attribute_uri].append((child, operation_uid))
+                continue
+        parts.append(child)
+    merge = _conjunction if criteria == query.CriteriaType.AND else _disjunction
+    merged = []
+    for part in parts:
+        if isinstance(part, uri.AttributeUri):
+            expressions = groups[part]
+            part = (
+                merge(part, expressions)
+                if len(expressions) > 1 or expressions[0][1] in _RANGES
+                else [expressions[0][0]]
+            )
+            if part is None:
+                return None
+            merged.extend(part)
+        else:
+            merged.append(part)
+    return merged
+
+
+# NORMALIZATION
+
+
+def _normalize_expression(expression: query.Expression) -> query.WhereExpression:
+    operation_uid = _operation_uid(expression)
+    if operation_uid == _IN:
+        return _values_expression(expression.attribute_uri, _values(expression))
+    if operation_uid == _BETWEEN:
+        range_ = _Range([(expression, operation_uid)])
+        if range_.comparable and range_.is_empty():
+            return ALWAYS_FALSE
+    return expression
+
+
+def _normalize(where: query.WhereExpression) -> query.WhereExpression:
+    if isinstance(where, query.Expression):
+        return _normalize_expression(where)
+    children: Dict[Hashable, query.WhereExpression] = {}
+    for child in map(_normalize, where.expressions):
+        flattened = (
+            child.expressions
+            if isinstance(child, query.MultiExpression) and child.criteria == where.criteria
+            else [child]
+        )
+        for expression in flattened:
+            children.setdefault(_key(expression), expression)
+    if where.criteria == query.CriteriaType.AND and any(map(is_always_false, children.values())):
+        return ALWAYS_FALSE
+    if where.criteria == query.CriteriaType.OR and any(map(_is_always_true, children.values())):
+        return _ALWAYS_TRUE
+    merged = _merge(list(children.values()), where.criteria)
+    if merged is None:
+        return ALWAYS_FALSE
+    if len(merged) == 1:
+        return merged[0]
+    return query.MultiExpression(criteria=where.criteria, expressions=merged)
+
+
+def normalize_where(where: Optional[query.WhereExpression]) -> Optional[query.WhereExpression]:
+    """The normalized where expression: `ALWAYS_FALSE` if it matches no row, None if it matches every row."""
+    if where is None:
+        return None
+    normalized = _normalize(where)
+    return None if _is_always_true(normalized) else normalized
+
+
+def normalize_query(q: query.Query) -> query.Query:
+    """A copy of the query with its where expression normalized."""
+    return q.copy(update={"where": normalize_where(q.where)})
@@ -0,0 +1,252 @@
+"""Compiles a where expression into a reusable predicate, so that local filtering doesn't walk
+the expression tree and dispatch on the operator uid for every row.
+
+    predicate = compile_where(query.where)
+    rows = [row for row in rows if predicate(row)]
+    indexes = predicate.select(columns, range(length))
+
+The children of AND and OR expressions are ordered by estimated selectivity: AND evaluates the
+most selective child first, OR the least selective one, so both short-circuit as early as possible."""
+
+import abc
+from datetime import date, datetime
+from functools import reduce
+from operator import mul
+from typing import Any, Callable, Dict, Hashable, List, Mapping, NamedTuple, Optional, Sequence, Union
+
+from igenius_adapters_sdk.entities import params, query, uri
+from igenius_adapters_sdk.tools import _common
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = [
+    "Predicate",
+    "compile_where",
+]
+
+Indexes = Union[Sequence[int], "numpy.ndarray"]
+Key = Callable[[uri.AttributeUri], Hashable]
+
+
+def _attribute_uid(attribute_uri: uri.AttributeUri) -> Hashable:
+    return attribute_uri.attribute_uid
+
+
+def _coerce(value: str, sample: Any) -> Any:
+    """Converts the string value of an expression to the type of the sample value."""
+    try:
+        if isinstance(sample, bool):
+            return value.lower() in ("true", "1")
+        if isinstance(sample, (int, float)) or (numpy is not None and isinstance(sample, numpy.number)):
+            return float(value)
+        if isinstance(sample, datetime):
+            return datetime.fromisoformat(value)
+        if isinstance(sample, date):
+            return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"value {value!r} is not comparable with the attribute values")
+    return value
+
+
+def _scalar(value: Mapping[str, Any], coerce: Callable[[str], Any]) -> Any:
+    return coerce(value["data"])
+
+
+def _range(value: Mapping[str, Any], coerce: Callable[[str], Any]) -> Any:
+    return coerce(value["start"]), coerce(value["end"])
+
+
+def _set(value: Mapping[str, Any], coerce: Callable[[str], Any]) -> Any:
+    return frozenset(coerce(v) for v in value["data"])
+
+
+def _text(value: Mapping[str, Any], coerce: Callable[[str], Any]) -> Any:
+    return value["data"]
+
+
+def _nothing(value: Mapping[str, Any], coerce: Callable[[str], Any]) -> Any:
+    return None
+
+
+class _Operation(NamedTuple):
+    operand: Callable[[Mapping[str, Any], Callable[[str], Any]], Any]
+    test: Callable[[Any, Any], bool]
+    vectorized: Optional[Callable[["numpy.ndarray", Any], "numpy.ndarray"]]
+    selectivity: float
+    # whether None and NaN values are passed to the test, otherwise they never match
+    missing: bool = False
+
+
+# selectivities are the classic estimates of query optimizers, without statistics on the data
+OPERATIONS: Dict[str, _Operation] = {
+    params.ParamOperation.EQUAL.uid: _Operation(_scalar, lambda v, x: v == x, lambda c, x: c == x, 0.1),
+    params.ParamOperation.DIFFERENT.uid: _Operation(
+        _scalar, lambda v, x: v != x, lambda c, x: (c != x) & ~_common.nan(c), 0.9
+    ),
+    params.ParamOperation.GREATER_THAN.uid: _Operation(_scalar, lambda v, x: v > x, lambda c, x: c > x, 1 / 3),
+    params.ParamOperation.LESS_THAN.uid: _Operation(_scalar, lambda v, x: v < x, lambda c, x: c < x, 1 / 3),
+    params.ParamOperation.GREATER_THAN_OR_EQUAL_TO.uid: _Operation(
+        _scalar, lambda v, x: v >= x, lambda c, x: c >= x, 1 / 3
+    ),
+    params.ParamOperation.LESS_THAN_OR_EQUAL_TO.uid: _Operation(
+        _scalar, lambda v, x: v <= x, lambda c, x: c <= x, 1 / 3
+    ),
+    params.ParamOperation.BETWEEN.uid: _Operation(
+        _range, lambda v, x: x[0] <= v <= x[1], lambda c, x: (c >= x[0]) & (c <= x[1]), 0.25
+    ),
+    params.ParamOperation.IN.uid: _Operation(_set, lambda v, x: v in x, lambda c, x: numpy.isin(c, list(x)), 0.2),
+    params.ParamOperation.CONTAINS.uid: _Operation(_text, lambda v, x: x in str(v), None, 0.25),
+    params.ParamOperation.NOT_CONTAINS.uid: _Operation(_text, lambda v, x: x not in str(v), None, 0.75),
+    params.ParamOperation.STARTS_WITH.uid: _Operation(_text, lambda v, x: str(v).startswith(x), None, 0.25),
+    params.ParamOperation.ENDS_WITH.uid: _Operation(_text, lambda v, x: str(v).endswith(x), None, 0.25),
+    params.ParamOperation.EMPTY.uid: _Operation(
+        _nothing, lambda v, x: v is None or v != v, lambda c, x: _common.nan(c), 0.1, missing=True
+    ),
+    params.ParamOperation.NOT_EMPTY.uid: _Operation(
+        _nothing, lambda v, x: v is not None and v == v, lambda c, x: ~_common.nan(c), 0.9, missing=True
+    ),
+}
+
+
+def _difference(indexes: Indexes, removed: Indexes) -> Indexes:
+    if isinstance(indexes, numpy.ndarray if numpy is not None else ()):
+        return numpy.setdiff1d(indexes, removed, assume_unique=True)
+    removed = set(removed.tolist() if numpy is not None and isinstance(removed, numpy.ndarray) else removed)
+    return [i for i in indexes if i not in removed]
+
+
+def _union(parts: List[Indexes]) -> Indexes:
+    if numpy is not None and any(isinstance(part, numpy.ndarray) for part in parts):
+        return numpy.sort(numpy.concatenate([numpy.asarray(part, dtype=numpy.intp) for part in parts]))
+    return sorted(i for part in parts for i in part)
+
+
+class Predicate(abc.ABC):
+    """A compiled where expression.
+
+    Calling it with a row tells whether the row matches; `select` filters columnar data, given
+    the columns by key and the (ascending) positions of the rows to test."""
+
+    selectivity: float
+
+    @abc.abstractmethod
+    def __call__(self, row: Mapping) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def select(self, columns: Mapping[Hashable, Sequence], indexes: Indexes) -> Indexes:
+        ...
+
+    def mask(self, columns: Mapping[Hashable, Sequence], length: int) -> List[bool]:
+        """One boolean per row, telling whether the row matches."""
+        result = [False] * length
+        for i in self.select(columns, range(length)):
+            result[i] = True
+        return result
+
+
+class _Leaf(Predicate):
+    def __init__(self, expression: query.Expression, key: Key):
+        operation_uid = params.ParamOperation.from_uid(expression.operator).uid
+        if operation_uid not in OPERATIONS:
+            raise ValueError(f"unsupported operation {expression.operator}")
+        self.operation = OPERATIONS[operation_uid]
+        self.selectivity = self.operation.selectivity
+        self.key = key(expression.attribute_uri)
+        self.value = expression.value
+        # operands coerced to the type of the values they are compared to
+        self._operands: Dict[type, Any] = {}
+        self.test = self._compile_test()
+
+    def _operand(self, sample: Any) -> Any:
+        kind = type(sample)
+        if kind not in self._operands:
+            self._operands[kind] = self.operation.operand(self.value, lambda value: _coerce(value, sample))
+        return self._operands[kind]
+
+    def _compile_test(self) -> Callable[[Any], bool]:
+        test, operand, operands = self.operation.test, self._operand, self._operands
+        if self.operation.missing:
+            return lambda v: test(v, None)
+
+        def _test(v):
+            if v is None or v != v:
+                return False
+            kind = type(v)
+            return test(v, operands[kind] if kind in operands else operand(v))
+
+        return _test
+
+    def __call__(self, row: Mapping) -> bool:
+        return self.test(row[self.key])
+
+    def select(self, columns: Mapping[Hashable, Sequence], indexes: Indexes) -> Indexes:
+        column = columns[self.key]
+        if self.operation.vectorized is not None and _common.is_numeric_array(column):
+            indexes = numpy.asarray(indexes, dtype=numpy.intp)
+            values = column if len(indexes) == len(column) else column[indexes]
+            return indexes[self.operation.vectorized(values, self._operand(0.0))]
+        test = self.test
+        return [i for i in indexes if test(column[i])]
+
+
+class _And(Predicate):
+    def __init__(self, children: List[Predicate]):
+        self.children = sorted(children, key=lambda child: child.selectivity)
+        self.selectivity = reduce(mul, (child.selectivity for child in children), 1.0)
+
+    def __call__(self, row: Mapping) -> bool:
+        for child in self.children:
+            if not child(row):
+                return False
+        return True
+
+    def select(self, columns: Mapping[Hashable, Sequence], indexes: Indexes) -> Indexes:
+        # each child only tests the rows still selected by the previous ones
+        for child in self.children:
+            if not len(indexes):
+                break
+            indexes = child.select(columns, indexes)
+        return indexes
+
+
+class _Or(Predicate):
+    def __init__(self, children: List[Predicate]):
+        self.children = sorted(children, key=lambda child: child.selectivity, reverse=True)
+        self.selectivity = 1.0 - reduce(mul, (1.0 - child.selectivity for child in children), 1.0)
+
+    def __call__(self, row: Mapping) -> bool:
+        for child in self.children:
+            if child(row):
+                return True
+        return False
+
+    def select(self, columns: Mapping[Hashable, Sequence], indexes: Indexes) -> Indexes:
+        # each child only tests the rows not yet matched by the previous ones
+        matched = []
+        for child in self.children:
+            if not len(indexes):
+                break
+            hits = child.select(columns, indexes)
+            if len(hits):
+                matched.append(hits)
+                indexes = _difference(indexes, hits)
+        return _union(matched)
+
+
+def _compile(where: query.WhereExpression, key: Key) -> Predicate:
+    if isinstance(where, query.MultiExpression):
+        children = [_compile(expression, key) for expression in where.expressions]
+        return _And(children) if where.criteria == query.CriteriaType.AND else _Or(children)
+    return _Leaf(where, key)
+
+
+def compile_where(where: query.WhereExpression, key: Optional[Key] = None) -> Predicate:
+    """Compiles a where expression into a predicate.
+
+    `key` maps the AttributeUri of each expression to the key of its values in rows and columns,
+    by default the attribute uid."""
+    return _compile(where, key or _attribute_uid)
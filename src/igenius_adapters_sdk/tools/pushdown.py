@@ -0,0 +1,130 @@
+"""Pushes the conjuncts of the where expression of a query down through its join tree.
+
+The plan mirrors the `from_` of the query: every collection becomes a `ScanNode`, every join a
+`JoinNode`, each with the filter to apply to its rows. A conjunct referencing the collections of a
+single side of a join is pushed into that side, unless it's the null-supplying side of an outer
+join; in that case, if the conjunct rejects null values, the outer join is turned into an inner one
+and the conjunct is pushed anyway. The remaining conjuncts filter the rows of the join itself."""
+
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+
+from igenius_adapters_sdk.entities import params, query, uri
+
+__all__ = [
+    "JoinNode",
+    "PlanNode",
+    "ScanNode",
+    "conjunction",
+    "conjuncts",
+    "plan",
+]
+
+CollectionKey = Tuple[str, str]
+
+
+class ScanNode(BaseModel):
+    collection: uri.CollectionUri
+    where: Optional[query.WhereExpression]
+
+    class Config:
+        allow_mutation = False
+
+
+class JoinNode(BaseModel):
+    left: "PlanNode"
+    right: "PlanNode"
+    left_on: uri.AttributeUri
+    right_on: uri.AttributeUri
+    type: query.JoinType  # noqa: A003
+    where: Optional[query.WhereExpression]
+
+    class Config:
+        allow_mutation = False
+
+
+PlanNode = Union[ScanNode, JoinNode]
+# see https://pydantic-docs.helpmanual.io/usage/postponed_annotations/#self-referencing-models
+JoinNode.update_forward_refs()
+
+
+def conjuncts(where: Optional[query.WhereExpression]) -> List[query.WhereExpression]:
+    """The expressions whose conjunction is the where expression."""
+    if where is None:
+        return []
+    if isinstance(where, query.MultiExpression) and where.criteria == query.CriteriaType.AND:
+        return [conjunct for expression in where.expressions for conjunct in conjuncts(expression)]
+    return [where]
+
+
+def conjunction(expressions: List[query.WhereExpression]) -> Optional[query.WhereExpression]:
+    """The where expression matching the rows matched by all the expressions, None if there are none."""
+    if not expressions:
+        return None
+    if len(expressions) == 1:
+        return expressions[0]
+    return query.MultiExpression(criteria=query.CriteriaType.AND, expressions=expressions)
+
+
+def _references(where: query.WhereExpression) -> Set[CollectionKey]:
+    if isinstance(where, query.MultiExpression):
+        return set().union(*map(_references, where.expressions))
+    return {(where.attribute_uri.datasource_uid, where.attribute_uri.collection_uid)}
+
+
+def _collections(from_: query.From) -> Set[CollectionKey]:
+    if isinstance(from_, query.Join):
+        return _collections(from_.left.from_) | _collections(from_.right.from_)
+    return {(from_.datasource_uid, from_.collection_uid)}
+
+
+def _rejects_null(where: query.WhereExpression) -> bool:
+    """Whether the expression is false when all the attributes it references are null."""
+    if isinstance(where, query.MultiExpression):
+        check = any if where.criteria == query.CriteriaType.AND else all
+        return check(map(_rejects_null, where.expressions))
+    return params.ParamOperation.from_uid(where.operator).uid != params.ParamOperation.EMPTY.uid
+
+
+def _side(where: query.WhereExpression, left: Set[CollectionKey], right: Set[CollectionKey]) -> Optional[str]:
+    references = _references(where)
+    if not references:
+        return None
+    if references <= left and not references & right:
+        return "left"
+    if references <= right and not references & left:
+        return "right"
+    return None
+
+
+def _plan(from_: query.From, conjuncts: List[query.WhereExpression]) -> PlanNode:
+    if not isinstance(from_, query.Join):
+        return ScanNode(collection=from_, where=conjunction(conjuncts))
+    left, right = _collections(from_.left.from_), _collections(from_.right.from_)
+    sides = [_side(conjunct, left, right) for conjunct in conjuncts]
+    join_type = from_.type
+    null_supplying = {query.JoinType.LEFT_OUTER: "right", query.JoinType.RIGHT_OUTER: "left"}.get(join_type)
+    if any(side == null_supplying and _rejects_null(c) for c, side in zip(conjuncts, sides)):
+        # the rows of the outer join with null values on that side would be filtered out anyway
+        join_type, null_supplying = query.JoinType.INNER, None
+    pushed: Dict[str, List[query.WhereExpression]] = {"left": [], "right": []}
+    residual = []
+    for conjunct, side in zip(conjuncts, sides):
+        if side is None or side == null_supplying:
+            residual.append(conjunct)
+        else:
+            pushed[side].append(conjunct)
+    return JoinNode(
+        left=_plan(from_.left.from_, pushed["left"]),
+        right=_plan(from_.right.from_, pushed["right"]),
+        left_on=from_.left.on,
+        right_on=from_.right.on,
+        type=join_type,
+        where=conjunction(residual),
+    )
+
+
+def plan(q: query.Query) -> PlanNode:
+    """The plan of the `from_` of the query, with its where expression pushed down the join tree."""
+    return _plan(q.from_, conjuncts(q.where))
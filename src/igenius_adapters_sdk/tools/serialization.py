@@ -0,0 +1,164 @@
+"""Serializes query results and entities to JSON bytes, with orjson when installed.
+
+Results are lists (or iterables) of rows, or columnar results; entities are the pydantic models of
+the SDK, written as by `json(by_alias=True)` but without converting them to dicts first. The output is
+strict JSON: NaN and infinite values are written as null. Bin labels are strings, and are written as
+they are.
+
+    body = dumps(Chassis(query=query, engine=engine).run())
+    for chunk in iter_dumps(Chassis(query=query, engine=engine).iter_run()):
+        response.write(chunk)"""
+
+import json
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from itertools import islice
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from igenius_adapters_sdk.tools import utils
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = [
+    "aiter_dumps",
+    "dumps",
+    "iter_dumps",
+]
+
+ROWS = "rows"
+COLUMNS = "columns"
+
+# the aliases of the fields of each model class
+_aliases: Dict[type, List[Tuple[str, str]]] = {}
+
+
+def _model_fields(model: BaseModel) -> Dict[str, Any]:
+    """The fields of the model by alias, shallow: the nested models are encoded in turn by the encoder,
+    so the model isn't converted as a whole like with `dict()`."""
+    cls = type(model)
+    if cls not in _aliases:
+        _aliases[cls] = [(name, field.alias) for name, field in cls.__fields__.items()]
+    values = model.__dict__
+    return {alias: values[name] for name, alias in _aliases[cls]}
+
+
+def _finite(value: Any) -> Any:
+    """The value with NaN and infinite floats replaced by None, for the standard json encoder."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def _default(value: Any) -> Any:
+    """The JSON-serializable form of the values neither encoder supports natively."""
+    if isinstance(value, BaseModel):
+        return _model_fields(value)
+    if isinstance(value, utils.ColumnarResult):
+        return {"columns": value.columns, "data": value.data}
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if numpy is not None and isinstance(value, (numpy.ndarray, numpy.generic)):
+        return value.tolist()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return _finite(_default(value))
+
+
+def _encoder() -> Callable[[Any], bytes]:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        return lambda value: orjson.dumps(value, default=_default, option=option)
+    encoder = json.JSONEncoder(separators=(",", ":"), default=_json_default, allow_nan=False)
+    return lambda value: encoder.encode(_finite(value)).encode()
+
+
+def dumps(value: Any, orient: str = ROWS) -> bytes:
+    """The JSON encoding of a result or an entity. A columnar result is written as a list of rows, or
+    with `orient="columns"` as `{"columns": [...], "data": [[...], ...]}` (one list per column)."""
+    if orient not in (ROWS, COLUMNS):
+        raise ValueError(f"orient must be {ROWS!r} or {COLUMNS!r}")
+    if isinstance(value, utils.ColumnarResult) and orient == ROWS:
+        value = value.to_rows()
+    elif isinstance(value, Iterator):
+        value = list(value)
+    return _encoder()(value)
+
+
+def _chunks(rows: Iterable[Any], chunk_rows: int) -> Iterator[List[Any]]:
+    rows = iter(rows)
+    chunk = list(islice(rows, chunk_rows))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, chunk_rows))
+
+
+def _columnar_chunks(result: utils.ColumnarResult, chunk_rows: int) -> Iterator[List[Any]]:
+    for start in range(0, len(result), chunk_rows):
+        columns = [column[start : start + chunk_rows] for column in result.data]
+        yield [dict(zip(result.columns, values)) for values in zip(*columns)]
+
+
+def _write(chunk: List[Any], encode: Callable[[Any], bytes], first: bool) -> bytes:
+    # the encoded list without its brackets, so that chunks are concatenated into a single list
+    body = encode(chunk)[1:-1]
+    return body if first else b"," + body
+
+
+def iter_dumps(rows: Iterable[Any], chunk_rows: int = 1000) -> Iterator[bytes]:
+    """The JSON encoding of a list of rows (any iterable, or a columnar result), in chunks of
+    `chunk_rows` rows: the rows are consumed lazily, and their concatenation is a single JSON list."""
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be a positive integer")
+    encode = _encoder()
+    chunks = _columnar_chunks(rows, chunk_rows) if isinstance(rows, utils.ColumnarResult) else _chunks(rows, chunk_rows)
+    yield b"["
+    for i, chunk in enumerate(chunks):
+        yield _write(chunk, encode, not i)
+    yield b"]"
+
+
+async def aiter_dumps(rows: AsyncIterable[Any], chunk_rows: int = 1000) -> AsyncIterator[bytes]:
+    """Same as `iter_dumps`, for rows coming from an async iterable (e.g. `Chassis.aiter_run`)."""
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be a positive integer")
+    encode = _encoder()
+    yield b"["
+    chunk: List[Any] = []
+    first = True
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            yield _write(chunk, encode, first)
+            chunk, first = [], False
+    if chunk:
+        yield _write(chunk, encode, first)
+    yield b"]"
@@ -0,0 +1,473 @@
+"""Compiles queries into parameterized SQL statements.
+
+    compiler = SqlCompiler("postgresql")
+    statement = compiler.compile(query)
+    cursor.execute(statement.sql, statement.params)
+
+Expression values, static values, bin edges and labels, limit and offset are always passed as
+parameters: the SQL text only depends on the shape of the query, and it's rendered once per shape.
+Repeated queries differing only in their values get the very same statement, which also lets the
+database reuse its prepared plans."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from igenius_adapters_sdk.entities import attribute, data, params, query, uri
+from igenius_adapters_sdk.entities.numeric_binning import BinningRules
+
+__all__ = [
+    "CompiledStatement",
+    "Dialect",
+    "MySQL",
+    "PostgreSQL",
+    "SQLite",
+    "SqlCompiler",
+    "TemplateCache",
+]
+
+Params = List[Any]
+
+PLACEHOLDERS: Dict[str, Callable[[int], str]] = {
+    "qmark": lambda position: "?",
+    "numeric": lambda position: f":{position}",
+    "format": lambda position: "%s",
+    "dollar": lambda position: f"${position}",
+}
+
+
+class Dialect:
+    """The SQL flavour of a database: placeholders, identifier quoting, date truncation and pagination."""
+
+    name = "sql"
+    paramstyle = "qmark"
+    quote_char = '"'
+
+    def __init__(self, paramstyle: Optional[str] = None):
+        self.paramstyle = paramstyle or self.paramstyle
+        if self.paramstyle not in PLACEHOLDERS:
+            raise ValueError(f"unsupported paramstyle {self.paramstyle}")
+        self.placeholder = PLACEHOLDERS[self.paramstyle]
+
+    def quote(self, identifier: str) -> str:
+        quoted = self.quote_char + identifier.replace(self.quote_char, self.quote_char * 2) + self.quote_char
+        # with the format paramstyle, drivers interpret every % of the statement
+        return quoted.replace("%", "%%") if self.paramstyle == "format" else quoted
+
+    def date_trunc(self, column: str, function_uid: str) -> str:
+        raise ValueError(f"unsupported group by function {function_uid} for dialect {self.name}")
+
+    def limit_offset(self, limit: Optional[str], offset: Optional[str]) -> str:
+        clauses = []
+        if limit is not None:
+            clauses.append(f"LIMIT {limit}")
+        if offset is not None:
+            clauses.append(f"OFFSET {offset}")
+        return " ".join(clauses)
+
+
+class SQLite(Dialect):
+    """Dates are expected as ISO 8601 strings, truncated dates are returned as "YYYY-MM-DD HH:MM:SS"."""
+
+    name = "sqlite"
+
+    def date_trunc(self, column: str, function_uid: str) -> str:
+        month = f"CAST(SUBSTR(DATE({column}), 6, 2) AS INTEGER)"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_DAY.uid:
+            return f"DATETIME({column}, 'start of day')"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_WEEK.uid:
+            return f"DATETIME({column}, 'start of day', 'weekday 0', '-6 days')"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_MONTH.uid:
+            return f"DATETIME({column}, 'start of month')"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_QUARTER.uid:
+            return f"DATETIME({column}, 'start of year', (({month} - 1) / 3 * 3) || ' months')"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_SEMESTER.uid:
+            return f"DATETIME({column}, 'start of year', (({month} - 1) / 6 * 6) || ' months')"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_YEAR.uid:
+            return f"DATETIME({column}, 'start of year')"
+        return super().date_trunc(column, function_uid)
+
+    def limit_offset(self, limit: Optional[str], offset: Optional[str]) -> str:
+        if limit is None and offset is not None:
+            return f"LIMIT -1 OFFSET {offset}"
+        return super().limit_offset(limit, offset)
+
+
+class PostgreSQL(Dialect):
+    name = "postgresql"
+    paramstyle = "format"
+
+    UNITS = {
+        attribute.GroupByFunction.DATE_TRUNC_DAY.uid: "day",
+        attribute.GroupByFunction.DATE_TRUNC_WEEK.uid: "week",
+        attribute.GroupByFunction.DATE_TRUNC_MONTH.uid: "month",
+        attribute.GroupByFunction.DATE_TRUNC_QUARTER.uid: "quarter",
+        attribute.GroupByFunction.DATE_TRUNC_YEAR.uid: "year",
+    }
+
+    def date_trunc(self, column: str, function_uid: str) -> str:
+        if function_uid in self.UNITS:
+            return f"DATE_TRUNC('{self.UNITS[function_uid]}', {column})"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_SEMESTER.uid:
+            return f"DATE_TRUNC('year', {column}) + INTERVAL '6 months' * FLOOR((EXTRACT(MONTH FROM {column}) - 1) / 6)"
+        return super().date_trunc(column, function_uid)
+
+
+class MySQL(Dialect):
+    name = "mysql"
+    paramstyle = "format"
+    quote_char = "`"
+
+    def date_trunc(self, column: str, function_uid: str) -> str:
+        year = f"MAKEDATE(YEAR({column}), 1)"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_DAY.uid:
+            return f"DATE({column})"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_WEEK.uid:
+            return f"DATE_SUB(DATE({column}), INTERVAL WEEKDAY({column}) DAY)"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_MONTH.uid:
+            return f"{year} + INTERVAL (MONTH({column}) - 1) MONTH"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_QUARTER.uid:
+            return f"{year} + INTERVAL (QUARTER({column}) - 1) * 3 MONTH"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_SEMESTER.uid:
+            return f"{year} + INTERVAL FLOOR((MONTH({column}) - 1) / 6) * 6 MONTH"
+        if function_uid == attribute.GroupByFunction.DATE_TRUNC_YEAR.uid:
+            return year
+        return super().date_trunc(column, function_uid)
+
+    def limit_offset(self, limit: Optional[str], offset: Optional[str]) -> str:
+        if limit is None and offset is not None:
+            return f"LIMIT 18446744073709551615 OFFSET {offset}"
+        return super().limit_offset(limit, offset)
+
+
+DIALECTS: Dict[str, Callable[[], Dialect]] = {
+    SQLite.name: SQLite,
+    PostgreSQL.name: PostgreSQL,
+    MySQL.name: MySQL,
+}
+
+
+class CompiledStatement(NamedTuple):
+    sql: str
+    params: Tuple[Any, ...]
+
+
+class TemplateCache:
+    """Bounded LRU cache of SQL templates, keyed by the shape of the query they were rendered from."""
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, shape: Hashable) -> Optional[str]:
+        with self._lock:
+            sql = self._entries.get(shape)
+            if sql is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(shape)
+            return sql
+
+    def put(self, shape: Hashable, sql: str) -> None:
+        with self._lock:
+            self._entries[shape] = sql
+            self._entries.move_to_end(shape)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# EXPRESSIONS
+# each operation extracts the parameters from the expression value, and renders the condition
+# given the column and the placeholders of the parameters
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _like(pattern: str) -> Callable[[Mapping[str, Any]], Params]:
+    return lambda value: [pattern.format(_escape_like(value["data"]))]
+
+
+class _Operation(NamedTuple):
+    params: Callable[[Mapping[str, Any]], Params]
+    render: Callable[[str, List[str]], str]
+
+
+OPERATIONS: Dict[str, _Operation] = {
+    params.ParamOperation.EQUAL.uid: _Operation(lambda v: [v["data"]], lambda c, p: f"{c} = {p[0]}"),
+    params.ParamOperation.DIFFERENT.uid: _Operation(lambda v: [v["data"]], lambda c, p: f"{c} <> {p[0]}"),
+    params.ParamOperation.GREATER_THAN.uid: _Operation(lambda v: [v["data"]], lambda c, p: f"{c} > {p[0]}"),
+    params.ParamOperation.LESS_THAN.uid: _Operation(lambda v: [v["data"]], lambda c, p: f"{c} < {p[0]}"),
+    params.ParamOperation.GREATER_THAN_OR_EQUAL_TO.uid: _Operation(
+        lambda v: [v["data"]], lambda c, p: f"{c} >= {p[0]}"
+    ),
+    params.ParamOperation.LESS_THAN_OR_EQUAL_TO.uid: _Operation(lambda v: [v["data"]], lambda c, p: f"{c} <= {p[0]}"),
+    params.ParamOperation.BETWEEN.uid: _Operation(
+        lambda v: [v["start"], v["end"]], lambda c, p: f"{c} BETWEEN {p[0]} AND {p[1]}"
+    ),
+    params.ParamOperation.IN.uid: _Operation(
+        lambda v: list(v["data"]), lambda c, p: f"{c} IN ({', '.join(p)})" if p else "1 = 0"
+    ),
+    params.ParamOperation.CONTAINS.uid: _Operation(_like("%{}%"), lambda c, p: f"{c} LIKE {p[0]} ESCAPE '!'"),
+    params.ParamOperation.NOT_CONTAINS.uid: _Operation(_like("%{}%"), lambda c, p: f"{c} NOT LIKE {p[0]} ESCAPE '!'"),
+    params.ParamOperation.STARTS_WITH.uid: _Operation(_like("{}%"), lambda c, p: f"{c} LIKE {p[0]} ESCAPE '!'"),
+    params.ParamOperation.ENDS_WITH.uid: _Operation(_like("%{}"), lambda c, p: f"{c} LIKE {p[0]} ESCAPE '!'"),
+    params.ParamOperation.EMPTY.uid: _Operation(lambda v: [], lambda c, p: f"{c} IS NULL"),
+    params.ParamOperation.NOT_EMPTY.uid: _Operation(lambda v: [], lambda c, p: f"{c} IS NOT NULL"),
+}
+
+AGGREGATIONS: Dict[str, Callable[[str], str]] = {
+    attribute.AggregationFunction.IDENTITY.uid: lambda c: c,
+    attribute.AggregationFunction.AVG.uid: lambda c: f"AVG({c})",
+    attribute.AggregationFunction.COUNT.uid: lambda c: f"COUNT({c})",
+    attribute.AggregationFunction.SUM.uid: lambda c: f"SUM({c})",
+    attribute.AggregationFunction.DISTINCT_COUNT.uid: lambda c: f"COUNT(DISTINCT {c})",
+    attribute.AggregationFunction.MIN.uid: lambda c: f"MIN({c})",
+    attribute.AggregationFunction.MAX.uid: lambda c: f"MAX({c})",
+}
+
+JOINS = {
+    query.JoinType.INNER: "INNER JOIN",
+    query.JoinType.LEFT_OUTER: "LEFT OUTER JOIN",
+    query.JoinType.RIGHT_OUTER: "RIGHT OUTER JOIN",
+}
+
+
+def _operation(expression: query.Expression) -> _Operation:
+    operation_uid = params.ParamOperation.from_uid(expression.operator).uid
+    if operation_uid not in OPERATIONS:
+        raise ValueError(f"unsupported operation {expression.operator}")
+    return OPERATIONS[operation_uid]
+
+
+# SHAPE
+# the shape of a query is everything but its values: it's extracted along with the parameters,
+# in the same order their placeholders appear in the statement
+
+
+def _binning_params(rules: BinningRules) -> Params:
+    bins_params = []
+    for bin_, label in zip(rules.bins, rules.compile().labels):
+        bins_params.extend(edge for edge in (bin_.ge, bin_.lt) if edge is not None)
+        bins_params.append(label)
+    return bins_params
+
+
+def _attribute_shape(att: Any, statement_params: Params) -> Hashable:
+    if isinstance(att, data.StaticValueAttribute):
+        statement_params.append(att.value)
+        return None, att.alias
+    function_uri = getattr(att, "function_uri", None)
+    if function_uri is None:
+        return att.attribute_uri, att.alias
+    if function_uri.function_uid == attribute.AggregationFunction.STATIC.uid:
+        statement_params.append(function_uri.function_params)
+    elif isinstance(function_uri.function_params, BinningRules):
+        statement_params.extend(_binning_params(function_uri.function_params))
+        bounds = tuple((b.ge is not None, b.lt is not None) for b in function_uri.function_params.bins)
+        return att.attribute_uri, att.alias, function_uri.function_uid, bounds
+    return att.attribute_uri, att.alias, function_uri.function_uid
+
+
+def _from_shape(from_: query.From) -> Hashable:
+    if isinstance(from_, query.Join):
+        return from_.type, _from_shape(from_.left.from_), from_.left.on, _from_shape(from_.right.from_), from_.right.on
+    return from_
+
+
+def _where_shape(where: query.WhereExpression, statement_params: Params) -> Hashable:
+    if isinstance(where, query.MultiExpression):
+        return where.criteria, tuple(_where_shape(expression, statement_params) for expression in where.expressions)
+    expression_params = _operation(where).params(where.value)
+    statement_params.extend(expression_params)
+    return where.attribute_uri, where.operator, len(expression_params)
+
+
+def _attributes(q: query.Query) -> List[Any]:
+    if isinstance(q, query.GroupByQuery):
+        return [*q.groups, *q.aggregations]
+    if isinstance(q, query.AggregationQuery):
+        return list(q.aggregations)
+    return list(q.attributes)
+
+
+def _shape(q: query.Query) -> Tuple[Hashable, Params]:
+    statement_params: Params = []
+    attributes = tuple(_attribute_shape(att, statement_params) for att in _attributes(q))
+    where = None if q.where is None else _where_shape(q.where, statement_params)
+    for value in (q.limit, q.offset):
+        if value is not None:
+            statement_params.append(value)
+    order_by = tuple((o.alias, o.direction) for o in q.order_by or ())
+    pagination = q.limit is not None, q.offset is not None
+    distinct = isinstance(q, query.SelectQuery) and q.distinct
+    shape = type(q), attributes, _from_shape(q.from_), where, order_by, pagination, distinct
+    return shape, statement_params
+
+
+# RENDERING
+
+
+class _Renderer:
+    """Renders the SQL template of a query, with placeholders in place of the values."""
+
+    def __init__(self, compiler: "SqlCompiler"):
+        self.compiler = compiler
+        self.dialect = compiler.dialect
+        self.aliases: Dict[Tuple[str, str], str] = {}
+        self.placeholders = 0
+
+    def placeholder(self) -> str:
+        self.placeholders += 1
+        return self.dialect.placeholder(self.placeholders)
+
+    def table(self, collection_uri: uri.CollectionUri) -> str:
+        name = self.compiler.table(collection_uri)
+        parts = (name,) if isinstance(name, str) else name
+        alias = self.aliases.setdefault(
+            (collection_uri.datasource_uid, collection_uri.collection_uid), f"t{len(self.aliases)}"
+        )
+        return f"{'.'.join(self.dialect.quote(part) for part in parts)} AS {alias}"
+
+    def from_(self, from_: query.From) -> str:
+        if not isinstance(from_, query.Join):
+            return self.table(from_)
+        left = self.from_(from_.left.from_)
+        right = self.from_(from_.right.from_)
+        if isinstance(from_.right.from_, query.Join):
+            right = f"({right})"
+        return f"{left} {JOINS[from_.type]} {right} ON {self.column(from_.left.on)} = {self.column(from_.right.on)}"
+
+    def column(self, attribute_uri: uri.AttributeUri) -> str:
+        alias = self.aliases.get((attribute_uri.datasource_uid, attribute_uri.collection_uid))
+        if alias is None:
+            raise ValueError(f"collection {attribute_uri.collection_uid} not found in the query from")
+        return f"{alias}.{self.dialect.quote(self.compiler.column(attribute_uri))}"
+
+    def binning(self, column: str, rules: BinningRules) -> str:
+        whens = []
+        for bin_ in rules.bins:
+            bounds = []
+            if bin_.ge is not None:
+                bounds.append(f"{column} >= {self.placeholder()}")
+            if bin_.lt is not None:
+                bounds.append(f"{column} < {self.placeholder()}")
+            whens.append(f"WHEN {' AND '.join(bounds)} THEN {self.placeholder()}")
+        return f"CASE {' '.join(whens)} END"
+
+    def group(self, att: data.BinningAttribute) -> str:
+        column = self.column(att.attribute_uri)
+        function_uri = att.function_uri
+        if isinstance(function_uri.function_params, BinningRules):
+            return self.binning(column, function_uri.function_params)
+        if function_uri.function_uid == attribute.GroupByFunction.IDENTITY.uid:
+            return column
+        return self.dialect.date_trunc(column, function_uri.function_uid)
+
+    def aggregation(self, att: data.AggregationAttribute) -> str:
+        function_uid = att.function_uri.function_uid
+        if function_uid == attribute.AggregationFunction.STATIC.uid:
+            return self.placeholder()
+        if function_uid not in AGGREGATIONS:
+            raise ValueError(f"unsupported aggregation function {function_uid}")
+        return AGGREGATIONS[function_uid](self.column(att.attribute_uri))
+
+    def expression(self, att: Any) -> str:
+        if isinstance(att, data.StaticValueAttribute):
+            return self.placeholder()
+        if isinstance(att, data.BinningAttribute):
+            return self.group(att)
+        if isinstance(att, data.AggregationAttribute):
+            return self.aggregation(att)
+        return self.column(att.attribute_uri)
+
+    def where(self, where: query.WhereExpression) -> str:
+        if isinstance(where, query.MultiExpression):
+            if not where.expressions:
+                return "1 = 1" if where.criteria == query.CriteriaType.AND else "1 = 0"
+            separator = f" {where.criteria.value.upper()} "
+            return "(" + separator.join(self.where(expression) for expression in where.expressions) + ")"
+        operation = _operation(where)
+        column = self.column(where.attribute_uri)
+        return operation.render(column, [self.placeholder() for _ in operation.params(where.value)])
+
+    def order_by(self, order_by: List[data.OrderByAttribute], aliases: Sequence[str]) -> str:
+        for o in order_by:
+            if o.alias not in aliases:
+                raise ValueError(f"order by alias {o.alias} not found")
+        return ", ".join(f"{self.dialect.quote(o.alias)} {o.direction.value.upper()}" for o in order_by)
+
+    def render(self, q: query.Query) -> str:
+        # the FROM is rendered first to assign the table aliases, but the statement starts with the SELECT
+        from_ = self.from_(q.from_)
+        attributes = _attributes(q)
+        select = ", ".join(f"{self.expression(att)} AS {self.dialect.quote(att.alias)}" for att in attributes)
+        distinct = "DISTINCT " if isinstance(q, query.SelectQuery) and q.distinct else ""
+        clauses = [f"SELECT {distinct}{select}", f"FROM {from_}"]
+        if q.where is not None:
+            clauses.append(f"WHERE {self.where(q.where)}")
+        if isinstance(q, query.GroupByQuery) and q.groups:
+            clauses.append("GROUP BY " + ", ".join(str(i) for i in range(1, len(q.groups) + 1)))
+        if q.order_by:
+            clauses.append("ORDER BY " + self.order_by(q.order_by, [att.alias for att in attributes]))
+        limit = None if q.limit is None else self.placeholder()
+        offset = None if q.offset is None else self.placeholder()
+        if limit is not None or offset is not None:
+            clauses.append(self.dialect.limit_offset(limit, offset))
+        return " ".join(clauses)
+
+
+def _collection_uid(collection_uri: uri.CollectionUri) -> str:
+    return collection_uri.collection_uid
+
+
+def _attribute_uid(attribute_uri: uri.AttributeUri) -> str:
+    return attribute_uri.attribute_uid
+
+
+class SqlCompiler:
+    """Compiles queries into parameterized statements of a SQL dialect.
+
+    `table` maps a CollectionUri to its table name, or to the parts of a qualified name (e.g. schema and
+    table); `column` maps an AttributeUri to its column name. By default they are the collection and the
+    attribute uids. The templates are cached per compiler, up to `maxsize` query shapes."""
+
+    def __init__(
+        self,
+        dialect: Union[str, Dialect] = "sqlite",
+        table: Optional[Callable[[uri.CollectionUri], Union[str, Sequence[str]]]] = None,
+        column: Optional[Callable[[uri.AttributeUri], str]] = None,
+        maxsize: int = 1024,
+    ):
+        if isinstance(dialect, str):
+            if dialect not in DIALECTS:
+                raise ValueError(f"unsupported dialect {dialect}")
+            dialect = DIALECTS[dialect]()
+        self.dialect = dialect
+        self.table = table or _collection_uid
+        self.column = column or _attribute_uid
+        self.cache = TemplateCache(maxsize)
+
+    def compile(self, q: query.Query) -> CompiledStatement:  # noqa: A003
+        shape, statement_params = _shape(q)
+        sql = self.cache.get(shape)
+        if sql is None:
+            sql = _Renderer(self).render(q)
+            self.cache.put(shape, sql)
+        return CompiledStatement(sql, tuple(statement_params))
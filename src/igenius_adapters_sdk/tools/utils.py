@@ -1,38 +1,300 @@
+from functools import reduce
 from itertools import product
-from typing import List, Mapping
+from operator import mul
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
-from igenius_adapters_sdk.entities.numeric_binning import Bin, BinningRules
+from igenius_adapters_sdk.entities.data import OrderByDirection
+from igenius_adapters_sdk.entities.numeric_binning import BinningRules
 from igenius_adapters_sdk.entities.query import GroupByQuery
+from igenius_adapters_sdk.tools import _common
 
 
-def bin_interpolation(query: GroupByQuery, result: List[Mapping]) -> List[Mapping]:
-    binset = {}
-    for att in query.groups:
-        if isinstance(att.function_uri.function_params, BinningRules):
-            binset[att.alias] = att.function_uri.function_params.bins
-        else:
-            binset[att.alias] = list(dict.fromkeys([row[att.alias] for row in result]))
-    default = {d.alias: d.default_bin_interpolation for d in query.aggregations}
-    fullset = []
-    for comb in product(*[[{bins: str(b) if isinstance(b, Bin) else b} for b in binset[bins]] for bins in binset]):
-        partial = {k: v for d in comb for k, v in d.items()}
-        match = []
-        keep = {}
-        for row in result:
-            if any(match):
+def _normalize_group_value(value: Any) -> Any:
+    # the following two lines are related to a postgres issue with None management
+    # see https://igenius.atlassian.net/browse/SQD-922?focusedCommentId=57332
+    if isinstance(value, str):
+        return value.replace("NaN", "None")
+    return value
+
+
+class ColumnarResult:
+    """A result in columnar form: the names of the columns, and the values of each column (any sequence,
+    e.g. a list or an array), all of the same length."""
+
+    __slots__ = ("columns", "data")
+
+    def __init__(self, columns: Sequence[str], data: Sequence[Sequence]):
+        if len(columns) != len(data):
+            raise ValueError(f"{len(columns)} column names for {len(data)} columns")
+        if len({len(column) for column in data}) > 1:
+            raise ValueError("the columns must have the same length")
+        self.columns = list(columns)
+        self.data = list(data)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping], columns: Optional[Sequence[str]] = None) -> "ColumnarResult":
+        """The columnar form of the rows; the columns are the keys of the first row, unless given."""
+        rows = list(rows)
+        if columns is None:
+            columns = list(rows[0]) if rows else []
+        return cls(columns, [[row.get(name) for row in rows] for name in columns])
+
+    def __len__(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ColumnarResult):
+            return NotImplemented
+        return self.columns == other.columns and [list(c) for c in self.data] == [list(c) for c in other.data]
+
+    def __repr__(self) -> str:
+        return f"ColumnarResult(columns={self.columns!r}, rows={len(self)})"
+
+    def __getstate__(self):
+        return self.columns, self.data
+
+    def __setstate__(self, state):
+        self.columns, self.data = state
+
+    def column(self, name: str) -> Sequence:
+        return self.data[self.columns.index(name)]
+
+    def rows(self) -> Iterator[Dict]:
+        """The rows, generated one at a time."""
+        for values in zip(*self.data):
+            yield dict(zip(self.columns, values))
+
+    def to_rows(self) -> List[Dict]:
+        return list(self.rows())
+
+
+Result = Union[List[Mapping], ColumnarResult]
+
+
+def _window(domains: List[Sequence], start: int, stop: Optional[int]) -> Iterator[Tuple]:
+    """The combinations of the cartesian product of the domains from position `start` to `stop`, in product
+    order: the first one is computed from its position, in the mixed radix of the domain sizes, and the
+    previous ones are never generated."""
+    sizes = [len(domain) for domain in domains]
+    total = reduce(mul, sizes, 1)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    if start == 0 and stop == total:
+        yield from product(*domains)
+        return
+    digits, position = [], start
+    for size in reversed(sizes):
+        position, digit = divmod(position, size)
+        digits.append(digit)
+    digits.reverse()
+    for _ in range(stop - start):
+        yield tuple(domain[digit] for domain, digit in zip(domains, digits))
+        for axis in reversed(range(len(digits))):
+            digits[axis] += 1
+            if digits[axis] < sizes[axis]:
                 break
-            match.append(True)
-            for k in row:
-                if k not in partial:
-                    keep[k] = row[k]
-                    continue
-                # the following two lines are related to a postgres issue with None management
-                # see https://igenius.atlassian.net/browse/SQD-922?focusedCommentId=57332
-                if isinstance(row[k], str):
-                    row[k] = row[k].replace("NaN", "None")
-                if partial[k] != row[k]:
-                    match[-1] = False
-                    break
-        partial.update(keep if any(match) else default)
-        fullset.append(partial)
-    return fullset
+            digits[axis] = 0
+
+
+class BinInterpolator:
+    """Incremental bin interpolation: engine rows are fed one at a time, then the
+    interpolated cells are generated lazily, without building the full result in memory.
+
+    The cells are sorted by the `order_by` of the query, and windowed by its `offset` and `limit`. When the
+    query is only ordered by groups, only the cells of the window are generated; ordering by aggregations
+    requires generating and sorting all the cells.
+
+    The cells are the product of the bins of the binned groups and of the values observed for the other
+    groups. With `sparse`, the bins are only filled within the combinations of values of the other groups
+    observed together, bounding the cells to (observed combinations) x (bins)."""
+
+    def __init__(self, query: GroupByQuery, sparse: bool = False):
+        self._domains: Dict[str, Sequence] = {}
+        self._observed: Dict[str, Dict] = {}
+        for att in query.groups:
+            if isinstance(att.function_uri.function_params, BinningRules):
+                self._domains[att.alias] = att.function_uri.function_params.compile().labels
+            else:
+                self._domains[att.alias] = self._observed[att.alias] = {}
+        # with a single non-binned group, its observed values are its observed combinations
+        self._sparse = sparse and len(self._observed) > 1
+        # the combinations of values of the non-binned groups, in sparse mode
+        self._combos: Dict[Tuple, None] = {}
+        self._default = {d.alias: d.default_bin_interpolation for d in query.aggregations}
+        self._index: Dict[Tuple[Hashable, ...], Mapping] = {}
+        self._order = [(o.alias, o.direction == OrderByDirection.DESC) for o in query.order_by or []]
+        self._start = query.offset or 0
+        self._stop = None if query.limit is None else self._start + query.limit
+
+    def feed(self, row: Mapping) -> None:
+        for alias, seen in self._observed.items():
+            seen.setdefault(row[alias], None)
+        if self._sparse:
+            self._combos.setdefault(tuple(row[alias] for alias in self._observed), None)
+        # the first row wins on duplicated group values
+        key = tuple(_normalize_group_value(row.get(alias)) for alias in self._domains)
+        self._index.setdefault(key, row)
+
+    def _axes(self) -> List[Tuple[Tuple[str, ...], Sequence]]:
+        """The axes of the product of the cells: the aliases of each one, and its domain. Each group is an
+        axis, except in sparse mode, where the non-binned groups are a single axis of tuples of values."""
+        if not self._sparse:
+            return [((alias,), domain) for alias, domain in self._domains.items()]
+        first = next(iter(self._observed))
+        axes: List[Tuple[Tuple[str, ...], Sequence]] = []
+        for alias, domain in self._domains.items():
+            if alias not in self._observed:
+                axes.append(((alias,), domain))
+            elif alias == first:
+                axes.append((tuple(self._observed), list(self._combos)))
+        return axes
+
+    def _flatten(self, axes: List[Tuple[str, ...]], combs: Iterable[Tuple]) -> Iterator[Tuple]:
+        """The group values of the combinations of the product of the axes, in the order of the groups."""
+        aliases = [alias for names in axes for alias in names]
+        positions = [aliases.index(alias) for alias in self._domains]
+        identity = positions == list(range(len(positions)))
+        if all(len(names) == 1 for names in axes):
+            for comb in combs:
+                yield comb if identity else tuple(comb[p] for p in positions)
+            return
+        for comb in combs:
+            flat = [v for names, value in zip(axes, comb) for v in (value if len(names) > 1 else (value,))]
+            yield tuple(flat if identity else (flat[p] for p in positions))
+
+    def _axis_order(self, axes: List[Tuple[Tuple[str, ...], Sequence]]) -> Optional[List[int]]:
+        """The axes in the order of the product matching the order_by of the query: the axes in the order_by
+        first. None if there's no such product: when ordered by aggregations, by the groups of an axis with
+        other axes in between, or by only some of the groups of an axis, whose combinations tying on them
+        would all come before the values of the following axes."""
+        index = {alias: i for i, (names, _) in enumerate(axes) for alias in names}
+        order: List[int] = []
+        for alias, _ in self._order:
+            if alias not in index or (index[alias] in order and order[-1] != index[alias]):
+                return None
+            if index[alias] not in order:
+                order.append(index[alias])
+        ordered = {alias for alias, _ in self._order}
+        if any(not set(axes[i][0]) <= ordered for i in order):
+            return None
+        return order + [i for i in range(len(axes)) if i not in order]
+
+    def _sorted_axis(self, names: Tuple[str, ...], domain: Sequence) -> List:
+        """The domain of the axis sorted by the groups of the axis in the order_by, each one in its direction:
+        binned groups in the order of their bins."""
+        domain = list(domain)
+        directions: Dict[str, bool] = {}
+        for alias, descending in self._order:
+            if alias in names:
+                directions.setdefault(alias, descending)
+        for alias, descending in reversed(list(directions.items())):
+            key, position = self._key(alias), names.index(alias)
+            if len(names) == 1:
+                domain.sort(key=key, reverse=descending)
+            else:
+                domain.sort(key=lambda values: key(values[position]), reverse=descending)
+        return domain
+
+    def _combinations(self) -> Optional[Iterator[Tuple]]:
+        """The group values of the cells of the window, when the order_by of the query is the order of a
+        product of the axes, otherwise None."""
+        axes = self._axes()
+        order = self._axis_order(axes)
+        if order is None:
+            return None
+        names = [axes[i][0] for i in order]
+        domains = [self._sorted_axis(*axes[i]) for i in order]
+        return self._flatten(names, _window(domains, self._start, self._stop))
+
+    def _all(self) -> Iterator[Tuple]:
+        """The group values of all the cells, in product order."""
+        axes = self._axes()
+        return self._flatten([names for names, _ in axes], product(*(domain for _, domain in axes)))
+
+    def _key(self, alias: str) -> Callable[[Any], Any]:
+        if alias in self._domains and alias not in self._observed:
+            ranks = {label: i for i, label in enumerate(self._domains[alias])}
+            return lambda value: ranks.get(value, len(ranks))
+        return _common.sort_key
+
+    def _sorted(self, length: int, value: Callable[[str, int], Any]) -> List[int]:
+        """The positions of the window of the cells sorted by the order_by of the query, given the value of
+        each alias in each cell."""
+        order = list(range(length))
+        for alias, descending in reversed(self._order):
+            key = self._key(alias)
+            order.sort(key=lambda i: key(value(alias, i)), reverse=descending)
+        return order[self._start : self._stop]
+
+    def _cell(self, comb: Tuple) -> Dict:
+        partial = dict(zip(self._domains, comb))
+        row = self._index.get(comb)
+        if row is None:
+            partial.update(self._default)
+        else:
+            partial.update((k, v) for k, v in row.items() if k not in partial)
+        return partial
+
+    def columnar_cells(self, result: ColumnarResult) -> ColumnarResult:
+        """The interpolation of a columnar result, as a columnar result: the group columns, then the other
+        columns of the result, then the aggregations missing from the result (None in the matched cells)."""
+        aliases = list(self._domains)
+        groups = [result.column(alias) if alias in result.columns else [None] * len(result) for alias in aliases]
+        for alias, seen in self._observed.items():
+            seen.update(dict.fromkeys(groups[aliases.index(alias)]))
+        if self._sparse:
+            self._combos.update(dict.fromkeys(zip(*(groups[aliases.index(alias)] for alias in self._observed))))
+        positions: Dict[Tuple[Hashable, ...], int] = {}
+        for i, key in enumerate(zip(*groups)):
+            positions.setdefault(tuple(map(_normalize_group_value, key)), i)
+        others = [name for name in result.columns if name not in self._domains]
+        others += [alias for alias in self._default if alias not in others and alias not in self._domains]
+        sources = [result.column(name) if name in result.columns else None for name in others]
+        combinations = self._combinations()
+        data: List[List] = [[] for _ in aliases + others]
+        for comb in self._all() if combinations is None else combinations:
+            i = positions.get(comb)
+            for column, value in zip(data, comb):
+                column.append(value)
+            for column, name, source in zip(data[len(aliases) :], others, sources):
+                if i is None:
+                    column.append(self._default.get(name))
+                else:
+                    column.append(None if source is None else source[i])
+        columns = aliases + others
+        if combinations is None:
+            by_name = dict(zip(columns, data))
+            empty: List = [None] * len(data[0]) if data else []
+            order = self._sorted(len(empty), lambda alias, i: by_name.get(alias, empty)[i])
+            data = [[column[i] for i in order] for column in data]
+        return ColumnarResult(columns, data)
+
+    def cells(self) -> Iterator[Dict]:
+        combinations = self._combinations()
+        if combinations is not None:
+            for comb in combinations:
+                yield self._cell(comb)
+            return
+        cells = [self._cell(comb) for comb in self._all()]
+        for i in self._sorted(len(cells), lambda alias, i: cells[i].get(alias)):
+            yield cells[i]
+
+
+def iter_bin_interpolation(
+    query: GroupByQuery, result: Union[Iterable[Mapping], ColumnarResult], sparse: bool = False
+) -> Iterator[Dict]:
+    if isinstance(result, ColumnarResult):
+        result = result.rows()
+    interpolator = BinInterpolator(query, sparse)
+    for row in result:
+        interpolator.feed(row)
+    yield from interpolator.cells()
+
+
+def bin_interpolation(query: GroupByQuery, result: Result, sparse: bool = False) -> Result:
+    """The interpolated result, in the form of the given one: rows or columns. With `sparse`, the bins are
+    only filled within the observed combinations of values of the non-binned groups."""
+    if isinstance(result, ColumnarResult):
+        return BinInterpolator(query, sparse).columnar_cells(result)
+    return list(iter_bin_interpolation(query, result, sparse))
@@ -1,6 +1,7 @@
 import pytest
 from pydantic import ValidationError
 
+from igenius_adapters_sdk.entities import numeric_binning
 from tests import factories as shf
 
 
@@ -157,3 +158,79 @@ def test_binning_rules_accepts_holes_between_bins(bins):
 )
 def test_bin_string_representation(bin):
     assert str(bin) == str(bin.ge) + "-" + str(bin.lt)
+
+
+class Binning:
+    rules = shf.BinningRulesFactory(
+        bins=[
+            shf.BinFactory(ge=None, lt=0),
+            shf.BinFactory(ge=0, lt=10.5),
+            shf.BinFactory(ge=20, lt=30),
+            shf.BinFactory(ge=30, lt=None),
+        ]
+    )
+    values = [-1e9, -0.1, 0, 10, 10.5, 15, 20, 29.99, 30, float("inf"), None, float("nan")]
+    labels = [
+        "None-0.0",
+        "None-0.0",
+        "0.0-10.5",
+        "0.0-10.5",
+        None,
+        None,
+        "20.0-30.0",
+        "20.0-30.0",
+        "30.0-None",
+        "30.0-None",
+        None,
+        None,
+    ]
+
+
+def test_binning_rules_assign_values_to_bin_labels():
+    assert Binning.labels == Binning.rules.assign(Binning.values)
+    assert Binning.labels == Binning.rules.assign(iter(Binning.values))
+    assert [str(b) for b in Binning.rules.bins] == Binning.rules.compile().labels
+    assert Binning.rules.compile() is Binning.rules.compile()
+
+
+def test_binning_rules_assign_without_numpy(monkeypatch):
+    monkeypatch.setattr(numeric_binning, "numpy", None)
+    assert Binning.labels == Binning.rules.assign(Binning.values)
+
+
+def test_binning_rules_assign_numpy_array():
+    numpy = pytest.importorskip("numpy")
+    values = numpy.array([v if v is not None else numpy.nan for v in Binning.values])
+    assert Binning.labels == Binning.rules.assign(values)
+
+
+def test_binning_rules_copy_recompiles():
+    rules = Binning.rules.copy(update={"bins": Binning.rules.bins[1:]})
+    assert "None-0.0" not in rules.compile().labels
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param(-5, shf.BinFactory(ge=None, lt=0), id="open-start"),
+        pytest.param(10.4, shf.BinFactory(ge=0, lt=10.5), id="inner"),
+        pytest.param(12, None, id="hole"),
+        pytest.param(30, shf.BinFactory(ge=30, lt=None), id="open-end"),
+        pytest.param(None, None, id="none"),
+    ],
+)
+def test_binning_rules_find_bin(value, expected):
+    assert expected == Binning.rules.find_bin(value)
+
+
+def test_binning_rules_label_of():
+    assert ["None-0.0", "0.0-10.5", "20.0-30.0", "30.0-None"] == [Binning.rules.label_of(b) for b in Binning.rules.bins]
+    with pytest.raises(ValueError, match="not found"):
+        Binning.rules.label_of(shf.BinFactory(ge=0, lt=1))
+
+
+def test_binning_rules_validates_many_bins():
+    bins = [shf.BinFactory(ge=i, lt=i + 1) for i in reversed(range(5000))]
+    rules = shf.BinningRulesFactory(bins=bins)
+    assert list(range(5000)) == [b.ge for b in rules.bins]
+    assert "4321.0-4322.0" == rules.assign([4321.5])[0]
@@ -1,13 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
 import pytest
+from pydantic import ValidationError
 
-from igenius_adapters_sdk.entities.query import GroupByQuery, Query
+from igenius_adapters_sdk.entities.params import ParamOperation
+from igenius_adapters_sdk.entities.query import (
+    CriteriaType,
+    GroupByQuery,
+    JoinType,
+    Query,
+    QueryCache,
+    _Fingerprinted,
+    parse_query,
+)
 from tests.factories import (
     AggregationAttributeFactory,
     AggregationQueryFactory,
     BinningAttributeFactory,
     BinningAttributeFactoryWithFunctionParam,
+    ExpressionFactory,
     GroupByQueryFactory,
     JoinFactory,
+    JoinPartFactory,
     MultiExpressionFactory,
     ProjectionAttributeFactory,
     SelectQueryFactory,
@@ -94,3 +111,156 @@ def test_groupby_query_pass_on_bin_interpolation_flag_true():
         groups=Dummy.binning_attributes_with_function_param,
         bin_interpolation=True,
     )
+
+
+@pytest.mark.parametrize(
+    "create_instance",
+    [
+        pytest.param(SelectQueryFactory, id="SelectQuery"),
+        pytest.param(AggregationQueryFactory, id="AggregationQueryFactory"),
+        pytest.param(GroupByQueryFactory, id="GroupByQueryFactory"),
+    ],
+)
+def test_parse_query_returns_expected_query(create_instance):
+    expected = create_instance(where=MultiExpressionFactory())
+    assert expected == parse_query(expected.json())
+    assert expected == parse_query(json.loads(expected.json()), cache=QueryCache())
+
+
+def test_parse_query_with_cache_validates_identical_payloads_once():
+    cache = QueryCache(maxsize=2)
+    payloads = [json.loads(SelectQueryFactory().json()) for _ in range(3)]
+    first = parse_query(payloads[0], cache=cache)
+    reordered = dict(reversed(list(payloads[0].items())))
+    assert first is parse_query(reordered, cache=cache)
+    assert (1, 1, 0) == (cache.hits, cache.misses, cache.evictions)
+
+    parse_query(payloads[1], cache=cache)
+    parse_query(payloads[2], cache=cache)
+    assert (1, 3, 1) == (cache.hits, cache.misses, cache.evictions)
+    assert 2 == len(cache)
+    assert first is not parse_query(payloads[0], cache=cache)
+
+
+def test_parsed_query_is_immutable():
+    query = parse_query(GroupByQueryFactory().json(), cache=QueryCache())
+    with pytest.raises(TypeError):
+        query.limit = 10
+    with pytest.raises(TypeError):
+        query.groups[0].alias = "changed"
+
+
+def test_parse_query_raises_for_unknown_query_type():
+    with pytest.raises(ValueError, match="Unable to determine the query type"):
+        parse_query({"from_": json.loads(Dummy.from_.json())})
+
+
+def test_parse_query_reports_errors_of_the_dispatched_models_only():
+    payload = json.loads(
+        SelectQueryFactory(
+            from_=JoinFactory(left=JoinPartFactory(from_=JoinFactory())),
+            where=MultiExpressionFactory(expressions=[MultiExpressionFactory(), ExpressionFactory()]),
+        ).json()
+    )
+    del payload["from_"]["left"]["from_"]["right"]["on"]["attribute_uid"]
+    payload["where"]["expressions"][0]["expressions"][1]["operator"] = "fake-uid"
+
+    with pytest.raises(ValidationError) as e:
+        parse_query(payload)
+    assert [
+        ("from_", "left", "from_", "right", "on", "attribute_uid"),
+        ("where", "expressions", 0, "expressions", 1, "operator"),
+    ] == [error["loc"] for error in e.value.errors()]
+
+
+def expression(operator, value, attribute_uri=None):
+    return ExpressionFactory(
+        operator=operator, value=value, **({"attribute_uri": attribute_uri} if attribute_uri else {})
+    )
+
+
+def test_fingerprint_is_order_insensitive_where_semantics_allow():
+    a, b, c = (expression(ParamOperation.EQUAL.uid, str(i)) for i in range(3))
+    where = MultiExpressionFactory(
+        criteria=CriteriaType.AND, expressions=[a, MultiExpressionFactory(expressions=[b, c])]
+    )
+    same = MultiExpressionFactory(
+        criteria=CriteriaType.AND, expressions=[MultiExpressionFactory(expressions=[c, b]), a, a]
+    )
+    assert where.fingerprint() == same.fingerprint()
+
+    in_ = expression(ParamOperation.IN.uid, ["b", "a"])
+    assert (
+        in_.fingerprint() == expression(ParamOperation.IN.uid.upper(), ["a", "b", "a"], in_.attribute_uri).fingerprint()
+    )
+    assert in_.fingerprint() != expression(ParamOperation.IN.uid, ["a"], in_.attribute_uri).fingerprint()
+
+    left, right = JoinPartFactory(), JoinPartFactory()
+    inner = JoinFactory(left=left, right=right, type=JoinType.INNER)
+    assert inner.fingerprint() == JoinFactory(left=right, right=left, type=JoinType.INNER).fingerprint()
+    outer = JoinFactory(left=left, right=right, type=JoinType.LEFT_OUTER)
+    assert outer.fingerprint() == JoinFactory(left=right, right=left, type=JoinType.RIGHT_OUTER).fingerprint()
+    assert outer.fingerprint() != JoinFactory(left=right, right=left, type=JoinType.LEFT_OUTER).fingerprint()
+    assert outer.fingerprint() != inner.fingerprint()
+
+    query = SelectQueryFactory(from_=inner, where=where)
+    assert (
+        query.fingerprint()
+        == SelectQueryFactory(
+            from_=JoinFactory(left=right, right=left, type=JoinType.INNER),
+            where=same,
+            attributes=query.attributes,
+        ).fingerprint()
+    )
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        {"limit": 7},
+        {"offset": 1},
+        {"where": None},
+        {"distinct": True},
+        {"attributes": [ProjectionAttributeFactory()]},
+    ],
+)
+def test_fingerprint_differs_for_different_queries(update):
+    query = SelectQueryFactory(where=ExpressionFactory())
+    assert query.fingerprint() != query.copy(update=update).fingerprint()
+    assert query.fingerprint() == query.copy().fingerprint()
+
+
+def test_fingerprint_differs_by_query_type_and_attribute_order():
+    aggregations = [AggregationAttributeFactory(), AggregationAttributeFactory()]
+    query = AggregationQueryFactory(aggregations=aggregations)
+    assert query.fingerprint() != query.copy(update={"aggregations": aggregations[::-1]}).fingerprint()
+    group_by = GroupByQueryFactory(from_=query.from_, aggregations=aggregations, groups=[])
+    assert query.fingerprint() != group_by.fingerprint()
+
+
+def test_fingerprint_is_memoized():
+    query = GroupByQueryFactory(where=MultiExpressionFactory())
+    assert query._fingerprint is None
+    fingerprint = query.fingerprint()
+    assert fingerprint == query._fingerprint
+    assert query.where._fingerprint is not None
+    assert fingerprint == parse_query(query.json(by_alias=True)).fingerprint()
+
+
+def test_fingerprint_is_stable_across_processes():
+    query = GroupByQueryFactory(where=MultiExpressionFactory(), from_=JoinFactory())
+    script = "import sys; from igenius_adapters_sdk.entities.query import parse_query; "
+    script += "print(parse_query(sys.stdin.read()).fingerprint())"
+    env = {**os.environ, "PYTHONHASHSEED": "1234", "PYTHONPATH": os.pathsep.join(sys.path)}
+    output = subprocess.run(
+        [sys.executable, "-c", script], input=query.json(by_alias=True), capture_output=True, text=True, env=env
+    )
+    assert query.fingerprint() == output.stdout.strip(), output.stderr
+
+
+def test_fingerprinted_models_must_define_their_canonical_form():
+    class Incomplete(_Fingerprinted):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
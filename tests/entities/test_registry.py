@@ -0,0 +1,73 @@
+import pytest
+
+from igenius_adapters_sdk.entities import attribute, params
+from tests.factories import I18nFactory, ParamOperationSpecsFactory
+
+
+@pytest.mark.parametrize(
+    "registry, spec",
+    [
+        pytest.param(attribute.AggregationFunction, attribute.AggregationFunction.SUM, id="AggregationFunction"),
+        pytest.param(attribute.GroupByFunction, attribute.GroupByFunction.DATE_TRUNC_DAY, id="GroupByFunction"),
+        pytest.param(params.ParamOperation, params.ParamOperation.BETWEEN, id="ParamOperation"),
+    ],
+)
+def test_from_uid_returns_declared_spec(registry, spec):
+    assert spec is registry.from_uid(spec.uid)
+    assert spec is registry.from_uid(spec.uid.upper())
+    assert spec in registry.specs()
+
+
+def test_from_uid_raises_for_unknown_uid():
+    with pytest.raises(ValueError, match="Invalid ParamOperation uid=fake-uid"):
+        params.ParamOperation.from_uid("fake-uid")
+
+
+def test_register_adds_spec_to_registry_only():
+    class CustomFunction(attribute.AggregationFunction):
+        pass
+
+    spec = attribute.AttributeFunctionSpecs(uid="custom.aggregation.median", i18n=I18nFactory())
+    assert spec is CustomFunction.register(spec)
+    assert spec is CustomFunction.from_uid(spec.uid)
+    assert attribute.AggregationFunction.SUM is CustomFunction.from_uid(attribute.AggregationFunction.SUM.uid)
+    with pytest.raises(ValueError, match="Invalid AggregationFunction"):
+        attribute.AggregationFunction.from_uid(spec.uid)
+
+
+def test_register_raises_for_conflicting_uid():
+    spec = ParamOperationSpecsFactory(uid=params.ParamOperation.EQUAL.uid)
+    with pytest.raises(ValueError, match="already registered"):
+        params.ParamOperation.register(spec)
+
+
+def test_register_raises_for_wrong_spec_type():
+    with pytest.raises(TypeError):
+        attribute.GroupByFunction.register(ParamOperationSpecsFactory())
+
+
+@pytest.mark.parametrize(
+    "operation, expected",
+    [
+        pytest.param(params.ParamOperation.EQUAL, params.OperationSchemas.SINGLE_VALUE, id="single"),
+        pytest.param(params.ParamOperation.IN, params.OperationSchemas.MULTIPLE_VALUE, id="multiple"),
+        pytest.param(params.ParamOperation.BETWEEN, params.OperationSchemas.RANGE_VALUE, id="range"),
+        pytest.param(params.ParamOperation.EMPTY, params.OperationSchemas.NO_VALUE, id="no-value"),
+    ],
+)
+def test_operation_schema_is_resolved_by_uid(operation, expected):
+    assert expected is params.ParamOperation.operation_schema(operation.uid)
+
+
+def test_register_param_operation_resolves_operation_schema():
+    class CustomOperation(params.ParamOperation):
+        pass
+
+    spec = CustomOperation.register(
+        ParamOperationSpecsFactory(properties_schema=params.OperationSchemas.RANGE_VALUE.jsonschema)
+    )
+    assert params.OperationSchemas.RANGE_VALUE is CustomOperation.operation_schema(spec.uid)
+    with pytest.raises(ValueError, match="Invalid ParamOperation"):
+        params.ParamOperation.operation_schema(spec.uid)
+    with pytest.raises(ValueError, match="OperationSchema not found"):
+        CustomOperation.register(ParamOperationSpecsFactory(properties_schema={"type": "object"}))
@@ -0,0 +1,41 @@
+from igenius_adapters_sdk.entities import uri
+from tests.factories import AttributeUriFactory, ExpressionFactory, MultiExpressionFactory
+
+
+def test_uri_equality_and_hash():
+    attribute_uri = AttributeUriFactory()
+    same = uri.AttributeUri(**attribute_uri.dict())
+    other = AttributeUriFactory()
+    assert same == attribute_uri and hash(same) == hash(attribute_uri)
+    assert other != attribute_uri
+    assert attribute_uri == attribute_uri.dict()
+    assert uri.CollectionUri(**attribute_uri.dict()) != attribute_uri
+    assert {attribute_uri: "column"}[same] == "column"
+
+
+def test_uri_copy_refreshes_hash():
+    attribute_uri = AttributeUriFactory()
+    copied = attribute_uri.copy(update={"attribute_uid": "another_attribute"})
+    assert copied == uri.AttributeUri(**copied.dict())
+    assert hash(copied) == hash(uri.AttributeUri(**copied.dict()))
+    assert copied != attribute_uri
+
+
+def test_uri_construct_computes_hash_lazily():
+    attribute_uri = AttributeUriFactory()
+    constructed = uri.AttributeUri.construct(**attribute_uri.dict())
+    assert constructed == attribute_uri and hash(constructed) == hash(attribute_uri)
+
+
+def test_identical_uris_of_a_query_share_one_instance():
+    attribute_uri = AttributeUriFactory()
+    where = MultiExpressionFactory(
+        expressions=[
+            ExpressionFactory(attribute_uri=attribute_uri.dict()),
+            ExpressionFactory(attribute_uri=attribute_uri.dict()),
+            ExpressionFactory(attribute_uri=uri.AttributeUri(**attribute_uri.dict())),
+        ]
+    )
+    first, *others = [expression.attribute_uri for expression in where.expressions]
+    assert first == attribute_uri
+    assert all(first is other for other in others)
@@ -0,0 +1,159 @@
+import array
+import shelve
+
+import pytest
+
+from igenius_adapters_sdk.entities import query, uri
+from igenius_adapters_sdk.tools import cache, utils
+from tests import factories as shf
+
+ORDERS = uri.CollectionUri(datasource_uid="shop", collection_uid="orders")
+CUSTOMERS = uri.CollectionUri(datasource_uid="crm", collection_uid="customers")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def rows(n, value="x"):
+    return [{"value": value} for _ in range(n)]
+
+
+def test_query_tags():
+    join = query.Join(
+        left=query.JoinPart(from_=ORDERS, on=shf.AttributeUriFactory(**ORDERS.dict())),
+        right=query.JoinPart(from_=CUSTOMERS, on=shf.AttributeUriFactory(**CUSTOMERS.dict())),
+        type=query.JoinType.INNER,
+    )
+    assert {"shop", "shop/orders", "crm", "crm/customers"} == cache.query_tags(shf.SelectQueryFactory(from_=join))
+
+
+@pytest.mark.parametrize("results", [cache.LRUResultCache(), cache.SharedResultCache({})])
+def test_get_put_and_hit_ratio(results):
+    assert 0.0 == results.hit_ratio
+    assert results.get("a") is None
+    results.put("a", rows(2))
+    results.put("b", [])
+    assert rows(2) == results.get("a")
+    assert [] == results.get("b")
+    assert (2, 1, 2 / 3) == (results.hits, results.misses, results.hit_ratio)
+
+
+@pytest.mark.parametrize("results", [cache.LRUResultCache(ttl=10), cache.SharedResultCache({}, ttl=10)])
+def test_ttl(results):
+    results.clock = Clock()
+    results.put("default", rows(1))
+    results.put("longer", rows(1), ttl=30)
+    results.clock.now = 9.9
+    assert results.get("default") is not None
+    results.clock.now = 10
+    assert results.get("default") is None
+    assert results.get("longer") is not None
+    results.clock.now = 30
+    assert results.get("longer") is None
+
+
+@pytest.mark.parametrize("results", [cache.LRUResultCache(), cache.SharedResultCache({})])
+def test_invalidate(results):
+    results.put("orders", rows(1), {"shop", "shop/orders"})
+    results.put("items", rows(1), {"shop", "shop/items"})
+    results.put("customers", rows(1), {"crm", "crm/customers"})
+    results.invalidate(ORDERS)
+    assert [False, True, True] == [results.get(k) is not None for k in ("orders", "items", "customers")]
+    results.invalidate(uri.DatasourceUri(datasource_uid="shop"))
+    assert [False, False, True] == [results.get(k) is not None for k in ("orders", "items", "customers")]
+    results.clear()
+    assert results.get("customers") is None
+
+
+def test_lru_evicts_beyond_max_bytes():
+    # the size of the copy kept by the cache
+    size = cache._sizeof(cache._frozen(rows(10)))
+    results = cache.LRUResultCache(max_bytes=3 * size)
+    for key in "abc":
+        results.put(key, rows(10))
+    assert rows(10) == results.get("a")
+    results.put("d", rows(10))
+    assert (3, 3 * size, 1) == (len(results), results.size, results.evictions)
+    assert results.get("b") is None
+    results.put("huge", rows(40))
+    assert results.get("huge") is None
+    assert 3 == len(results)
+    results.put("a", rows(20))
+    assert ["a", "d"] == [k for k in "acd" if results.get(k) is not None]
+    assert results.size <= 3 * size
+
+
+def test_lru_evicts_beyond_maxsize():
+    results = cache.LRUResultCache(maxsize=2)
+    for key in "abc":
+        results.put(key, rows(1), {"shop"})
+    assert [None, rows(1), rows(1)] == [results.get(k) for k in "abc"]
+    results.invalidate(uri.DatasourceUri(datasource_uid="shop"))
+    assert (0, 0, {}) == (len(results), results.size, results._tags)
+
+
+@pytest.mark.parametrize("kwargs", [{"max_bytes": 0}, {"maxsize": 0}])
+def test_lru_bounds_must_be_positive(kwargs):
+    with pytest.raises(ValueError):
+        cache.LRUResultCache(**kwargs)
+
+
+def test_shared_cache_over_a_shelve(tmp_path):
+    with shelve.open(str(tmp_path / "results")) as store:
+        cache.SharedResultCache(store).put("a", rows(2), {"shop"})
+    with shelve.open(str(tmp_path / "results")) as store:
+        results = cache.SharedResultCache(store)
+        assert rows(2) == results.get("a")
+        results.invalidate(uri.DatasourceUri(datasource_uid="shop"))
+        assert "a" not in store
+
+
+def test_columnar_results_size():
+    numpy = pytest.importorskip("numpy")
+    columns = utils.ColumnarResult(["value"], [["x"] * 100])
+    assert cache._sizeof(columns) < cache._sizeof(columns.to_rows())
+    array = numpy.arange(1000.0)
+    assert cache._sizeof(utils.ColumnarResult(["a"], [array])) > array.nbytes
+    assert cache._sizeof(utils.ColumnarResult(["a"], [array[500:]])) > array.nbytes / 2
+
+
+def test_buffer_columns_size():
+    column = memoryview(array.array("d", range(1000)))
+    result = utils.ColumnarResult(["a"], [column])
+    assert cache._sizeof(result) > column.nbytes
+    results = cache.LRUResultCache()
+    results.put("a", result)
+    assert result == results.get("a")
+
+
+@pytest.mark.parametrize("results", [cache.LRUResultCache(), cache.SharedResultCache({})])
+def test_cached_results_are_copies(results):
+    result = rows(2)
+    results.put("a", result)
+    result.append({"value": "y"})
+    hit = results.get("a")
+    hit.append({"value": "y"})
+    hit[0]["value"] = "y"
+    assert rows(2) == results.get("a")
+
+    columns = utils.ColumnarResult(["id"], [[1, 2]])
+    results.put("b", columns)
+    results.get("b").data[0].append(3)
+    assert columns == results.get("b")
+
+
+def test_cached_numpy_columns_are_read_only():
+    numpy = pytest.importorskip("numpy")
+    column = numpy.arange(3)
+    results = cache.LRUResultCache()
+    results.put("a", utils.ColumnarResult(["a"], [column]))
+    column[0] = 42
+    hit = results.get("a")
+    assert [0, 1, 2] == hit.data[0].tolist()
+    with pytest.raises(ValueError):
+        hit.data[0][0] = 42
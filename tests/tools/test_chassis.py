@@ -1,8 +1,11 @@
 import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pytest
 
-from igenius_adapters_sdk.tools import chassis
+from igenius_adapters_sdk.entities import attribute, params, query
+from igenius_adapters_sdk.tools import cache, chassis, normalize, utils
 from tests import factories as shf
 
 
@@ -25,3 +28,527 @@ async def test_dry_run(result):
 
     ch = chassis.Chassis(query=query, engine=async_engine)
     assert result == await ch.async_run()
+
+
+@pytest.mark.parametrize(
+    "result",
+    [pytest.param([{"col1": "foo", "col2": 140}, {"col1": "bar", "col2": 3.4}, {"col1": "baz", "col2": None}])],
+)
+@pytest.mark.asyncio
+async def test_streaming_run(result):
+    def engine(query):
+        yield from result
+
+    async def async_engine(query):
+        for row in result:
+            await asyncio.sleep(0)
+            yield row
+
+    async def awaitable_engine(query):
+        return iter(result)
+
+    query = shf.SelectQueryFactory()
+    assert result == list(chassis.Chassis(query=query, engine=engine).iter_run())
+
+    for e in (engine, async_engine, awaitable_engine):
+        assert result == [row async for row in chassis.Chassis(query=query, engine=e).aiter_run()]
+
+
+def binning_query():
+    return shf.GroupByQueryFactory(
+        aggregations=[shf.AggregationAttributeFactory(alias="quantity")],
+        groups=[
+            shf.BinningAttributeFactory(
+                alias="price",
+                function_uri=shf.FunctionUriFactory(
+                    function_type="group_by",
+                    function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+                    function_params=shf.BinningRulesFactory(),
+                ),
+            )
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_streaming_run_with_bin_interpolation():
+    result = [{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}]
+    expected = [
+        {"price": "0.0-10.0", "quantity": 3},
+        {"price": "10.0-20.0", "quantity": None},
+        {"price": "20.0-30.0", "quantity": 7},
+    ]
+
+    def engine(query):
+        yield from result
+
+    async def async_engine(query):
+        for row in result:
+            yield row
+
+    query = binning_query()
+    assert expected == list(chassis.Chassis(query=query, engine=engine).iter_run())
+    assert expected == [row async for row in chassis.Chassis(query=query, engine=async_engine).aiter_run()]
+
+
+@pytest.mark.asyncio
+async def test_async_run_with_bin_interpolation_of_an_iterator():
+    async def awaitable_engine(query):
+        return iter([{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}])
+
+    for offload_threshold in (None, 0):
+        ch = chassis.Chassis(query=binning_query(), engine=awaitable_engine, offload_threshold=offload_threshold)
+        assert [3, None, 7] == [row["quantity"] for row in await ch.async_run()]
+
+
+def contradiction():
+    attribute_uri = shf.AttributeUriFactory()
+    return shf.MultiExpressionFactory(
+        criteria=query.CriteriaType.AND,
+        expressions=[
+            shf.ExpressionFactory(attribute_uri=attribute_uri, operator=params.ParamOperation.EQUAL.uid, value="1"),
+            shf.ExpressionFactory(attribute_uri=attribute_uri, operator=params.ParamOperation.EQUAL.uid, value="2"),
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_normalize_short_circuits_always_false_filters():
+    def engine(query):
+        raise AssertionError("the engine must not be called")
+
+    async def async_engine(query):
+        raise AssertionError("the engine must not be called")
+
+    query = shf.SelectQueryFactory(where=contradiction())
+    assert [] == chassis.Chassis(query=query, engine=engine, normalize=True).run()
+    assert [] == list(chassis.Chassis(query=query, engine=engine, normalize=True).iter_run())
+    assert [] == await chassis.Chassis(query=query, engine=async_engine, normalize=True).async_run()
+    assert [] == [row async for row in chassis.Chassis(query=query, engine=engine, normalize=True).aiter_run()]
+
+    query = shf.GroupByQueryFactory(
+        where=contradiction(),
+        aggregations=[shf.AggregationAttributeFactory(alias="quantity", default_bin_interpolation=0)],
+        groups=[
+            shf.BinningAttributeFactory(
+                alias="price",
+                function_uri=shf.FunctionUriFactory(
+                    function_type="group_by",
+                    function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+                    function_params=shf.BinningRulesFactory(),
+                ),
+            )
+        ],
+    )
+    assert [
+        {"price": "0.0-10.0", "quantity": 0},
+        {"price": "10.0-20.0", "quantity": 0},
+        {"price": "20.0-30.0", "quantity": 0},
+    ] == chassis.Chassis(query=query, engine=engine, normalize=True).run()
+
+
+def test_normalize_passes_the_normalized_query_to_the_engine():
+    queries = []
+
+    def engine(query):
+        queries.append(query)
+        return [{"count": 0}]
+
+    query = shf.AggregationQueryFactory(where=contradiction())
+    assert [{"count": 0}] == chassis.Chassis(query=query, engine=engine, normalize=True).run()
+    assert normalize.ALWAYS_FALSE == queries[0].where
+
+    query = shf.SelectQueryFactory(where=shf.MultiExpressionFactory(expressions=[shf.ExpressionFactory()]))
+    chassis.Chassis(query=query, engine=engine).run()
+    assert query == queries[1]
+    chassis.Chassis(query=query, engine=engine, normalize=True).run()
+    assert query.where.expressions[0] == queries[2].where
+
+
+def query_on(*datasource_uids, collection_uid="items"):
+    collections = [
+        shf.CollectionUriFactory(datasource_uid=uid, collection_uid=collection_uid) for uid in datasource_uids
+    ]
+    from_ = collections[0]
+    for collection in collections[1:]:
+        from_ = query.Join(
+            left=query.JoinPart(from_=from_, on=shf.AttributeUriFactory()),
+            right=query.JoinPart(from_=collection, on=shf.AttributeUriFactory()),
+            type=query.JoinType.INNER,
+        )
+    return shf.SelectQueryFactory(from_=from_)
+
+
+class CountingEngine:
+    """An async engine counting the queries running at once, overall and per datasource."""
+
+    def __init__(self):
+        self.running = {}
+        self.peaks = {}
+
+    def _count(self, keys, delta):
+        for key in keys:
+            self.running[key] = self.running.get(key, 0) + delta
+            self.peaks[key] = max(self.peaks.get(key, 0), self.running[key])
+
+    async def __call__(self, q):
+        keys = ["all", *chassis._datasources(q.from_)]
+        self._count(keys, 1)
+        await asyncio.sleep(0.01)
+        self._count(keys, -1)
+        if getattr(q.from_, "collection_uid", None) == "broken":
+            raise RuntimeError("broken collection")
+        return [{"datasources": chassis._datasources(q.from_)}]
+
+
+@pytest.mark.asyncio
+async def test_run_many_returns_results_in_order():
+    queries = [query_on(uid) for uid in ["a", "b", "a", "c", "b"]] + [query_on("c", "a")]
+    results = await chassis.Chassis.run_many(queries, CountingEngine())
+    assert [[{"datasources": chassis._datasources(q.from_)}] for q in queries] == [r.result for r in results]
+    assert all(r.elapsed >= 0.01 and r.waited >= 0 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_run_many_bounds_concurrency():
+    engine = CountingEngine()
+    queries = [query_on(uid) for uid in "abcab" * 4] + [query_on("a", "b")] * 3
+    await chassis.Chassis.run_many(queries, engine, concurrency=5, per_datasource_limit=2)
+    assert 5 == engine.peaks["all"]
+    assert 2 == engine.peaks["a"] == engine.peaks["b"] >= engine.peaks["c"]
+
+    engine = CountingEngine()
+    results = await chassis.Chassis.run_many(queries, engine, per_datasource_limit={"a": 1, "c": 3})
+    assert 1 == engine.peaks["a"]
+    assert 3 == engine.peaks["c"]
+    assert engine.peaks["b"] > 3
+    assert max(r.waited for r in results) >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_run_many_doesnt_hold_slots_waiting_for_a_datasource():
+    async def engine(q):
+        await asyncio.sleep(0.1)
+        return []
+
+    queries = [query_on("a"), query_on("a"), query_on("b")]
+    results = await chassis.Chassis.run_many(queries, engine, concurrency=2, per_datasource_limit=1)
+    # the second query on a waits for the first one, b runs right away
+    assert results[1].waited >= 0.1
+    assert results[2].waited < 0.05
+
+
+@pytest.mark.asyncio
+async def test_run_many_exceptions():
+    queries = [query_on("a"), query_on("a", collection_uid="broken"), query_on("b")]
+    with pytest.raises(RuntimeError, match="broken collection"):
+        await chassis.Chassis.run_many(queries, CountingEngine())
+
+    results = await chassis.Chassis.run_many(queries, CountingEngine(), return_exceptions=True)
+    assert [{"datasources": ["b"]}] == results[2].result
+    assert isinstance(results[1].result, RuntimeError)
+
+
+@pytest.mark.asyncio
+async def test_run_many_passes_the_options_to_each_chassis():
+    calls = []
+
+    async def engine(q):
+        calls.append(q)
+        return []
+
+    queries = [query_on("a").copy(update={"where": contradiction()}), query_on("b")]
+    results = await chassis.Chassis.run_many(queries, engine, normalize=True)
+    assert [[], []] == [r.result for r in results]
+    assert [queries[1]] == calls
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.functions = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.functions.append(fn)
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_async_run_offloads_synchronous_engines():
+    result = [{"col1": "foo"}, {"col1": "bar"}]
+    threads = []
+
+    def engine(q):
+        threads.append(threading.get_ident())
+        return result
+
+    def generator_engine(q):
+        threads.append(threading.get_ident())
+        yield from result
+
+    async def async_generator_engine(q):
+        for row in result:
+            yield row
+
+    q = shf.SelectQueryFactory()
+    executor = RecordingExecutor()
+    assert result == await chassis.Chassis(query=q, engine=engine, executor=executor).async_run()
+    assert result == await chassis.Chassis(query=q, engine=generator_engine).async_run()
+    assert result == await chassis.Chassis(query=q, engine=async_generator_engine).async_run()
+    assert threading.get_ident() not in threads
+    assert [chassis.call] == executor.functions
+
+
+@pytest.mark.parametrize("offload_threshold, offloaded", [(None, False), (2, False), (1, True), (0, True)])
+@pytest.mark.asyncio
+async def test_async_run_offloads_large_bin_interpolations(offload_threshold, offloaded):
+    result = [{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}]
+
+    async def engine(q):
+        return result
+
+    executor = RecordingExecutor()
+    ch = chassis.Chassis(query=binning_query(), engine=engine, executor=executor, offload_threshold=offload_threshold)
+    assert [3, None, 7] == [row["quantity"] for row in await ch.async_run()]
+    assert ([utils.bin_interpolation] if offloaded else []) == executor.functions
+
+
+@pytest.mark.asyncio
+async def test_async_run_offloads_to_a_process_pool():
+    async def engine(q):
+        return [{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}]
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        ch = chassis.Chassis(query=binning_query(), engine=engine, executor=executor, offload_threshold=0)
+        assert [3, None, 7] == [row["quantity"] for row in await ch.async_run()]
+
+
+@pytest.mark.asyncio
+async def test_cache_stores_the_interpolated_results():
+    calls = []
+
+    def engine(q):
+        calls.append(q)
+        return [{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}]
+
+    async def async_engine(q):
+        return engine(q)
+
+    results = cache.LRUResultCache()
+    q = binning_query()
+    expected = chassis.Chassis(query=q, engine=engine).run()
+    assert expected == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    assert expected == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    assert expected == await chassis.Chassis(query=q, engine=async_engine, cache=results).async_run()
+    assert expected == list(chassis.Chassis(query=q, engine=engine, cache=results).iter_run())
+    assert expected == [row async for row in chassis.Chassis(query=q, engine=async_engine, cache=results).aiter_run()]
+    assert 2 == len(calls)
+    assert 4 / 5 == results.hit_ratio
+
+    results.invalidate(q.from_)
+    assert expected == await chassis.Chassis(query=q, engine=async_engine, cache=results, cache_ttl=5).async_run()
+    assert 3 == len(calls)
+
+
+@pytest.mark.asyncio
+async def test_sparse_interpolation():
+    def engine(q):
+        return [
+            {"store": "s1", "price": "0.0-10.0", "city": "rome", "quantity": 3},
+            {"store": "s2", "price": "20.0-30.0", "city": "milan", "quantity": 7},
+        ]
+
+    async def async_engine(q):
+        return engine(q)
+
+    q = binning_query()
+    q = q.copy(
+        update={
+            "groups": [shf.BinningAttributeFactory(alias="store"), *q.groups, shf.BinningAttributeFactory(alias="city")]
+        }
+    )
+    expected = utils.bin_interpolation(q, engine(q), sparse=True)
+    assert 6 == len(expected)
+    results = cache.LRUResultCache()
+    assert expected == chassis.Chassis(query=q, engine=engine, sparse_interpolation=True, cache=results).run()
+    assert expected == list(chassis.Chassis(query=q, engine=engine, sparse_interpolation=True).iter_run())
+    ch = chassis.Chassis(query=q, engine=async_engine, sparse_interpolation=True, offload_threshold=0)
+    assert expected == await ch.async_run()
+    assert expected == [
+        row async for row in chassis.Chassis(query=q, engine=async_engine, sparse_interpolation=True).aiter_run()
+    ]
+    # sparse and dense results are cached apart
+    assert 12 == len(chassis.Chassis(query=q, engine=engine, cache=results).run())
+    assert 2 == len(results)
+
+
+@pytest.mark.asyncio
+async def test_cache_with_iterator_results():
+    def engine(q):
+        yield from [{"a": 1}, {"a": 2}]
+
+    async def async_engine(q):
+        return iter([{"a": 1}, {"a": 2}])
+
+    results = cache.LRUResultCache()
+    q = shf.SelectQueryFactory()
+    assert [{"a": 1}, {"a": 2}] == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    assert [{"a": 1}, {"a": 2}] == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    chassis.Chassis(query=q, engine=engine, cache=results).run().append({"a": 3})
+    assert [{"a": 1}, {"a": 2}] == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    results.clear()
+    assert [{"a": 1}, {"a": 2}] == await chassis.Chassis(query=q, engine=async_engine, cache=results).async_run()
+    assert [{"a": 1}, {"a": 2}] == await chassis.Chassis(query=q, engine=async_engine, cache=results).async_run()
+    assert 4 == results.hits
+
+
+def test_streaming_runs_dont_fill_the_cache():
+    results = cache.LRUResultCache()
+    q = shf.SelectQueryFactory()
+    assert [{"a": 1}] == list(chassis.Chassis(query=q, engine=lambda q: [{"a": 1}], cache=results).iter_run())
+    assert 0 == len(results)
+
+
+class SlowEngine:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.cancelled = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self, q):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return [{"calls": self.calls}]
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_runs():
+    engine, flights = SlowEngine(), chassis.SingleFlight()
+    q, other = shf.SelectQueryFactory(), shf.SelectQueryFactory()
+    runs = [chassis.Chassis(query=x, engine=engine, single_flight=flights).async_run() for x in [q] * 10 + [other]]
+    tasks = [asyncio.ensure_future(run) for run in runs]
+    await settle()
+    assert 2 == len(flights)
+    engine.release.set()
+    results = await asyncio.gather(*tasks)
+    assert 2 == engine.calls
+    assert all(result is results[0] for result in results[:10])
+    assert (11, 2, 9, 0) == (flights.calls, flights.executions, flights.shared, len(flights))
+
+    assert [{"calls": 3}] == await chassis.Chassis(query=q, engine=engine, single_flight=flights).async_run()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors():
+    engine, flights = SlowEngine(error=RuntimeError("boom")), chassis.SingleFlight()
+    q = shf.SelectQueryFactory()
+    runs = [chassis.Chassis(query=q, engine=engine, single_flight=flights).async_run() for _ in range(3)]
+    tasks = [asyncio.ensure_future(run) for run in runs]
+    await settle()
+    engine.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert (1, 2, 0) == (engine.calls, flights.shared, len(flights))
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancellation():
+    engine, flights = SlowEngine(), chassis.SingleFlight()
+    q = shf.SelectQueryFactory()
+
+    def run():
+        return asyncio.ensure_future(chassis.Chassis(query=q, engine=engine, single_flight=flights).async_run())
+
+    first, second = run(), run()
+    await settle()
+    first.cancel()
+    await settle()
+    assert first.cancelled()
+    assert (1, 0) == (len(flights), engine.cancelled)
+    second.cancel()
+    await settle()
+    assert (0, 1) == (len(flights), engine.cancelled)
+
+    third = run()
+    await settle()
+    engine.release.set()
+    assert [{"calls": 2}] == await third
+
+
+def test_cache_is_keyed_by_the_query_fingerprint():
+    calls = []
+
+    def engine(q):
+        calls.append(q)
+        return [{"a": 1}]
+
+    results = cache.LRUResultCache()
+    expressions = [shf.ExpressionFactory(), shf.ExpressionFactory()]
+    q = shf.SelectQueryFactory(where=shf.MultiExpressionFactory(expressions=expressions))
+    same = q.copy(
+        update={"where": shf.MultiExpressionFactory(criteria=q.where.criteria, expressions=expressions[::-1])}
+    )
+    assert q != same
+    for x in (q, same):
+        assert [{"a": 1}] == chassis.Chassis(query=x, engine=engine, cache=results).run()
+    assert [q] == calls
+
+
+@pytest.mark.asyncio
+async def test_columnar_results():
+    result = utils.ColumnarResult(["price", "quantity"], [["0.0-10.0", "20.0-30.0"], [3, 7]])
+    interpolated = utils.ColumnarResult(["price", "quantity"], [["0.0-10.0", "10.0-20.0", "20.0-30.0"], [3, None, 7]])
+
+    def engine(q):
+        return result
+
+    async def async_engine(q):
+        return result
+
+    q = binning_query()
+    assert interpolated == chassis.Chassis(query=q, engine=engine).run()
+    assert interpolated == await chassis.Chassis(query=q, engine=engine).async_run()
+    assert interpolated == await chassis.Chassis(query=q, engine=async_engine, offload_threshold=0).async_run()
+    assert interpolated.to_rows() == list(chassis.Chassis(query=q, engine=engine).iter_run())
+    assert interpolated.to_rows() == [row async for row in chassis.Chassis(query=q, engine=async_engine).aiter_run()]
+
+    select = shf.SelectQueryFactory()
+    assert result is chassis.Chassis(query=select, engine=engine).run()
+    assert result.to_rows() == [row async for row in chassis.Chassis(query=select, engine=engine).aiter_run()]
+
+    results = cache.LRUResultCache()
+    assert interpolated == chassis.Chassis(query=q, engine=engine, cache=results).run()
+    assert interpolated.to_rows() == list(chassis.Chassis(query=q, engine=engine, cache=results).iter_run())
+    assert 1 == results.hits
+
+
+def test_interpolated_results_are_windowed_after_the_interpolation():
+    calls = []
+
+    def engine(q):
+        calls.append(q)
+        return [{"price": "0.0-10.0", "quantity": 3}, {"price": "20.0-30.0", "quantity": 7}]
+
+    q = binning_query().copy(
+        update={"order_by": [shf.OrderByAttributeFactory(alias="price", direction="desc")], "limit": 2, "offset": 1}
+    )
+    assert [{"price": "10.0-20.0", "quantity": None}, {"price": "0.0-10.0", "quantity": 3}] == chassis.Chassis(
+        query=q, engine=engine
+    ).run()
+    assert (None, None, q.order_by) == (calls[0].limit, calls[0].offset, calls[0].order_by)
+
+    select = shf.SelectQueryFactory(limit=2, offset=1)
+    chassis.Chassis(query=select, engine=engine).run()
+    assert select == calls[1]
@@ -0,0 +1,279 @@
+from datetime import date, datetime
+
+import pytest
+
+from igenius_adapters_sdk.entities import attribute, data, params, query, uri
+from igenius_adapters_sdk.tools import chassis, engine
+from tests import factories as shf
+
+ORDERS = uri.CollectionUri(datasource_uid="shop", collection_uid="orders")
+CUSTOMERS = uri.CollectionUri(datasource_uid="crm", collection_uid="customers")
+
+
+def order_attribute(uid):
+    return uri.AttributeUri(attribute_uid=uid, **ORDERS.dict())
+
+
+def customer_attribute(uid):
+    return uri.AttributeUri(attribute_uid=uid, **CUSTOMERS.dict())
+
+
+def orders(array=list):
+    return {
+        "id": array([1, 2, 3, 4, 5, 6]),
+        "customer": ["a", "b", "a", "c", None, "a"],
+        "price": array([5.0, 15.0, 25.0, 35.0, 45.0, float("nan")]),
+        "created": [
+            datetime(2021, 1, 4, 10),
+            datetime(2021, 1, 7, 11),
+            datetime(2021, 2, 10),
+            datetime(2021, 5, 1),
+            datetime(2021, 8, 20),
+            None,
+        ],
+    }
+
+
+CUSTOMERS_COLUMNS = {"uid": ["a", "b", "d"], "country": ["IT", "FR", "DE"]}
+
+
+def columnar_engine(array=list):
+    return engine.ColumnarEngine({ORDERS: orders(array), CUSTOMERS: CUSTOMERS_COLUMNS})
+
+
+def projection(attribute_uri, alias=None):
+    return data.ProjectionAttribute(attribute_uri=attribute_uri, alias=alias or attribute_uri.attribute_uid)
+
+
+def expression(attribute_uri, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri, operator=operation.uid, value=value)
+
+
+def aggregation(attribute_uri, function, alias):
+    return data.AggregationAttribute(
+        attribute_uri=attribute_uri,
+        alias=alias,
+        function_uri=data.FunctionUri(function_type="aggregation", function_uid=function.uid),
+    )
+
+
+def group(attribute_uri, function, alias, function_params=None):
+    return data.BinningAttribute(
+        attribute_uri=attribute_uri,
+        alias=alias,
+        function_uri=data.FunctionUri(
+            function_type="group_by", function_uid=function.uid, function_params=function_params
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "where, expected_ids",
+    [
+        pytest.param(expression(order_attribute("price"), params.ParamOperation.EQUAL, "25"), [3], id="equal"),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.DIFFERENT, "25"), [1, 2, 4, 5], id="different"
+        ),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.GREATER_THAN, "25"), [4, 5], id="greater"
+        ),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "15"),
+            [1, 2],
+            id="less-equal",
+        ),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.BETWEEN, {"start": "15", "end": "35"}),
+            [2, 3, 4],
+            id="between",
+        ),
+        pytest.param(
+            expression(order_attribute("customer"), params.ParamOperation.IN, ("a", "c")), [1, 3, 4, 6], id="in"
+        ),
+        pytest.param(expression(order_attribute("customer"), params.ParamOperation.EMPTY), [5], id="empty"),
+        pytest.param(expression(order_attribute("price"), params.ParamOperation.NOT_EMPTY), [1, 2, 3, 4, 5], id="nan"),
+        pytest.param(
+            expression(order_attribute("created"), params.ParamOperation.GREATER_THAN, "2021-05-01"),
+            [5],
+            id="datetime",
+        ),
+        pytest.param(
+            query.MultiExpression(
+                criteria=query.CriteriaType.OR,
+                expressions=[
+                    expression(order_attribute("customer"), params.ParamOperation.STARTS_WITH, "b"),
+                    query.MultiExpression(
+                        criteria=query.CriteriaType.AND,
+                        expressions=[
+                            expression(order_attribute("customer"), params.ParamOperation.EQUAL, "a"),
+                            expression(order_attribute("price"), params.ParamOperation.LESS_THAN, "10"),
+                        ],
+                    ),
+                ],
+            ),
+            [1, 2],
+            id="multi-expression",
+        ),
+    ],
+)
+@pytest.mark.parametrize("array", [pytest.param(list, id="list"), pytest.param("numpy", id="numpy")])
+def test_select_where(where, expected_ids, array):
+    if array == "numpy":
+        array = pytest.importorskip("numpy").array
+    q = query.SelectQuery(from_=ORDERS, attributes=[projection(order_attribute("id"))], where=where)
+    assert expected_ids == [row["id"] for row in columnar_engine(array)(q)]
+
+
+def test_select_distinct_order_limit_offset():
+    q = query.SelectQuery(
+        from_=ORDERS,
+        attributes=[projection(order_attribute("customer")), shf.StaticValueAttributeFactory(value="x", alias="s")],
+        distinct=True,
+        order_by=[data.OrderByAttribute(alias="customer", direction=data.OrderByDirection.DESC)],
+        offset=1,
+        limit=2,
+    )
+    assert [{"customer": "c", "s": "x"}, {"customer": "b", "s": "x"}] == columnar_engine()(q)
+
+
+@pytest.mark.parametrize("array", [pytest.param(list, id="list"), pytest.param("numpy", id="numpy")])
+def test_aggregation_query(array):
+    if array == "numpy":
+        array = pytest.importorskip("numpy").array
+    q = query.AggregationQuery(
+        from_=ORDERS,
+        aggregations=[
+            aggregation(order_attribute("price"), attribute.AggregationFunction.SUM, "sum"),
+            aggregation(order_attribute("price"), attribute.AggregationFunction.AVG, "avg"),
+            aggregation(order_attribute("price"), attribute.AggregationFunction.COUNT, "count"),
+            aggregation(order_attribute("customer"), attribute.AggregationFunction.DISTINCT_COUNT, "customers"),
+            aggregation(order_attribute("id"), attribute.AggregationFunction.MIN, "min"),
+            aggregation(order_attribute("id"), attribute.AggregationFunction.MAX, "max"),
+        ],
+    )
+    assert [{"sum": 125.0, "avg": 25.0, "count": 5, "customers": 3, "min": 1, "max": 6}] == columnar_engine(array)(q)
+
+
+def test_aggregation_query_without_rows():
+    q = query.AggregationQuery(
+        from_=ORDERS,
+        aggregations=[aggregation(order_attribute("price"), attribute.AggregationFunction.COUNT, "count")],
+        where=expression(order_attribute("price"), params.ParamOperation.GREATER_THAN, "100"),
+    )
+    assert [{"count": 0}] == columnar_engine()(q)
+
+
+@pytest.mark.parametrize("array", [pytest.param(list, id="list"), pytest.param("numpy", id="numpy")])
+def test_group_by_query(array):
+    if array == "numpy":
+        array = pytest.importorskip("numpy").array
+    rules = shf.BinningRulesFactory(bins=[shf.BinFactory(ge=None, lt=20), shf.BinFactory(ge=20, lt=None)])
+    q = query.GroupByQuery(
+        from_=ORDERS,
+        groups=[
+            group(order_attribute("created"), attribute.GroupByFunction.DATE_TRUNC_SEMESTER, "semester"),
+            group(order_attribute("price"), attribute.GroupByFunction.NUMERIC_BINNING, "price", rules),
+        ],
+        aggregations=[aggregation(order_attribute("price"), attribute.AggregationFunction.SUM, "total")],
+        where=expression(order_attribute("created"), params.ParamOperation.NOT_EMPTY),
+        order_by=[data.OrderByAttribute(alias="total", direction=data.OrderByDirection.DESC)],
+    )
+    assert [
+        {"semester": datetime(2021, 1, 1), "price": "20.0-None", "total": 60.0},
+        {"semester": datetime(2021, 7, 1), "price": "20.0-None", "total": 45.0},
+        {"semester": datetime(2021, 1, 1), "price": "None-20.0", "total": 20.0},
+    ] == columnar_engine(array)(q)
+
+
+@pytest.mark.parametrize(
+    "function, expected",
+    [
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_DAY, "2021-03-17T00:00:00", id="day"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_WEEK, "2021-03-15T00:00:00", id="week"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_MONTH, "2021-03-01T00:00:00", id="month"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_QUARTER, "2021-01-01T00:00:00", id="quarter"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_YEAR, "2021-01-01T00:00:00", id="year"),
+    ],
+)
+def test_group_by_date_truncation_of_iso_strings(function, expected):
+    collection = uri.CollectionUri(datasource_uid="ds", collection_uid="events")
+    attribute_uri = uri.AttributeUri(attribute_uid="at", **collection.dict())
+    q = query.GroupByQuery(
+        from_=collection,
+        groups=[group(attribute_uri, function, "period")],
+        aggregations=[aggregation(attribute_uri, attribute.AggregationFunction.COUNT, "count")],
+    )
+    result = engine.ColumnarEngine({collection: {"at": ["2021-03-17T15:30:00"]}})(q)
+    assert [{"period": expected, "count": 1}] == result
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param("2021-03-17", "2021-03-15", id="date"),
+        pytest.param("2021-03-17T15:30:00Z", "2021-03-15T00:00:00+00:00", id="utc"),
+        pytest.param("2021-03-17T15:30:00+02:00", "2021-03-15T00:00:00+02:00", id="offset"),
+        pytest.param(date(2021, 3, 17), date(2021, 3, 15), id="date-object"),
+    ],
+)
+def test_group_by_date_truncation_keeps_dates_and_time_zones(value, expected):
+    collection = uri.CollectionUri(datasource_uid="ds", collection_uid="events")
+    attribute_uri = uri.AttributeUri(attribute_uid="at", **collection.dict())
+    q = query.GroupByQuery(
+        from_=collection,
+        groups=[group(attribute_uri, attribute.GroupByFunction.DATE_TRUNC_WEEK, "week")],
+        aggregations=[aggregation(attribute_uri, attribute.AggregationFunction.COUNT, "count")],
+    )
+    result = engine.ColumnarEngine({collection: {"at": [value]}})(q)
+    assert [{"week": expected, "count": 1}] == result
+
+
+@pytest.mark.parametrize(
+    "join_type, expected",
+    [
+        pytest.param(query.JoinType.INNER, [(1, "IT"), (2, "FR"), (3, "IT"), (6, "IT")], id="inner"),
+        pytest.param(
+            query.JoinType.LEFT_OUTER,
+            [(1, "IT"), (2, "FR"), (3, "IT"), (4, None), (5, None), (6, "IT")],
+            id="left-outer",
+        ),
+        pytest.param(
+            query.JoinType.RIGHT_OUTER, [(1, "IT"), (2, "FR"), (3, "IT"), (6, "IT"), (None, "DE")], id="right-outer"
+        ),
+    ],
+)
+def test_select_join(join_type, expected):
+    q = query.SelectQuery(
+        from_=query.Join(
+            left=query.JoinPart(from_=ORDERS, on=order_attribute("customer")),
+            right=query.JoinPart(from_=CUSTOMERS, on=customer_attribute("uid")),
+            type=join_type,
+        ),
+        attributes=[projection(order_attribute("id")), projection(customer_attribute("country"))],
+    )
+    assert expected == [(row["id"], row["country"]) for row in columnar_engine()(q)]
+
+
+def test_engine_raises_for_unknown_collection_and_attribute():
+    unknown = uri.CollectionUri(datasource_uid="shop", collection_uid="unknown")
+    with pytest.raises(ValueError, match="collection unknown not found"):
+        columnar_engine()(query.SelectQuery(from_=unknown, attributes=[projection(order_attribute("id"))]))
+    with pytest.raises(ValueError, match="attribute unknown not found"):
+        columnar_engine()(query.SelectQuery(from_=ORDERS, attributes=[projection(order_attribute("unknown"))]))
+
+
+def test_engine_as_chassis_engine_with_bin_interpolation():
+    rules = shf.BinningRulesFactory(
+        bins=[shf.BinFactory(ge=0, lt=10), shf.BinFactory(ge=10, lt=20), shf.BinFactory(ge=20, lt=None)]
+    )
+    q = query.GroupByQuery(
+        from_=ORDERS,
+        groups=[group(order_attribute("price"), attribute.GroupByFunction.NUMERIC_BINNING, "price", rules)],
+        aggregations=[aggregation(order_attribute("id"), attribute.AggregationFunction.COUNT, "orders")],
+        where=expression(order_attribute("price"), params.ParamOperation.DIFFERENT, "15"),
+    )
+    assert [
+        {"price": "0.0-10.0", "orders": 1},
+        {"price": "10.0-20.0", "orders": None},
+        {"price": "20.0-None", "orders": 3},
+    ] == chassis.Chassis(query=q, engine=columnar_engine()).run()
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from igenius_adapters_sdk.entities import attribute, data, params, query, uri
+from igenius_adapters_sdk.tools import engine, join
+
+ORDERS = uri.CollectionUri(datasource_uid="shop", collection_uid="orders")
+ITEMS = uri.CollectionUri(datasource_uid="shop", collection_uid="items")
+CUSTOMERS = uri.CollectionUri(datasource_uid="crm", collection_uid="customers")
+COUNTRIES = uri.CollectionUri(datasource_uid="geo", collection_uid="countries")
+
+COLLECTIONS = {
+    ORDERS: {"id": [1, 2, 3, 4, 5, 6], "customer": ["a", "b", "a", "c", None, "a"], "price": [5, 15, 25, 35, 45, 55]},
+    ITEMS: {"order": [1, 1, 2, 3, 6, 7], "sku": ["x", "y", "x", "z", "y", "x"]},
+    CUSTOMERS: {"uid": ["a", "b", "d"], "country": ["IT", "FR", "DE"]},
+    COUNTRIES: {"code": ["IT", "DE", "US"], "continent": ["EU", "EU", "NA"]},
+}
+
+
+def attribute_uri(collection_uri, uid):
+    return uri.AttributeUri(attribute_uid=uid, **collection_uri.dict())
+
+
+def projection(attribute_uri):
+    return data.ProjectionAttribute(attribute_uri=attribute_uri, alias=attribute_uri.attribute_uid)
+
+
+def expression(attribute_uri, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri, operator=operation.uid, value=value)
+
+
+def join_customers(join_type, left=ORDERS):
+    return query.Join(
+        left=query.JoinPart(from_=left, on=attribute_uri(ORDERS, "customer")),
+        right=query.JoinPart(from_=CUSTOMERS, on=attribute_uri(CUSTOMERS, "uid")),
+        type=join_type,
+    )
+
+
+def join_items(join_type):
+    return query.Join(
+        left=query.JoinPart(from_=ORDERS, on=attribute_uri(ORDERS, "id")),
+        right=query.JoinPart(from_=ITEMS, on=attribute_uri(ITEMS, "order")),
+        type=join_type,
+    )
+
+
+def join_countries(join_type, left):
+    return query.Join(
+        left=query.JoinPart(from_=left, on=attribute_uri(CUSTOMERS, "country")),
+        right=query.JoinPart(from_=COUNTRIES, on=attribute_uri(COUNTRIES, "code")),
+        type=join_type,
+    )
+
+
+class StandInEngines(dict):
+    """Engines of the datasources, each over its own collections, recording the queries they receive."""
+
+    def __init__(self, kind="sync"):
+        super().__init__()
+        self.queries = []
+        for datasource_uid in ("shop", "crm", "geo"):
+            collections = {c: columns for c, columns in COLLECTIONS.items() if c.datasource_uid == datasource_uid}
+            self[datasource_uid] = getattr(self, kind)(engine.ColumnarEngine(collections))
+
+    def sync(self, columnar_engine):
+        def run(q):
+            self.queries.append(q)
+            return columnar_engine(q)
+
+        return run
+
+    def coroutine(self, columnar_engine):
+        async def run(q):
+            self.queries.append(q)
+            await asyncio.sleep(0.01 * len(self.queries))
+            return columnar_engine(q)
+
+        return run
+
+    def generator(self, columnar_engine):
+        async def run(q):
+            self.queries.append(q)
+            for row in columnar_engine(q):
+                await asyncio.sleep(0)
+                yield row
+
+        return run
+
+
+def expected(q):
+    return engine.ColumnarEngine(COLLECTIONS)(q)
+
+
+def ordered(rows):
+    return sorted(rows, key=lambda row: [(v is None, str(v)) for v in row.values()])
+
+
+@pytest.mark.parametrize("kind", ["sync", "coroutine", "generator"])
+@pytest.mark.parametrize("join_type", list(query.JoinType))
+@pytest.mark.parametrize(
+    "where",
+    [
+        pytest.param(None, id="no-where"),
+        pytest.param(
+            query.MultiExpression(
+                criteria=query.CriteriaType.AND,
+                expressions=[
+                    expression(attribute_uri(ORDERS, "price"), params.ParamOperation.GREATER_THAN, "10"),
+                    expression(attribute_uri(CUSTOMERS, "country"), params.ParamOperation.DIFFERENT, "FR"),
+                ],
+            ),
+            id="pushed-down",
+        ),
+        pytest.param(
+            query.MultiExpression(
+                criteria=query.CriteriaType.OR,
+                expressions=[
+                    expression(attribute_uri(ORDERS, "price"), params.ParamOperation.LESS_THAN, "10"),
+                    expression(attribute_uri(CUSTOMERS, "country"), params.ParamOperation.EMPTY),
+                ],
+            ),
+            id="residual",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_select_join(kind, join_type, where):
+    q = query.SelectQuery(
+        from_=join_customers(join_type),
+        attributes=[projection(attribute_uri(ORDERS, "id")), projection(attribute_uri(CUSTOMERS, "country"))],
+        where=where,
+    )
+    assert ordered(expected(q)) == ordered(await join.JoinExecutor(StandInEngines(kind))(q))
+
+
+@pytest.mark.asyncio
+async def test_nested_join_delegates_single_datasource_subtrees():
+    engines = StandInEngines("coroutine")
+    q = query.GroupByQuery(
+        from_=join_countries(
+            query.JoinType.LEFT_OUTER, join_customers(query.JoinType.INNER, join_items(query.JoinType.INNER))
+        ),
+        groups=[
+            data.BinningAttribute(
+                attribute_uri=attribute_uri(COUNTRIES, "continent"),
+                alias="continent",
+                function_uri=data.FunctionUri(
+                    function_type="group_by", function_uid=attribute.GroupByFunction.IDENTITY.uid
+                ),
+            )
+        ],
+        aggregations=[
+            data.AggregationAttribute(
+                attribute_uri=attribute_uri(ITEMS, "sku"),
+                alias="skus",
+                function_uri=data.FunctionUri(
+                    function_type="aggregation", function_uid=attribute.AggregationFunction.DISTINCT_COUNT.uid
+                ),
+            )
+        ],
+        where=expression(attribute_uri(ORDERS, "price"), params.ParamOperation.LESS_THAN, "50"),
+        order_by=[data.OrderByAttribute(alias="continent")],
+    )
+    result = await join.JoinExecutor(engines)(q)
+    assert [{"continent": "EU", "skus": 3}, {"continent": None, "skus": 1}] == result == expected(q)
+    shop = next(q for q in engines.queries if isinstance(q.from_, query.Join))
+    assert join_items(query.JoinType.INNER) == shop.from_
+    assert expression(attribute_uri(ORDERS, "price"), params.ParamOperation.LESS_THAN, "50") == shop.where
+    assert 3 == len(engines.queries)
+
+
+@pytest.mark.asyncio
+async def test_single_datasource_queries_are_passed_to_their_engine():
+    engines = StandInEngines()
+    q = query.SelectQuery(from_=join_items(query.JoinType.INNER), attributes=[projection(attribute_uri(ITEMS, "sku"))])
+    assert expected(q) == await join.JoinExecutor(engines)(q)
+    assert [q] == engines.queries
+
+
+@pytest.mark.asyncio
+async def test_raises_without_the_engine_of_a_datasource():
+    q = query.SelectQuery(
+        from_=join_customers(query.JoinType.INNER), attributes=[projection(attribute_uri(ORDERS, "id"))]
+    )
+    with pytest.raises(ValueError, match="no engine for datasource crm"):
+        await join.JoinExecutor({"shop": StandInEngines()["shop"]})(q)
+
+
+@pytest.mark.asyncio
+async def test_engine_errors_are_propagated():
+    async def failing(q):
+        raise RuntimeError("connection lost")
+
+    q = query.SelectQuery(
+        from_=join_customers(query.JoinType.INNER), attributes=[projection(attribute_uri(ORDERS, "id"))]
+    )
+    with pytest.raises(RuntimeError, match="connection lost"):
+        await join.JoinExecutor({**StandInEngines(), "crm": failing})(q)
+
+
+@pytest.mark.asyncio
+async def test_synchronous_engines_run_concurrently():
+    # each engine waits for the other one: they'd time out if run one after the other on the event loop
+    barrier = threading.Barrier(2, timeout=5)
+
+    def waiting(datasource_engine):
+        def run(q):
+            barrier.wait()
+            return datasource_engine(q)
+
+        return run
+
+    q = query.SelectQuery(
+        from_=join_customers(query.JoinType.INNER), attributes=[projection(attribute_uri(CUSTOMERS, "country"))]
+    )
+    engines = {datasource_uid: waiting(e) for datasource_uid, e in StandInEngines().items()}
+    with ThreadPoolExecutor(2) as executor:
+        assert ordered(expected(q)) == ordered(await join.JoinExecutor(engines, executor)(q))
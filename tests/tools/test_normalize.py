@@ -0,0 +1,346 @@
+import random
+
+import pytest
+
+from igenius_adapters_sdk.entities import params, query, uri
+from igenius_adapters_sdk.tools import normalize, predicate
+
+COLLECTION = uri.CollectionUri(datasource_uid="ds", collection_uid="co")
+A, B = (uri.AttributeUri(attribute_uid=uid, **COLLECTION.dict()) for uid in ("a", "b"))
+AND, OR = query.CriteriaType.AND, query.CriteriaType.OR
+
+
+def expression(attribute_uri, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri, operator=operation.uid, value=value)
+
+
+def multi_expression(criteria, *expressions):
+    return query.MultiExpression(criteria=criteria, expressions=list(expressions))
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        pytest.param(None, None, id="none"),
+        pytest.param(
+            multi_expression(AND, multi_expression(AND, expression(A, params.ParamOperation.EQUAL, "1"))),
+            expression(A, params.ParamOperation.EQUAL, "1"),
+            id="unwrap",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(B, params.ParamOperation.CONTAINS, "x"),
+                multi_expression(AND, expression(A, params.ParamOperation.EQUAL, "1")),
+                expression(B, params.ParamOperation.CONTAINS, "x"),
+            ),
+            multi_expression(
+                AND, expression(B, params.ParamOperation.CONTAINS, "x"), expression(A, params.ParamOperation.EQUAL, "1")
+            ),
+            id="flatten-deduplicate",
+        ),
+        pytest.param(
+            multi_expression(
+                OR,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(B, params.ParamOperation.EMPTY),
+                expression(A, params.ParamOperation.IN, ("2", "1")),
+            ),
+            multi_expression(
+                OR, expression(A, params.ParamOperation.IN, ("1", "2")), expression(B, params.ParamOperation.EMPTY)
+            ),
+            id="or-equal-in",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("1", "5", "9")),
+                expression(A, params.ParamOperation.IN, ("5", "9", "7")),
+            ),
+            expression(A, params.ParamOperation.IN, ("5", "9")),
+            id="and-in",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("1", "5", "9")),
+                expression(A, params.ParamOperation.GREATER_THAN, "2"),
+                expression(A, params.ParamOperation.DIFFERENT, "9"),
+            ),
+            expression(A, params.ParamOperation.EQUAL, "5"),
+            id="and-in-range-different",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN, "5"),
+                expression(A, params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "10"),
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "7"),
+            ),
+            expression(A, params.ParamOperation.BETWEEN, {"start": "7", "end": "10"}),
+            id="and-ranges",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.BETWEEN, {"start": "2021-01-01", "end": "2021-12-31"}),
+                expression(A, params.ParamOperation.LESS_THAN, "2021-06-01"),
+                expression(A, params.ParamOperation.GREATER_THAN, "2021-01-01"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN, "2021-01-01"),
+                expression(A, params.ParamOperation.LESS_THAN, "2021-06-01"),
+            ),
+            id="and-date-ranges",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "3"),
+                expression(A, params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "3"),
+            ),
+            expression(A, params.ParamOperation.EQUAL, "3"),
+            id="and-ranges-equal",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "3"),
+                expression(A, params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "3.0"),
+            ),
+            expression(A, params.ParamOperation.BETWEEN, {"start": "3", "end": "3.0"}),
+            id="and-ranges-equal-numbers",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "100"),
+                expression(A, params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "2"),
+            ),
+            # empty for numbers, not for strings: "150" is between them
+            expression(A, params.ParamOperation.BETWEEN, {"start": "100", "end": "2"}),
+            id="and-ranges-string-order",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("150", "3")),
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "100"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("150", "3")),
+                expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "100"),
+            ),
+            id="and-in-range-string-order",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.DIFFERENT, "1.0"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.DIFFERENT, "1.0"),
+            ),
+            id="and-equal-different-written-differently",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("1", "2")),
+                expression(A, params.ParamOperation.DIFFERENT, "2.0"),
+                expression(A, params.ParamOperation.DIFFERENT, "1"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "2"),
+                expression(A, params.ParamOperation.DIFFERENT, "2.0"),
+            ),
+            id="and-in-different-written-differently",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.NOT_EMPTY),
+                expression(A, params.ParamOperation.STARTS_WITH, "x"),
+            ),
+            expression(A, params.ParamOperation.STARTS_WITH, "x"),
+            id="and-not-empty",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.EQUAL, "1.0"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.EQUAL, "1.0"),
+            ),
+            id="ambiguous-values",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN, "a"),
+                expression(A, params.ParamOperation.GREATER_THAN, "5"),
+            ),
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN, "a"),
+                expression(A, params.ParamOperation.GREATER_THAN, "5"),
+            ),
+            id="incomparable-ranges",
+        ),
+        pytest.param(
+            multi_expression(OR, multi_expression(AND), expression(A, params.ParamOperation.EQUAL, "1")),
+            None,
+            id="always-true",
+        ),
+        pytest.param(
+            multi_expression(
+                OR,
+                expression(B, params.ParamOperation.EQUAL, "x"),
+                multi_expression(
+                    AND,
+                    expression(A, params.ParamOperation.EQUAL, "1"),
+                    expression(A, params.ParamOperation.EQUAL, "2"),
+                ),
+            ),
+            expression(B, params.ParamOperation.EQUAL, "x"),
+            id="or-drops-always-false",
+        ),
+    ],
+)
+def test_normalize_where(where, expected):
+    assert expected == normalize.normalize_where(where)
+
+
+@pytest.mark.parametrize(
+    "where",
+    [
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.GREATER_THAN, "5"),
+                expression(A, params.ParamOperation.LESS_THAN, "5"),
+            ),
+            id="ranges",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.IN, ("1", "2")),
+                expression(A, params.ParamOperation.IN, ("3", "4")),
+            ),
+            id="values",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.DIFFERENT, "1"),
+            ),
+            id="different",
+        ),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(A, params.ParamOperation.EQUAL, "1"),
+                expression(A, params.ParamOperation.BETWEEN, {"start": "2", "end": "3"}),
+            ),
+            id="values-out-of-range",
+        ),
+        pytest.param(
+            multi_expression(
+                AND, expression(A, params.ParamOperation.EMPTY), expression(A, params.ParamOperation.NOT_EMPTY)
+            ),
+            id="empty",
+        ),
+        pytest.param(expression(A, params.ParamOperation.BETWEEN, {"start": "3", "end": "2"}), id="between"),
+        pytest.param(
+            multi_expression(
+                AND,
+                expression(B, params.ParamOperation.CONTAINS, "x"),
+                multi_expression(
+                    OR,
+                    multi_expression(OR),
+                    multi_expression(
+                        AND,
+                        expression(A, params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "2021-02-01"),
+                        expression(A, params.ParamOperation.LESS_THAN, "2021-02-01"),
+                    ),
+                ),
+            ),
+            id="nested",
+        ),
+    ],
+)
+def test_normalize_where_always_false(where):
+    normalized = normalize.normalize_where(where)
+    assert normalize.is_always_false(normalized)
+    assert normalized == normalize.ALWAYS_FALSE
+
+
+def random_where(rng, values, depth=0):
+    if depth < 3 and rng.random() < 0.4:
+        children = [random_where(rng, values, depth + 1) for _ in range(rng.randint(0, 4))]
+        return multi_expression(rng.choice([AND, OR]), *children)
+    attribute_uri = rng.choice([A, B])
+    value = lambda: str(rng.choice(values))  # noqa: E731
+    operation = rng.choice(
+        [
+            params.ParamOperation.EQUAL,
+            params.ParamOperation.DIFFERENT,
+            params.ParamOperation.IN,
+            params.ParamOperation.GREATER_THAN,
+            params.ParamOperation.LESS_THAN_OR_EQUAL_TO,
+            params.ParamOperation.BETWEEN,
+            params.ParamOperation.EMPTY,
+            params.ParamOperation.NOT_EMPTY,
+        ]
+    )
+    if operation == params.ParamOperation.IN:
+        return expression(attribute_uri, operation, tuple(value() for _ in range(rng.randint(1, 3))))
+    if operation == params.ParamOperation.BETWEEN:
+        return expression(attribute_uri, operation, {"start": value(), "end": value()})
+    if operation in (params.ParamOperation.EMPTY, params.ParamOperation.NOT_EMPTY):
+        return expression(attribute_uri, operation)
+    return expression(attribute_uri, operation, value())
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        pytest.param(list(range(7)), id="numbers"),
+        # numbers written in different ways, e.g. "2" and "2.0"
+        pytest.param([0, 1, 1.0, 2, 2.0, 3], id="numbers-written-differently"),
+        # string attributes whose values parse as numbers, compared as strings
+        pytest.param(["1", "2", "3", "3.0", "10", "100", "150"], id="strings"),
+    ],
+)
+def test_normalize_where_preserves_the_matching_rows(values):
+    rng = random.Random(42)
+    rows = [{"a": a, "b": b} for a in [None, *values] for b in [None, *values]]
+    for _ in range(500):
+        where = random_where(rng, values)
+        normalized = normalize.normalize_where(where)
+        expected = [row for row in rows if predicate.compile_where(where)(row)]
+        assert expected == [row for row in rows if normalized is None or predicate.compile_where(normalized)(row)]
+        assert normalized == normalize.normalize_where(normalized)
+
+
+def test_normalize_query():
+    q = query.SelectQuery(
+        from_=COLLECTION,
+        attributes=[],
+        where=multi_expression(AND, expression(A, params.ParamOperation.EQUAL, "1")),
+    )
+    normalized = normalize.normalize_query(q)
+    assert expression(A, params.ParamOperation.EQUAL, "1") == normalized.where
+    assert multi_expression(AND, expression(A, params.ParamOperation.EQUAL, "1")) == q.where
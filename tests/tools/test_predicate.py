@@ -0,0 +1,160 @@
+from datetime import date
+
+import pytest
+
+from igenius_adapters_sdk.entities import params, query, uri
+from igenius_adapters_sdk.tools import predicate
+
+COLLECTION = uri.CollectionUri(datasource_uid="ds", collection_uid="co")
+
+
+def attribute_uri(uid):
+    return uri.AttributeUri(attribute_uid=uid, **COLLECTION.dict())
+
+
+def expression(uid, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri(uid), operator=operation.uid, value=value)
+
+
+def multi_expression(criteria, *expressions):
+    return query.MultiExpression(criteria=criteria, expressions=list(expressions))
+
+
+ROWS = [
+    {"n": 1, "s": "apple", "d": date(2021, 1, 1)},
+    {"n": 2.5, "s": "banana", "d": date(2021, 6, 1)},
+    {"n": None, "s": "cherry", "d": None},
+    {"n": float("nan"), "s": None, "d": date(2022, 1, 1)},
+    {"n": 10, "s": "apricot", "d": date(2020, 12, 31)},
+]
+COLUMNS = {key: [row[key] for row in ROWS] for key in ROWS[0]}
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        pytest.param(expression("n", params.ParamOperation.EQUAL, "1"), [0], id="equal"),
+        pytest.param(expression("n", params.ParamOperation.DIFFERENT, "1"), [1, 4], id="different"),
+        pytest.param(expression("n", params.ParamOperation.GREATER_THAN, "2"), [1, 4], id="greater"),
+        pytest.param(expression("n", params.ParamOperation.LESS_THAN_OR_EQUAL_TO, "2.5"), [0, 1], id="less-equal"),
+        pytest.param(
+            expression("d", params.ParamOperation.BETWEEN, {"start": "2021-01-01", "end": "2021-12-31"}),
+            [0, 1],
+            id="between-dates",
+        ),
+        pytest.param(expression("s", params.ParamOperation.IN, ("apple", "cherry")), [0, 2], id="in"),
+        pytest.param(expression("s", params.ParamOperation.CONTAINS, "an"), [1], id="contains"),
+        pytest.param(expression("s", params.ParamOperation.NOT_CONTAINS, "an"), [0, 2, 4], id="not-contains"),
+        pytest.param(expression("s", params.ParamOperation.STARTS_WITH, "ap"), [0, 4], id="starts-with"),
+        pytest.param(expression("s", params.ParamOperation.ENDS_WITH, "y"), [2], id="ends-with"),
+        pytest.param(expression("n", params.ParamOperation.EMPTY), [2, 3], id="empty"),
+        pytest.param(expression("n", params.ParamOperation.NOT_EMPTY), [0, 1, 4], id="not-empty"),
+        pytest.param(
+            multi_expression(
+                query.CriteriaType.AND,
+                expression("s", params.ParamOperation.STARTS_WITH, "a"),
+                expression("n", params.ParamOperation.GREATER_THAN, "5"),
+            ),
+            [4],
+            id="and",
+        ),
+        pytest.param(
+            multi_expression(
+                query.CriteriaType.OR,
+                expression("s", params.ParamOperation.EQUAL, "banana"),
+                multi_expression(
+                    query.CriteriaType.AND,
+                    expression("n", params.ParamOperation.EMPTY),
+                    expression("d", params.ParamOperation.NOT_EMPTY),
+                ),
+                expression("n", params.ParamOperation.LESS_THAN, "2"),
+            ),
+            [0, 1, 3],
+            id="or",
+        ),
+        pytest.param(multi_expression(query.CriteriaType.AND), [0, 1, 2, 3, 4], id="empty-and"),
+        pytest.param(multi_expression(query.CriteriaType.OR), [], id="empty-or"),
+    ],
+)
+def test_compile_where(where, expected):
+    compiled = predicate.compile_where(where)
+    assert expected == [i for i, row in enumerate(ROWS) if compiled(row)]
+    assert expected == list(compiled.select(COLUMNS, range(len(ROWS))))
+    assert [i in expected for i in range(len(ROWS))] == compiled.mask(COLUMNS, len(ROWS))
+
+
+def test_compile_where_numpy_columns():
+    numpy = pytest.importorskip("numpy")
+    columns = {"n": numpy.array([1.0, 2.5, numpy.nan, 7.0, 10.0]), "i": numpy.arange(5)}
+    where = multi_expression(
+        query.CriteriaType.OR,
+        multi_expression(
+            query.CriteriaType.AND,
+            expression("n", params.ParamOperation.DIFFERENT, "7"),
+            expression("i", params.ParamOperation.IN, ("0", "2", "4")),
+        ),
+        expression("n", params.ParamOperation.BETWEEN, {"start": "2", "end": "3"}),
+    )
+    selection = predicate.compile_where(where).select(columns, range(5))
+    assert isinstance(selection, numpy.ndarray)
+    assert [0, 1, 4] == selection.tolist()
+
+
+def test_and_evaluates_the_most_selective_child_first():
+    class Row(dict):
+        def __getitem__(self, key):
+            accessed.append(key)
+            return super().__getitem__(key)
+
+    accessed = []
+    where = multi_expression(
+        query.CriteriaType.AND,
+        expression("s", params.ParamOperation.NOT_EMPTY),
+        expression("n", params.ParamOperation.EQUAL, "3"),
+    )
+    assert not predicate.compile_where(where)(Row(ROWS[0]))
+    assert ["n"] == accessed
+
+
+def test_children_test_only_the_rows_left_by_the_previous_ones():
+    class Column(list):
+        def __getitem__(self, index):
+            accessed.append(index)
+            return super().__getitem__(index)
+
+    accessed = []
+    columns = {**COLUMNS, "n": Column(COLUMNS["n"])}
+    where = multi_expression(
+        query.CriteriaType.AND,
+        expression("s", params.ParamOperation.STARTS_WITH, "a"),
+        expression("n", params.ParamOperation.GREATER_THAN, "5"),
+    )
+    assert [4] == predicate.compile_where(where).select(columns, range(len(ROWS)))
+    assert [0, 4] == accessed
+
+
+def test_compile_where_key():
+    where = expression("s", params.ParamOperation.EQUAL, "apple")
+    compiled = predicate.compile_where(where, key=lambda attribute_uri: attribute_uri)
+    assert compiled({attribute_uri("s"): "apple"})
+
+
+@pytest.mark.parametrize(
+    "where, row, message",
+    [
+        pytest.param(
+            expression("n", params.ParamOperation.GREATER_THAN, "a lot"),
+            {"n": 1},
+            "value 'a lot' is not comparable with the attribute values",
+            id="not-comparable",
+        ),
+    ],
+)
+def test_compile_where_raises(where, row, message):
+    with pytest.raises(ValueError, match=message):
+        predicate.compile_where(where)(row)
+
+
+def test_predicate_is_abstract():
+    with pytest.raises(TypeError):
+        predicate.Predicate()
@@ -0,0 +1,158 @@
+import pytest
+
+from igenius_adapters_sdk.entities import data, params, query, uri
+from igenius_adapters_sdk.tools import engine, pushdown
+
+ORDERS = uri.CollectionUri(datasource_uid="shop", collection_uid="orders")
+CUSTOMERS = uri.CollectionUri(datasource_uid="crm", collection_uid="customers")
+COUNTRIES = uri.CollectionUri(datasource_uid="crm", collection_uid="countries")
+
+
+def attribute_uri(collection_uri, uid):
+    return uri.AttributeUri(attribute_uid=uid, **collection_uri.dict())
+
+
+def expression(attribute_uri, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri, operator=operation.uid, value=value)
+
+
+def conjunction(*expressions):
+    return query.MultiExpression(criteria=query.CriteriaType.AND, expressions=list(expressions))
+
+
+def disjunction(*expressions):
+    return query.MultiExpression(criteria=query.CriteriaType.OR, expressions=list(expressions))
+
+
+def join(join_type=query.JoinType.INNER, left=ORDERS):
+    return query.Join(
+        left=query.JoinPart(from_=left, on=attribute_uri(ORDERS, "customer")),
+        right=query.JoinPart(from_=CUSTOMERS, on=attribute_uri(CUSTOMERS, "uid")),
+        type=join_type,
+    )
+
+
+def select(from_, where):
+    return query.SelectQuery(
+        from_=from_,
+        attributes=[data.ProjectionAttribute(attribute_uri=attribute_uri(ORDERS, "id"), alias="id")],
+        where=where,
+    )
+
+
+PRICE = expression(attribute_uri(ORDERS, "price"), params.ParamOperation.GREATER_THAN, "10")
+COUNTRY = expression(attribute_uri(CUSTOMERS, "country"), params.ParamOperation.EQUAL, "IT")
+NO_COUNTRY = expression(attribute_uri(CUSTOMERS, "country"), params.ParamOperation.EMPTY)
+BOTH = disjunction(PRICE, COUNTRY)
+
+
+def test_plan_without_join():
+    assert pushdown.ScanNode(collection=ORDERS, where=PRICE) == pushdown.plan(select(ORDERS, PRICE))
+    assert pushdown.ScanNode(collection=ORDERS, where=None) == pushdown.plan(select(ORDERS, None))
+
+
+@pytest.mark.parametrize(
+    "join_type, where, expected_type, left, right, residual",
+    [
+        pytest.param(
+            query.JoinType.INNER,
+            conjunction(PRICE, conjunction(COUNTRY, BOTH)),
+            query.JoinType.INNER,
+            PRICE,
+            COUNTRY,
+            BOTH,
+            id="inner",
+        ),
+        pytest.param(
+            query.JoinType.LEFT_OUTER,
+            conjunction(PRICE, NO_COUNTRY),
+            query.JoinType.LEFT_OUTER,
+            PRICE,
+            None,
+            NO_COUNTRY,
+            id="left-outer-keeps-null-supplying-side",
+        ),
+        pytest.param(
+            query.JoinType.LEFT_OUTER,
+            conjunction(PRICE, COUNTRY, NO_COUNTRY),
+            query.JoinType.INNER,
+            PRICE,
+            conjunction(COUNTRY, NO_COUNTRY),
+            None,
+            id="left-outer-to-inner",
+        ),
+        pytest.param(
+            query.JoinType.RIGHT_OUTER,
+            conjunction(PRICE, NO_COUNTRY),
+            query.JoinType.INNER,
+            PRICE,
+            NO_COUNTRY,
+            None,
+            id="right-outer-to-inner",
+        ),
+        pytest.param(
+            query.JoinType.RIGHT_OUTER,
+            disjunction(PRICE, expression(attribute_uri(ORDERS, "id"), params.ParamOperation.EMPTY)),
+            query.JoinType.RIGHT_OUTER,
+            None,
+            None,
+            disjunction(PRICE, expression(attribute_uri(ORDERS, "id"), params.ParamOperation.EMPTY)),
+            id="right-outer-keeps-null-supplying-side",
+        ),
+    ],
+)
+def test_plan_join(join_type, where, expected_type, left, right, residual):
+    assert pushdown.JoinNode(
+        left=pushdown.ScanNode(collection=ORDERS, where=left),
+        right=pushdown.ScanNode(collection=CUSTOMERS, where=right),
+        left_on=attribute_uri(ORDERS, "customer"),
+        right_on=attribute_uri(CUSTOMERS, "uid"),
+        type=expected_type,
+        where=residual,
+    ) == pushdown.plan(select(join(join_type), where))
+
+
+def test_plan_nested_join():
+    country_join = query.Join(
+        left=query.JoinPart(from_=join(), on=attribute_uri(CUSTOMERS, "country")),
+        right=query.JoinPart(from_=COUNTRIES, on=attribute_uri(COUNTRIES, "code")),
+        type=query.JoinType.LEFT_OUTER,
+    )
+    continent = expression(attribute_uri(COUNTRIES, "continent"), params.ParamOperation.EMPTY)
+    plan = pushdown.plan(select(country_join, conjunction(PRICE, COUNTRY, continent)))
+    assert continent == plan.where
+    assert PRICE == plan.left.left.where
+    assert COUNTRY == plan.left.right.where
+
+
+COLUMNS = {
+    ORDERS: {"id": [1, 2, 3, 4, 5], "customer": ["a", "b", "a", "c", None], "price": [5, 15, 25, 35, 45]},
+    CUSTOMERS: {"uid": ["a", "b", "d"], "country": ["IT", None, "DE"]},
+}
+
+
+@pytest.mark.parametrize("join_type", list(query.JoinType))
+@pytest.mark.parametrize(
+    "where",
+    [
+        pytest.param(conjunction(PRICE, COUNTRY), id="both-sides"),
+        pytest.param(NO_COUNTRY, id="empty"),
+        pytest.param(BOTH, id="disjunction"),
+        pytest.param(conjunction(PRICE, NO_COUNTRY), id="left-and-empty"),
+    ],
+)
+def test_engine_results_with_pushdown(join_type, where):
+    """The engine filters before joining, with the same result of filtering the joined rows."""
+    columnar_engine = engine.ColumnarEngine(COLUMNS)
+    q = select(join(join_type), where)
+    filtered = columnar_engine.load(
+        pushdown.JoinNode(
+            left=pushdown.ScanNode(collection=ORDERS),
+            right=pushdown.ScanNode(collection=CUSTOMERS),
+            left_on=attribute_uri(ORDERS, "customer"),
+            right_on=attribute_uri(CUSTOMERS, "uid"),
+            type=join_type,
+            where=where,
+        )
+    )
+    assert columnar_engine.execute(q, filtered) == columnar_engine(q)
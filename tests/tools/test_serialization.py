@@ -0,0 +1,139 @@
+import asyncio
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from igenius_adapters_sdk.entities import query
+from igenius_adapters_sdk.tools import serialization, utils
+from tests import factories as shf
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+ROWS = [
+    {"price": "0.0-10.0", "quantity": 3, "avg": 1.5, "label": "10.0-None"},
+    {"price": "10.0-None", "quantity": None, "avg": float("nan"), "label": "x"},
+    {"price": "None-20.0", "quantity": 7, "avg": float("inf"), "label": "y"},
+]
+EXPECTED = [
+    {"price": "0.0-10.0", "quantity": 3, "avg": 1.5, "label": "10.0-None"},
+    {"price": "10.0-None", "quantity": None, "avg": None, "label": "x"},
+    {"price": "None-20.0", "quantity": 7, "avg": None, "label": "y"},
+]
+
+
+def test_dumps_rows(backend):
+    assert EXPECTED == json.loads(serialization.dumps(ROWS))
+    assert EXPECTED == json.loads(serialization.dumps(iter(ROWS)))
+    assert b"[]" == serialization.dumps([])
+
+
+def test_dumps_values(backend):
+    row = {
+        "day": date(2021, 5, 4),
+        "at": datetime(2021, 5, 4, 10, 30),
+        "amount": Decimal("1.25"),
+        "missing": Decimal("NaN"),
+        "nested": {"values": (1.0, float("-inf"))},
+        1: "numeric key",
+    }
+    expected = {
+        "day": "2021-05-04",
+        "at": "2021-05-04T10:30:00",
+        "amount": 1.25,
+        "missing": None,
+        "nested": {"values": [1.0, None]},
+        "1": "numeric key",
+    }
+    assert [expected] == json.loads(serialization.dumps([row]))
+    with pytest.raises(TypeError):
+        serialization.dumps([{"a": object()}])
+
+
+def test_dumps_numpy_values(backend):
+    if numpy is None:
+        pytest.skip("numpy is not installed")
+    row = {"a": numpy.float64("nan"), "b": numpy.int64(3), "c": numpy.array([1.0, numpy.nan])}
+    assert [{"a": None, "b": 3, "c": [1.0, None]}] == json.loads(serialization.dumps([row]))
+
+
+def test_dumps_columnar_results(backend):
+    result = utils.ColumnarResult.from_rows(ROWS)
+    assert EXPECTED == json.loads(serialization.dumps(result))
+    columns = json.loads(serialization.dumps(result, orient="columns"))
+    assert result.columns == columns["columns"]
+    assert [[row[c] for row in EXPECTED] for c in result.columns] == columns["data"]
+    with pytest.raises(ValueError):
+        serialization.dumps(result, orient="records")
+
+
+@pytest.mark.parametrize(
+    "entity",
+    [
+        shf.GroupByQueryFactory(where=shf.MultiExpressionFactory(), from_=shf.JoinFactory()),
+        shf.SelectQueryFactory(where=shf.ExpressionFactory(), order_by=[shf.OrderByAttributeFactory()]),
+        shf.BinningAttributeFactory(),
+    ],
+)
+def test_dumps_entities(backend, entity):
+    assert json.loads(entity.json(by_alias=True)) == json.loads(serialization.dumps(entity))
+    if isinstance(entity, query.BaseQuery):
+        assert entity == query.parse_query(serialization.dumps(entity))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 1000])
+def test_iter_dumps(backend, chunk_rows):
+    chunks = list(serialization.iter_dumps(iter(ROWS), chunk_rows=chunk_rows))
+    assert EXPECTED == json.loads(b"".join(chunks))
+    assert 2 + -(-len(ROWS) // chunk_rows) == len(chunks)
+    columnar = serialization.iter_dumps(utils.ColumnarResult.from_rows(ROWS), chunk_rows=chunk_rows)
+    assert EXPECTED == json.loads(b"".join(columnar))
+    assert [] == json.loads(b"".join(serialization.iter_dumps([], chunk_rows=chunk_rows)))
+
+
+def test_iter_dumps_consumes_rows_lazily():
+    consumed = []
+
+    def rows():
+        for i in range(10):
+            consumed.append(i)
+            yield {"i": i}
+
+    chunks = serialization.iter_dumps(rows(), chunk_rows=4)
+    assert [b"[", b'{"i":0},{"i":1},{"i":2},{"i":3}'] == [next(chunks), next(chunks)]
+    assert 4 == len(consumed)
+
+
+def test_chunk_rows_must_be_positive():
+    with pytest.raises(ValueError):
+        list(serialization.iter_dumps(ROWS, chunk_rows=0))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 1000])
+@pytest.mark.asyncio
+async def test_aiter_dumps(backend, chunk_rows):
+    async def rows():
+        for row in ROWS:
+            await asyncio.sleep(0)
+            yield row
+
+    async def no_rows():
+        for row in []:
+            yield row
+
+    assert EXPECTED == json.loads(b"".join([c async for c in serialization.aiter_dumps(rows(), chunk_rows)]))
+    assert [] == json.loads(b"".join([c async for c in serialization.aiter_dumps(no_rows(), chunk_rows)]))
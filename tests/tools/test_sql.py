@@ -0,0 +1,358 @@
+import sqlite3
+
+import pytest
+
+from igenius_adapters_sdk.entities import attribute, data, params, query, uri
+from igenius_adapters_sdk.tools import sql
+from tests import factories as shf
+
+ORDERS = uri.CollectionUri(datasource_uid="shop", collection_uid="orders")
+CUSTOMERS = uri.CollectionUri(datasource_uid="crm", collection_uid="customers")
+
+
+def order_attribute(uid):
+    return uri.AttributeUri(attribute_uid=uid, **ORDERS.dict())
+
+
+def customer_attribute(uid):
+    return uri.AttributeUri(attribute_uid=uid, **CUSTOMERS.dict())
+
+
+def projection(attribute_uri, alias=None):
+    return data.ProjectionAttribute(attribute_uri=attribute_uri, alias=alias or attribute_uri.attribute_uid)
+
+
+def expression(attribute_uri, operation, value=None):
+    return query.Expression(attribute_uri=attribute_uri, operator=operation.uid, value=value)
+
+
+def aggregation(attribute_uri, function, alias, function_params=None):
+    return data.AggregationAttribute(
+        attribute_uri=attribute_uri,
+        alias=alias,
+        function_uri=data.FunctionUri(
+            function_type="aggregation", function_uid=function.uid, function_params=function_params
+        ),
+    )
+
+
+def group(attribute_uri, function, alias, function_params=None):
+    return data.BinningAttribute(
+        attribute_uri=attribute_uri,
+        alias=alias,
+        function_uri=data.FunctionUri(
+            function_type="group_by", function_uid=function.uid, function_params=function_params
+        ),
+    )
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.row_factory = sqlite3.Row
+    connection.executescript("""
+        CREATE TABLE orders (id INTEGER, customer TEXT, price REAL, created TEXT);
+        INSERT INTO orders VALUES
+            (1, 'a', 5, '2021-01-04 10:00:00'),
+            (2, 'b', 15, '2021-01-07 11:00:00'),
+            (3, 'a', 25, '2021-02-10 00:00:00'),
+            (4, 'c', 35, '2021-05-01 00:00:00'),
+            (5, NULL, 45, '2021-08-20 00:00:00'),
+            (6, 'a%_', NULL, NULL);
+        CREATE TABLE customers (uid TEXT, country TEXT);
+        INSERT INTO customers VALUES ('a', 'IT'), ('b', 'FR'), ('d', 'DE');
+        """)
+    yield connection
+    connection.close()
+
+
+def fetch(connection, q, compiler=None):
+    statement = (compiler or sql.SqlCompiler()).compile(q)
+    return [dict(row) for row in connection.execute(statement.sql, statement.params)]
+
+
+@pytest.mark.parametrize(
+    "where, expected_ids",
+    [
+        pytest.param(expression(order_attribute("price"), params.ParamOperation.EQUAL, "25"), [3], id="equal"),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.DIFFERENT, "25"), [1, 2, 4, 5], id="different"
+        ),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.GREATER_THAN_OR_EQUAL_TO, "35"),
+            [4, 5],
+            id="greater-equal",
+        ),
+        pytest.param(
+            expression(order_attribute("price"), params.ParamOperation.BETWEEN, {"start": "15", "end": "35"}),
+            [2, 3, 4],
+            id="between",
+        ),
+        pytest.param(expression(order_attribute("customer"), params.ParamOperation.IN, ("a", "c")), [1, 3, 4], id="in"),
+        pytest.param(expression(order_attribute("customer"), params.ParamOperation.CONTAINS, "%_"), [6], id="like"),
+        pytest.param(
+            expression(order_attribute("customer"), params.ParamOperation.NOT_CONTAINS, "a"), [2, 4], id="not-like"
+        ),
+        pytest.param(
+            expression(order_attribute("customer"), params.ParamOperation.STARTS_WITH, "a"), [1, 3, 6], id="starts"
+        ),
+        pytest.param(expression(order_attribute("customer"), params.ParamOperation.ENDS_WITH, "_"), [6], id="ends"),
+        pytest.param(expression(order_attribute("price"), params.ParamOperation.EMPTY), [6], id="empty"),
+        pytest.param(
+            query.MultiExpression(
+                criteria=query.CriteriaType.OR,
+                expressions=[
+                    expression(order_attribute("customer"), params.ParamOperation.EQUAL, "b"),
+                    query.MultiExpression(
+                        criteria=query.CriteriaType.AND,
+                        expressions=[
+                            expression(order_attribute("customer"), params.ParamOperation.EQUAL, "a"),
+                            expression(order_attribute("price"), params.ParamOperation.LESS_THAN, "10"),
+                        ],
+                    ),
+                ],
+            ),
+            [1, 2],
+            id="multi-expression",
+        ),
+        pytest.param(query.MultiExpression(criteria=query.CriteriaType.OR, expressions=[]), [], id="empty-or"),
+        pytest.param(
+            query.MultiExpression(criteria=query.CriteriaType.AND, expressions=[]), [1, 2, 3, 4, 5, 6], id="empty-and"
+        ),
+    ],
+)
+def test_select_where(connection, where, expected_ids):
+    q = query.SelectQuery(from_=ORDERS, attributes=[projection(order_attribute("id"))], where=where)
+    assert expected_ids == [row["id"] for row in fetch(connection, q)]
+
+
+@pytest.mark.parametrize(
+    "limit, offset, expected",
+    [
+        pytest.param(2, None, ["c", "b"], id="limit"),
+        pytest.param(None, 2, ["a", None], id="offset"),
+        pytest.param(2, 1, ["b", "a"], id="limit-offset"),
+    ],
+)
+def test_select_distinct_order_limit_offset(connection, limit, offset, expected):
+    q = query.SelectQuery(
+        from_=ORDERS,
+        attributes=[projection(order_attribute("customer")), shf.StaticValueAttributeFactory(value="x", alias="s")],
+        where=expression(order_attribute("price"), params.ParamOperation.NOT_EMPTY),
+        distinct=True,
+        order_by=[data.OrderByAttribute(alias="customer", direction=data.OrderByDirection.DESC)],
+        limit=limit,
+        offset=offset,
+    )
+    assert [{"customer": c, "s": "x"} for c in expected] == fetch(connection, q)
+
+
+def test_aggregation_query(connection):
+    q = query.AggregationQuery(
+        from_=ORDERS,
+        aggregations=[
+            aggregation(order_attribute("price"), attribute.AggregationFunction.SUM, "sum"),
+            aggregation(order_attribute("price"), attribute.AggregationFunction.AVG, "avg"),
+            aggregation(order_attribute("price"), attribute.AggregationFunction.COUNT, "count"),
+            aggregation(order_attribute("customer"), attribute.AggregationFunction.DISTINCT_COUNT, "customers"),
+            aggregation(order_attribute("id"), attribute.AggregationFunction.MIN, "min"),
+            aggregation(order_attribute("id"), attribute.AggregationFunction.MAX, "max"),
+            aggregation(order_attribute("id"), attribute.AggregationFunction.STATIC, "static", 7),
+        ],
+    )
+    assert [{"sum": 125.0, "avg": 25.0, "count": 5, "customers": 4, "min": 1, "max": 6, "static": 7}] == fetch(
+        connection, q
+    )
+
+
+def test_group_by_query(connection):
+    rules = shf.BinningRulesFactory(bins=[shf.BinFactory(ge=None, lt=20), shf.BinFactory(ge=20, lt=None)])
+    q = query.GroupByQuery(
+        from_=ORDERS,
+        groups=[
+            group(order_attribute("created"), attribute.GroupByFunction.DATE_TRUNC_SEMESTER, "semester"),
+            group(order_attribute("price"), attribute.GroupByFunction.NUMERIC_BINNING, "price", rules),
+        ],
+        aggregations=[aggregation(order_attribute("price"), attribute.AggregationFunction.SUM, "total")],
+        where=expression(order_attribute("created"), params.ParamOperation.NOT_EMPTY),
+        order_by=[data.OrderByAttribute(alias="total", direction=data.OrderByDirection.DESC)],
+    )
+    assert [
+        {"semester": "2021-01-01 00:00:00", "price": "20.0-None", "total": 60.0},
+        {"semester": "2021-07-01 00:00:00", "price": "20.0-None", "total": 45.0},
+        {"semester": "2021-01-01 00:00:00", "price": "None-20.0", "total": 20.0},
+    ] == fetch(connection, q)
+
+
+@pytest.mark.parametrize(
+    "function, expected",
+    [
+        pytest.param(attribute.GroupByFunction.IDENTITY, "2021-03-17 15:30:00", id="identity"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_DAY, "2021-03-17 00:00:00", id="day"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_WEEK, "2021-03-15 00:00:00", id="week"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_MONTH, "2021-03-01 00:00:00", id="month"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_QUARTER, "2021-01-01 00:00:00", id="quarter"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_SEMESTER, "2021-01-01 00:00:00", id="semester"),
+        pytest.param(attribute.GroupByFunction.DATE_TRUNC_YEAR, "2021-01-01 00:00:00", id="year"),
+    ],
+)
+def test_group_by_date_truncation(connection, function, expected):
+    connection.execute("CREATE TABLE events (at TEXT)")
+    connection.execute("INSERT INTO events VALUES ('2021-03-17 15:30:00')")
+    collection = uri.CollectionUri(datasource_uid="ds", collection_uid="events")
+    attribute_uri = uri.AttributeUri(attribute_uid="at", **collection.dict())
+    q = query.GroupByQuery(
+        from_=collection,
+        groups=[group(attribute_uri, function, "period")],
+        aggregations=[aggregation(attribute_uri, attribute.AggregationFunction.COUNT, "count")],
+    )
+    assert [{"period": expected, "count": 1}] == fetch(connection, q)
+
+
+@pytest.mark.parametrize(
+    "join_type, expected",
+    [
+        pytest.param(query.JoinType.INNER, [(1, "IT"), (2, "FR"), (3, "IT")], id="inner"),
+        pytest.param(
+            query.JoinType.LEFT_OUTER,
+            [(1, "IT"), (2, "FR"), (3, "IT"), (4, None), (5, None), (6, None)],
+            id="left-outer",
+        ),
+        pytest.param(query.JoinType.RIGHT_OUTER, [(None, "DE"), (1, "IT"), (2, "FR"), (3, "IT")], id="right-outer"),
+    ],
+)
+def test_select_join(connection, join_type, expected):
+    q = query.SelectQuery(
+        from_=query.Join(
+            left=query.JoinPart(from_=ORDERS, on=order_attribute("customer")),
+            right=query.JoinPart(from_=CUSTOMERS, on=customer_attribute("uid")),
+            type=join_type,
+        ),
+        attributes=[projection(order_attribute("id")), projection(customer_attribute("country"))],
+        order_by=[data.OrderByAttribute(alias="id")],
+    )
+    assert expected == [(row["id"], row["country"]) for row in fetch(connection, q)]
+
+
+def test_compile_reuses_the_template_of_queries_with_the_same_shape():
+    compiler = sql.SqlCompiler()
+
+    def select(price, customers, limit):
+        return query.SelectQuery(
+            from_=ORDERS,
+            attributes=[projection(order_attribute("id"))],
+            where=query.MultiExpression(
+                criteria=query.CriteriaType.AND,
+                expressions=[
+                    expression(order_attribute("price"), params.ParamOperation.GREATER_THAN, price),
+                    expression(order_attribute("customer"), params.ParamOperation.IN, customers),
+                ],
+            ),
+            limit=limit,
+        )
+
+    first = compiler.compile(select("10", ("a", "b"), 5))
+    second = compiler.compile(select("20", ("c", "d"), 10))
+    assert first.sql is second.sql
+    assert ("10", "a", "b", 5) == first.params
+    assert ("20", "c", "d", 10) == second.params
+    assert (1, 1, 1) == (compiler.cache.misses, compiler.cache.hits, len(compiler.cache))
+
+    third = compiler.compile(select("20", ("c", "d", "e"), 10))
+    assert third.sql != second.sql
+    assert 2 == len(compiler.cache)
+
+
+def test_template_cache_evicts_least_recently_used():
+    cache = sql.TemplateCache(maxsize=2)
+    cache.put("a", "SELECT a")
+    cache.put("b", "SELECT b")
+    assert "SELECT a" == cache.get("a")
+    cache.put("c", "SELECT c")
+    assert (None, "SELECT a", "SELECT c") == (cache.get("b"), cache.get("a"), cache.get("c"))
+    assert (1, 2, 3) == (cache.evictions, len(cache), cache.hits)
+    with pytest.raises(ValueError):
+        sql.TemplateCache(maxsize=0)
+
+
+def test_compile_postgresql():
+    rules = shf.BinningRulesFactory(bins=[shf.BinFactory(ge=None, lt=10), shf.BinFactory(ge=10, lt=None)])
+    q = query.GroupByQuery(
+        from_=query.Join(
+            left=query.JoinPart(from_=ORDERS, on=order_attribute("customer")),
+            right=query.JoinPart(from_=CUSTOMERS, on=customer_attribute("uid")),
+            type=query.JoinType.INNER,
+        ),
+        groups=[
+            group(customer_attribute("country"), attribute.GroupByFunction.IDENTITY, "country"),
+            group(order_attribute("created"), attribute.GroupByFunction.DATE_TRUNC_MONTH, "month"),
+            group(order_attribute("price"), attribute.GroupByFunction.NUMERIC_BINNING, "100%", rules),
+        ],
+        aggregations=[aggregation(order_attribute("id"), attribute.AggregationFunction.COUNT, "orders")],
+        where=expression(order_attribute("customer"), params.ParamOperation.STARTS_WITH, "50%"),
+        limit=10,
+    )
+    statement = sql.SqlCompiler("postgresql", table=lambda c: ("public", c.collection_uid)).compile(q)
+    assert (
+        'SELECT t1."country" AS "country", DATE_TRUNC(\'month\', t0."created") AS "month", '
+        'CASE WHEN t0."price" < %s THEN %s WHEN t0."price" >= %s THEN %s END AS "100%%", '
+        'COUNT(t0."id") AS "orders" '
+        'FROM "public"."orders" AS t0 INNER JOIN "public"."customers" AS t1 ON t0."customer" = t1."uid" '
+        "WHERE t0.\"customer\" LIKE %s ESCAPE '!' GROUP BY 1, 2, 3 LIMIT %s"
+    ) == statement.sql
+    assert (10.0, "None-10.0", 10.0, "10.0-None", "50!%%", 10) == statement.params
+
+
+def test_compile_mysql():
+    q = query.SelectQuery(
+        from_=ORDERS, attributes=[projection(order_attribute("id"), alias="my`id")], offset=5, order_by=[]
+    )
+    statement = sql.SqlCompiler(sql.MySQL(paramstyle="qmark")).compile(q)
+    assert "SELECT t0.`id` AS `my``id` FROM `orders` AS t0 LIMIT 18446744073709551615 OFFSET ?" == statement.sql
+    assert (5,) == statement.params
+
+
+@pytest.mark.parametrize(
+    "paramstyle, expected",
+    [
+        pytest.param("qmark", 't0."id" IN (?, ?)', id="qmark"),
+        pytest.param("numeric", 't0."id" IN (:1, :2)', id="numeric"),
+        pytest.param("format", 't0."id" IN (%s, %s)', id="format"),
+        pytest.param("dollar", 't0."id" IN ($1, $2)', id="dollar"),
+    ],
+)
+def test_compile_paramstyle(paramstyle, expected):
+    q = query.SelectQuery(
+        from_=ORDERS,
+        attributes=[projection(order_attribute("id"))],
+        where=expression(order_attribute("id"), params.ParamOperation.IN, ("1", "2")),
+    )
+    assert sql.SqlCompiler(sql.PostgreSQL(paramstyle=paramstyle)).compile(q).sql.endswith(f"WHERE {expected}")
+
+
+@pytest.mark.parametrize(
+    "compiler, q, message",
+    [
+        pytest.param(lambda: sql.SqlCompiler("oracle"), None, "unsupported dialect oracle", id="dialect"),
+        pytest.param(lambda: sql.SqlCompiler(sql.SQLite("pyformat")), None, "unsupported paramstyle", id="paramstyle"),
+        pytest.param(
+            sql.SqlCompiler,
+            query.SelectQuery(from_=ORDERS, attributes=[projection(customer_attribute("uid"))]),
+            "collection customers not found in the query from",
+            id="collection",
+        ),
+        pytest.param(
+            sql.SqlCompiler,
+            query.SelectQuery(
+                from_=ORDERS,
+                attributes=[projection(order_attribute("id"))],
+                order_by=[data.OrderByAttribute(alias="unknown")],
+            ),
+            "order by alias unknown not found",
+            id="order-by",
+        ),
+    ],
+)
+def test_compile_raises(compiler, q, message):
+    with pytest.raises(ValueError, match=message):
+        compiler().compile(q)
@@ -1,7 +1,10 @@
+import random
+from itertools import islice, product
+
 import pytest
 
-from igenius_adapters_sdk.entities import attribute
-from igenius_adapters_sdk.tools import utils
+from igenius_adapters_sdk.entities import attribute, data
+from igenius_adapters_sdk.tools import _common, utils
 from tests import factories as shf
 
 
@@ -94,6 +97,8 @@ def test_bin_interpolation(engine_result, final_result, bins, aggregation_alias)
         ],
     )
     assert final_result == utils.bin_interpolation(query, engine_result)
+    columnar = utils.bin_interpolation(query, utils.ColumnarResult.from_rows(engine_result))
+    assert final_result == columnar.to_rows()
 
 
 @pytest.mark.parametrize(
@@ -156,6 +161,8 @@ def test_bin_interpolation_with_ovewritten_default(engine_result, final_result,
         ],
     )
     assert final_result == utils.bin_interpolation(query, engine_result)
+    columnar = utils.bin_interpolation(query, utils.ColumnarResult.from_rows(engine_result))
+    assert final_result == columnar.to_rows()
 
 
 @pytest.mark.parametrize(
@@ -211,3 +218,277 @@ def test_bin_interpolation_with_mixed_binningattributes(
         ],
     )
     assert final_result == utils.bin_interpolation(query, engine_result)
+    columnar = utils.bin_interpolation(query, utils.ColumnarResult.from_rows(engine_result))
+    assert final_result == columnar.to_rows()
+
+
+def test_bin_interpolation_keeps_first_matching_row_and_input_untouched():
+    engine_result = [
+        {"price": "0.0-10.0", "quantity": 1},
+        {"price": "10.0-NaN", "quantity": 2},
+        {"price": "0.0-10.0", "quantity": 3},
+    ]
+    snapshot = [dict(row) for row in engine_result]
+    query = shf.GroupByQueryFactory(
+        bin_interpolation=True,
+        aggregations=[shf.AggregationAttributeFactory(alias="quantity")],
+        groups=[
+            shf.BinningAttributeFactory(
+                alias="price",
+                function_uri=shf.FunctionUriFactory(
+                    function_type="group_by",
+                    function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+                    function_params=shf.BinningRulesFactory(
+                        bins=[
+                            shf.BinFactory(ge=None, lt=0),
+                            shf.BinFactory(ge=0, lt=10),
+                            shf.BinFactory(ge=10, lt=None),
+                        ]
+                    ),
+                ),
+            )
+        ],
+    )
+    assert [
+        {"price": "None-0.0", "quantity": None},
+        {"price": "0.0-10.0", "quantity": 1},
+        {"price": "10.0-None", "quantity": 2},
+    ] == utils.bin_interpolation(query, engine_result)
+    assert snapshot == engine_result
+
+
+def test_columnar_result():
+    result = utils.ColumnarResult(["a", "b"], [[1, 2, 3], ("x", "y", "z")])
+    assert 3 == len(result)
+    assert ("x", "y", "z") == result.column("b")
+    assert [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 3, "b": "z"}] == result.to_rows()
+    assert result == utils.ColumnarResult.from_rows(result.rows())
+    assert utils.ColumnarResult(["b"], [["x", "y", "z"]]) == utils.ColumnarResult.from_rows(result.rows(), ["b"])
+    assert 0 == len(utils.ColumnarResult.from_rows([]))
+    with pytest.raises(ValueError, match="same length"):
+        utils.ColumnarResult(["a", "b"], [[1, 2], [1]])
+    with pytest.raises(ValueError, match="1 column names for 2 columns"):
+        utils.ColumnarResult(["a"], [[1], [2]])
+
+
+def test_columnar_bin_interpolation():
+    query = shf.GroupByQueryFactory(
+        bin_interpolation=True,
+        aggregations=[
+            shf.AggregationAttributeFactory(alias="quantity", default_bin_interpolation=0),
+            shf.AggregationAttributeFactory(alias="total", default_bin_interpolation=-1),
+        ],
+        groups=[
+            shf.BinningAttributeFactory(alias="created"),
+            shf.BinningAttributeFactory(
+                alias="price",
+                function_uri=shf.FunctionUriFactory(
+                    function_type="group_by",
+                    function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+                    function_params=shf.BinningRulesFactory(
+                        bins=[shf.BinFactory(ge=0.0, lt=10.0), shf.BinFactory(ge=10.0, lt=None)]
+                    ),
+                ),
+            ),
+        ],
+    )
+    result = utils.ColumnarResult(
+        ["price", "quantity", "created"],
+        [("0.0-10.0", "10.0-NaN", "0.0-10.0"), [1, 2, 3], ["2020-05-04", "2020-05-01", "2020-05-04"]],
+    )
+    expected = utils.ColumnarResult(
+        ["created", "price", "quantity", "total"],
+        [
+            ["2020-05-04", "2020-05-04", "2020-05-01", "2020-05-01"],
+            ["0.0-10.0", "10.0-None", "0.0-10.0", "10.0-None"],
+            [1, 0, 0, 2],
+            [None, -1, -1, None],
+        ],
+    )
+    assert expected == utils.bin_interpolation(query, result)
+    # rows only have the aggregations of the engine result
+    assert [1, 0, 0, 2] == [row["quantity"] for row in utils.iter_bin_interpolation(query, result)]
+
+
+def binned_group(alias, bins):
+    return shf.BinningAttributeFactory(
+        alias=alias,
+        function_uri=shf.FunctionUriFactory(
+            function_type="group_by",
+            function_uid=attribute.GroupByFunction.NUMERIC_BINNING.uid,
+            function_params=shf.BinningRulesFactory(
+                bins=[shf.BinFactory(ge=float(i), lt=float(i + 1)) for i in range(bins)]
+            ),
+        ),
+    )
+
+
+def reference_interpolation(query, result, sparse=False):
+    """Interpolates all the cells in product order, then sorts and slices them."""
+    unordered = query.copy(update={"order_by": None, "limit": None, "offset": None})
+    cells = utils.bin_interpolation(unordered, result, sparse)
+    ranks = {
+        att.alias: {label: i for i, label in enumerate(att.function_uri.function_params.compile().labels)}
+        for att in query.groups
+        if att.function_uri.function_params is not None
+    }
+    for order in reversed(query.order_by or []):
+        if order.alias in ranks:
+            key = ranks[order.alias].__getitem__
+        else:
+            key = _common.sort_key
+        cells.sort(key=lambda cell: key(cell.get(order.alias)), reverse=order.direction == data.OrderByDirection.DESC)
+    start = query.offset or 0
+    return cells[start : None if query.limit is None else start + query.limit]
+
+
+def test_bin_interpolation_honors_order_by_limit_and_offset():
+    rng = random.Random(7)
+    groups = [shf.BinningAttributeFactory(alias="category"), binned_group("price", 4), binned_group("rating", 3)]
+    for _ in range(300):
+        result = [
+            {
+                "category": rng.choice(["a", "b", "c", None]),
+                "price": f"{float(p)}-{float(p + 1)}",
+                "rating": f"{float(r)}-{float(r + 1)}",
+                "quantity": rng.choice([None, rng.randint(0, 5)]),
+            }
+            for p, r in {(rng.randrange(4), rng.randrange(3)) for _ in range(rng.randint(0, 8))}
+        ]
+        aliases = rng.sample(["category", "price", "rating", "quantity"], rng.randint(0, 3))
+        # at least a binned group, for the interpolation to apply
+        chosen = [groups[1]] + rng.sample([groups[0], groups[2]], rng.randint(0, 2))
+        rng.shuffle(chosen)
+        query = shf.GroupByQueryFactory(
+            bin_interpolation=True,
+            aggregations=[shf.AggregationAttributeFactory(alias="quantity", default_bin_interpolation=0)],
+            groups=chosen,
+            order_by=[
+                shf.OrderByAttributeFactory(alias=alias, direction=rng.choice(list(data.OrderByDirection)))
+                for alias in aliases
+            ]
+            or None,
+            limit=rng.choice([None, 1, 2, 5, 40]),
+            offset=rng.choice([None, 0, 1, 3, 11, 50]),
+        )
+        result = [
+            {k: v for k, v in row.items() if k in [g.alias for g in query.groups] + ["quantity"]} for row in result
+        ]
+        expected = reference_interpolation(query, result)
+        assert expected == utils.bin_interpolation(query, result)
+        assert expected == utils.bin_interpolation(query, utils.ColumnarResult.from_rows(result)).to_rows()
+
+
+def test_sparse_bin_interpolation():
+    query = shf.GroupByQueryFactory(
+        bin_interpolation=True,
+        aggregations=[shf.AggregationAttributeFactory(alias="quantity", default_bin_interpolation=0)],
+        groups=[
+            shf.BinningAttributeFactory(alias="store"),
+            binned_group("price", 2),
+            shf.BinningAttributeFactory(alias="city"),
+        ],
+    )
+    result = [
+        {"store": "s1", "price": "1.0-2.0", "city": "rome", "quantity": 3},
+        {"store": "s2", "price": "0.0-1.0", "city": "milan", "quantity": 5},
+    ]
+    # the bins of each observed (store, city), instead of all the stores in all the cities
+    expected = [
+        {"store": "s1", "price": "0.0-1.0", "city": "rome", "quantity": 0},
+        {"store": "s1", "price": "1.0-2.0", "city": "rome", "quantity": 3},
+        {"store": "s2", "price": "0.0-1.0", "city": "milan", "quantity": 5},
+        {"store": "s2", "price": "1.0-2.0", "city": "milan", "quantity": 0},
+    ]
+    assert 8 == len(utils.bin_interpolation(query, result))
+    assert expected == utils.bin_interpolation(query, result, sparse=True)
+    assert expected == list(utils.iter_bin_interpolation(query, result, sparse=True))
+    columnar = utils.bin_interpolation(query, utils.ColumnarResult.from_rows(result), sparse=True)
+    assert expected == columnar.to_rows()
+    # with only binned groups, sparse and dense interpolations are the same
+    query = query.copy(update={"groups": [binned_group("price", 3)]})
+    result = [{"price": "1.0-2.0", "quantity": 3}]
+    assert utils.bin_interpolation(query, result) == utils.bin_interpolation(query, result, sparse=True)
+
+
+def test_sparse_bin_interpolation_honors_order_by_limit_and_offset():
+    rng = random.Random(11)
+    groups = [
+        shf.BinningAttributeFactory(alias="category"),
+        binned_group("price", 3),
+        shf.BinningAttributeFactory(alias="region"),
+        binned_group("rating", 2),
+    ]
+    for _ in range(300):
+        result = [
+            {
+                "category": c,
+                "price": f"{float(p)}-{float(p + 1)}",
+                "region": r,
+                "rating": f"{float(rating)}-{float(rating + 1)}",
+                "quantity": rng.choice([None, rng.randint(0, 5)]),
+            }
+            for c, p, r, rating in {
+                (rng.choice(["a", "b", "c", None]), rng.randrange(3), rng.choice(["x", "y", "z"]), rng.randrange(2))
+                for _ in range(rng.randint(0, 6))
+            }
+        ]
+        chosen = [groups[1]] + rng.sample([groups[0], groups[2], groups[3]], rng.randint(0, 3))
+        rng.shuffle(chosen)
+        aliases = rng.sample([g.alias for g in chosen] + ["quantity"], rng.randint(0, min(3, len(chosen) + 1)))
+        partial = len(aliases)
+        # all the groups in the order_by, for the order of the cells not to depend on the order of the product
+        aliases += [g.alias for g in chosen if g.alias not in aliases]
+        query = shf.GroupByQueryFactory(
+            bin_interpolation=True,
+            aggregations=[shf.AggregationAttributeFactory(alias="quantity", default_bin_interpolation=0)],
+            groups=chosen,
+            order_by=[
+                shf.OrderByAttributeFactory(alias=alias, direction=rng.choice(list(data.OrderByDirection)))
+                for alias in aliases
+            ],
+            limit=rng.choice([None, 1, 2, 5, 40]),
+            offset=rng.choice([None, 0, 1, 3, 11, 50]),
+        )
+        names = [g.alias for g in query.groups] + ["quantity"]
+        result = [{k: v for k, v in row.items() if k in names} for row in result]
+        observed = [g.alias for g in chosen if g.function_uri.function_params is None]
+        combos = {tuple(row[alias] for alias in observed) for row in result}
+        cells = reference_interpolation(query.copy(update={"limit": None, "offset": None}), result)
+        if observed:
+            cells = [cell for cell in cells if tuple(cell[alias] for alias in observed) in combos]
+        start = query.offset or 0
+        expected = cells[start : None if query.limit is None else start + query.limit]
+        assert expected == utils.bin_interpolation(query, result, sparse=True)
+        assert expected == utils.bin_interpolation(query, utils.ColumnarResult.from_rows(result), True).to_rows()
+        # ordered by some of the groups: ties are in the order of the sparse product
+        query = query.copy(update={"order_by": query.order_by[:partial] or None})
+        expected = reference_interpolation(query, result, sparse=True)
+        assert expected == utils.bin_interpolation(query, result, sparse=True)
+        assert expected == utils.bin_interpolation(query, utils.ColumnarResult.from_rows(result), True).to_rows()
+
+
+def test_bin_interpolation_generates_the_window_only():
+    query = shf.GroupByQueryFactory(
+        bin_interpolation=True,
+        aggregations=[shf.AggregationAttributeFactory(alias="quantity")],
+        groups=[binned_group("a", 1000), binned_group("b", 1000), binned_group("c", 1000)],
+        order_by=[shf.OrderByAttributeFactory(alias="c", direction=data.OrderByDirection.DESC)],
+        offset=123_456_789,
+        limit=2,
+    )
+    result = [{"a": "456.0-457.0", "b": "789.0-790.0", "c": "876.0-877.0", "quantity": 42}]
+    # the cells are ordered by c descending, then a and b: the window starts at c=999-123, a=456, b=789
+    assert [
+        {"a": "456.0-457.0", "b": "789.0-790.0", "c": "876.0-877.0", "quantity": 42},
+        {"a": "456.0-457.0", "b": "790.0-791.0", "c": "876.0-877.0", "quantity": None},
+    ] == utils.bin_interpolation(query, result)
+    assert [{"a": "0.0-1.0", "b": "0.0-1.0", "c": "999.0-1000.0", "quantity": None}] == utils.bin_interpolation(
+        query.copy(update={"offset": None, "limit": 1}), result
+    )
+
+
+@pytest.mark.parametrize("start, stop", [(0, None), (0, 5), (3, 17), (23, None), (24, None), (5, 2), (0, 100)])
+def test_window(start, stop):
+    domains = [[1, 2], "abc", [None, 0, 1, 2]]
+    assert list(islice(product(*domains), start, stop)) == list(utils._window(domains, start, stop))